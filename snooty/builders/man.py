@@ -2,7 +2,7 @@ import io
 import logging
 from dataclasses import dataclass, field
 from enum import Enum, auto
-from typing import Dict, Iterable, List, Union, cast
+from typing import Dict, Iterable, List, Tuple, Union, cast
 
 from .. import n
 from ..n import FileId
@@ -57,8 +57,15 @@ class ManNode:
         """Transform this node into a troff document string."""
         handler = TroffNodeHandler()
 
-        def handle_node(node: "ManNode") -> None:
-            """Call relevant handlers in TroffNodeHandler for a given node."""
+        # Call the relevant handlers in TroffNodeHandler for each node, using an explicit
+        # stack of (node, entering) pairs rather than recursion
+        stack: List[Tuple["ManNode", bool]] = [(self, True)]
+        while stack:
+            node, entering = stack.pop()
+            if not entering:
+                handler.handle_end(node)
+                continue
+
             handler.handle_start(node)
             if isinstance(node.children, str):
                 assert node.element in {
@@ -66,12 +73,11 @@ class ManNode:
                     self.ElementType.PREFORMATTED,
                 }
                 handler.handle_text(node.children)
+                handler.handle_end(node)
             else:
-                for child in node.children:
-                    handle_node(child)
-            handler.handle_end(node)
+                stack.append((node, False))
+                stack.extend((child, True) for child in reversed(node.children))
 
-        handle_node(self)
         return handler.output.getvalue()
 
 
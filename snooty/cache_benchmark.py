@@ -0,0 +1,86 @@
+"""Measure how warm-cache parse time scales with the number of workers.
+
+Usage: python3 -m snooty.cache_benchmark <project-root> [<max-workers>]
+
+The project is first built once to populate its parse cache. Each measurement then runs in a
+fresh interpreter, as a CLI build would, so that no state carries over between runs.
+"""
+
+import logging
+import os
+import subprocess
+import sys
+import time
+from pathlib import Path
+
+from .parser import Project
+from .util_test import BackendTestResults
+
+N_RUNS = 3
+
+
+def build(root_path: Path, max_workers: int) -> float:
+    """Load the parse cache and parse the project, returning the elapsed time in seconds."""
+    project = Project(root_path, BackendTestResults(), {})
+    try:
+        start_time = time.perf_counter()
+        project.load_cache()
+        project.build(max_workers, postprocess=False)
+        return time.perf_counter() - start_time
+    finally:
+        project.close()
+
+
+def populate_cache(root_path: Path) -> None:
+    project = Project(root_path, BackendTestResults(), {})
+    try:
+        project.load_cache()
+        project.build(postprocess=False)
+        project.update_cache()
+    finally:
+        project.close()
+
+
+def measure(root_path: Path, max_workers: int) -> float:
+    output = subprocess.check_output(
+        [
+            sys.executable,
+            "-m",
+            "snooty.cache_benchmark",
+            "--measure",
+            str(root_path),
+            str(max_workers),
+        ],
+        encoding="utf-8",
+    )
+    return float(output)
+
+
+def main() -> None:
+    if sys.argv[1] == "--measure":
+        logging.basicConfig(level=logging.WARNING)
+        print(build(Path(sys.argv[2]), int(sys.argv[3])))
+        return
+
+    logging.basicConfig(level=logging.INFO)
+    root_path = Path(sys.argv[1])
+    max_workers = int(sys.argv[2]) if len(sys.argv) > 2 else (os.cpu_count() or 1)
+
+    populate_cache(root_path)
+
+    worker_counts = [1]
+    while worker_counts[-1] * 2 <= max_workers:
+        worker_counts.append(worker_counts[-1] * 2)
+    if worker_counts[-1] != max_workers:
+        worker_counts.append(max_workers)
+
+    baseline = None
+    print(f"{'workers':>8} {'best (s)':>10} {'speedup':>8}")
+    for n_workers in worker_counts:
+        best = min(measure(root_path, n_workers) for _ in range(N_RUNS))
+        baseline = best if baseline is None else baseline
+        print(f"{n_workers:>8} {best:>10.3f} {baseline / best:>7.2f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,312 @@
+"""Compression codecs for parse cache files.
+
+A cache archive compressed with the gzip codec is an ordinary (multi-member) gzip stream, as
+written by earlier versions of snooty. Archives compressed with any other codec begin with a
+header naming the codec and listing the sizes of independently-compressed chunks, so that
+readers can detect the codec and decompress chunks in parallel. Gzip archives of several
+chunks list the sizes of their members in an extra field of the first member's header, which
+other gzip readers ignore, so that they too can be decompressed in parallel."""
+
+import concurrent.futures
+import gzip
+import importlib
+import lzma
+import os
+import struct
+import zlib
+from types import ModuleType
+from typing import Any, Callable, ClassVar, Dict, List, Optional, Sequence, Type
+
+MAGIC = b"SNTYCACH"
+FORMAT_VERSION = 1
+GZIP_MAGIC = b"\x1f\x8b"
+
+# The gzip header flag indicating an extra field, and the ID of the extra subfield in which
+# the sizes of a gzip archive's members are listed
+GZIP_FEXTRA = 0x04
+GZIP_MEMBERS_ID = b"SN"
+GZIP_MEMBER_SIZE = struct.Struct("<Q")
+GZIP_MAX_MEMBERS = (0xFFFF - 4) // GZIP_MEMBER_SIZE.size
+
+#: Archives larger than this are split into chunks that are compressed concurrently
+CHUNK_SIZE = 8 * 1024 * 1024
+
+
+class UnknownCodecError(ValueError):
+    pass
+
+
+def _import_optional(name: str) -> Optional[ModuleType]:
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+class Codec:
+    """A compression algorithm, optionally at a specific level."""
+
+    name: ClassVar[str]
+    default_level: ClassVar[Optional[int]] = None
+
+    def __init__(self, level: Optional[int] = None) -> None:
+        self.level = self.default_level if level is None else level
+
+    def compress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    def decompress(self, data: bytes) -> bytes:
+        raise NotImplementedError()
+
+    @property
+    def spec(self) -> str:
+        """A string from which parse() reconstructs this codec, e.g. "zlib:9"."""
+        return self.name if self.level is None else f"{self.name}:{self.level}"
+
+    @staticmethod
+    def parse(spec: str) -> "Codec":
+        """Return the codec described by a string of the form name[:level]. Raises
+        UnknownCodecError if the codec is unknown or its library is not installed."""
+        name, _, level = spec.partition(":")
+        try:
+            codec_class = CODECS[name]
+        except KeyError:
+            raise UnknownCodecError(
+                f"Unknown compression codec '{name}'; options: {', '.join(CODECS)}"
+            ) from None
+
+        try:
+            return codec_class(int(level) if level else None)
+        except ValueError:
+            raise UnknownCodecError(f"Invalid compression level: {level}") from None
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, Codec) and self.spec == other.spec
+
+    def __hash__(self) -> int:
+        return hash(self.spec)
+
+    def __repr__(self) -> str:
+        return f"{type(self).__name__}({self.level!r})"
+
+
+class NoCompression(Codec):
+    name = "none"
+
+    def compress(self, data: bytes) -> bytes:
+        return data
+
+    def decompress(self, data: bytes) -> bytes:
+        return data
+
+
+class GzipCodec(Codec):
+    name = "gzip"
+    default_level = 9
+
+    def compress(self, data: bytes) -> bytes:
+        assert self.level is not None
+        return gzip.compress(data, self.level, mtime=0)
+
+    def decompress(self, data: bytes) -> bytes:
+        return gzip.decompress(data)
+
+
+class ZlibCodec(Codec):
+    name = "zlib"
+    default_level = 6
+
+    def compress(self, data: bytes) -> bytes:
+        assert self.level is not None
+        return zlib.compress(data, self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return zlib.decompress(data)
+
+
+class LzmaCodec(Codec):
+    name = "lzma"
+    default_level = 6
+
+    def compress(self, data: bytes) -> bytes:
+        return lzma.compress(data, preset=self.level)
+
+    def decompress(self, data: bytes) -> bytes:
+        return lzma.decompress(data)
+
+
+CODECS: Dict[str, Type[Codec]] = {
+    codec.name: codec for codec in (NoCompression, GzipCodec, ZlibCodec, LzmaCodec)
+}
+
+_zstandard = _import_optional("zstandard")
+if _zstandard is not None:
+    _zstd: Any = _zstandard
+
+    class ZstdCodec(Codec):
+        name = "zstd"
+        default_level = 3
+
+        def compress(self, data: bytes) -> bytes:
+            return bytes(_zstd.ZstdCompressor(level=self.level).compress(data))
+
+        def decompress(self, data: bytes) -> bytes:
+            return bytes(_zstd.ZstdDecompressor().decompress(data))
+
+    CODECS[ZstdCodec.name] = ZstdCodec
+
+_lz4_frame = _import_optional("lz4.frame")
+if _lz4_frame is not None:
+    _lz4: Any = _lz4_frame
+
+    class Lz4Codec(Codec):
+        name = "lz4"
+        default_level = 0
+
+        def compress(self, data: bytes) -> bytes:
+            return bytes(_lz4.compress(data, compression_level=self.level))
+
+        def decompress(self, data: bytes) -> bytes:
+            return bytes(_lz4.decompress(data))
+
+    CODECS[Lz4Codec.name] = Lz4Codec
+
+
+def map_concurrently(
+    function: Callable[[bytes], bytes],
+    chunks: Sequence[bytes],
+    max_workers: Optional[int] = None,
+) -> List[bytes]:
+    """Compress or decompress each of a sequence of buffers, using a pool of threads."""
+    if len(chunks) <= 1:
+        return [function(chunk) for chunk in chunks]
+
+    # zlib, lzma, zstd, and lz4 all release the GIL while they work
+    with concurrent.futures.ThreadPoolExecutor(
+        max_workers or os.cpu_count()
+    ) as executor:
+        return list(executor.map(function, chunks))
+
+
+def pack(
+    codec: Codec,
+    data: bytes,
+    chunk_size: int = CHUNK_SIZE,
+    max_workers: Optional[int] = None,
+) -> bytes:
+    """Compress data as an archive, in chunks that are compressed concurrently."""
+    view = memoryview(data)
+    chunks = [
+        bytes(view[i : i + chunk_size]) for i in range(0, len(data), chunk_size)
+    ] or [b""]
+    compressed = map_concurrently(codec.compress, chunks, max_workers)
+
+    # Concatenated gzip members are themselves a valid gzip stream
+    if isinstance(codec, GzipCodec):
+        return b"".join(_index_gzip_members(compressed))
+
+    name = codec.name.encode("ascii")
+    header = [
+        MAGIC,
+        struct.pack("<BB", FORMAT_VERSION, len(name)),
+        name,
+        struct.pack("<I", len(compressed)),
+        *(struct.pack("<Q", len(chunk)) for chunk in compressed),
+    ]
+    return b"".join(header + compressed)
+
+
+def unpack(data: bytes, max_workers: Optional[int] = None) -> bytes:
+    """Decompress an archive written by pack(), detecting its codec. Raises ValueError if
+    the archive is not in a known format."""
+    if data.startswith(GZIP_MAGIC):
+        members = _split_gzip_members(data)
+        if members is None:
+            return gzip.decompress(data)
+
+        return b"".join(map_concurrently(gzip.decompress, members, max_workers))
+
+    if not data.startswith(MAGIC):
+        raise ValueError("Unknown archive format")
+
+    offset = len(MAGIC)
+    try:
+        version, name_length = struct.unpack_from("<BB", data, offset)
+        if version != FORMAT_VERSION:
+            raise ValueError(f"Unknown archive format version: {version}")
+
+        offset += 2
+        codec = Codec.parse(str(data[offset : offset + name_length], "ascii"))
+        offset += name_length
+        (n_chunks,) = struct.unpack_from("<I", data, offset)
+        offset += 4
+        chunk_lengths = struct.unpack_from(f"<{n_chunks}Q", data, offset)
+        offset += 8 * n_chunks
+    except struct.error:
+        raise ValueError("Truncated or corrupt archive") from None
+
+    view = memoryview(data)
+    chunks: List[bytes] = []
+    for length in chunk_lengths:
+        chunks.append(bytes(view[offset : offset + length]))
+        offset += length
+
+    if offset != len(data):
+        raise ValueError("Truncated or corrupt archive")
+
+    return b"".join(map_concurrently(codec.decompress, chunks, max_workers))
+
+
+def _index_gzip_members(members: List[bytes]) -> List[bytes]:
+    """List the sizes of a sequence of gzip members in an extra field of the first member's
+    header. The members must have no extra field of their own, as written by
+    gzip.compress()."""
+    if not 1 < len(members) <= GZIP_MAX_MEMBERS:
+        return members
+
+    first = members[0]
+    assert not first[3] & GZIP_FEXTRA
+    extra_length = 4 + GZIP_MEMBER_SIZE.size * len(members)
+
+    # The first member grows by the size of the extra field itself
+    sizes = [len(first) + 2 + extra_length] + [len(member) for member in members[1:]]
+    extra = b"".join(
+        [
+            struct.pack("<H", extra_length),
+            GZIP_MEMBERS_ID,
+            struct.pack("<H", extra_length - 4),
+            *(GZIP_MEMBER_SIZE.pack(size) for size in sizes),
+        ]
+    )
+    header = first[:3] + bytes([first[3] | GZIP_FEXTRA]) + first[4:10]
+    return [header + extra + first[10:], *members[1:]]
+
+
+def _split_gzip_members(data: bytes) -> Optional[List[bytes]]:
+    """Split a gzip archive into its members, if their sizes are listed by
+    _index_gzip_members(). Return None if they are not, or if the listing is invalid."""
+    if len(data) < 12 or not data[3] & GZIP_FEXTRA:
+        return None
+
+    (extra_length,) = struct.unpack_from("<H", data, 10)
+    extra = data[12 : 12 + extra_length]
+    if len(extra) < 4 or extra[:2] != GZIP_MEMBERS_ID:
+        return None
+
+    (field_length,) = struct.unpack_from("<H", extra, 2)
+    field = extra[4 : 4 + field_length]
+    if len(field) != field_length or field_length % GZIP_MEMBER_SIZE.size:
+        return None
+
+    sizes = [size for (size,) in GZIP_MEMBER_SIZE.iter_unpack(field)]
+    if sum(sizes) != len(data):
+        return None
+
+    view = memoryview(data)
+    members: List[bytes] = []
+    offset = 0
+    for size in sizes:
+        members.append(bytes(view[offset : offset + size]))
+        offset += size
+
+    return members
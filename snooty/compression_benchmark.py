@@ -0,0 +1,69 @@
+"""Compare parse cache archive size against compression and decompression time for each
+available codec.
+
+Usage: python3 -m snooty.compression_benchmark <project-root>
+"""
+
+import logging
+import pickle
+import sys
+import time
+from pathlib import Path
+
+from . import compression
+from .compression import Codec
+from .parse_cache import PROTOCOL, CacheData
+from .parser import Project
+from .util_test import BackendTestResults
+
+LEVELS = {
+    "gzip": [1, 6, 9],
+    "zlib": [1, 6, 9],
+    "lzma": [0, 6],
+    "zstd": [1, 3, 19],
+    "lz4": [0, 9],
+}
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.WARNING)
+    root_path = Path(sys.argv[1])
+
+    project = Project(root_path, BackendTestResults(), {})
+    try:
+        project.build(postprocess=False)
+        with project._get_inner() as inner:
+            data = CacheData(inner.cache_file.generate_specifier())
+            inner.pages.add_to_cache(data, optimize=True)
+            data.ingest_yaml(inner.yaml_domain)
+    finally:
+        project.close()
+
+    pickled = pickle.dumps(data, protocol=PROTOCOL)
+    print(f"{len(data)} pages; {len(pickled) / 1024 / 1024:.1f} MiB uncompressed")
+    print(
+        f"{'codec':>10} {'size (MiB)':>11} {'ratio':>6} {'compress (s)':>13} "
+        f"{'decompress (s)':>15}"
+    )
+
+    for name in compression.CODECS:
+        for level in LEVELS.get(name, [None]):
+            codec = Codec.parse(name if level is None else f"{name}:{level}")
+
+            start_time = time.perf_counter()
+            packed = compression.pack(codec, pickled)
+            compress_time = time.perf_counter() - start_time
+
+            start_time = time.perf_counter()
+            compression.unpack(packed)
+            decompress_time = time.perf_counter() - start_time
+
+            print(
+                f"{codec.spec:>10} {len(packed) / 1024 / 1024:>11.2f} "
+                f"{len(pickled) / len(packed):>6.2f} {compress_time:>13.3f} "
+                f"{decompress_time:>15.3f}"
+            )
+
+
+if __name__ == "__main__":
+    main()
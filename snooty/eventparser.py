@@ -1,6 +1,18 @@
 import threading
 from collections import defaultdict
-from typing import Callable, Dict, Iterable, List, Optional, Tuple
+from typing import (
+    AbstractSet,
+    Any,
+    Callable,
+    Dict,
+    Iterable,
+    List,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Type,
+)
 
 from . import n
 from .n import FileId
@@ -36,6 +48,45 @@ class FileIdStack:
         return self._stack[-1]
 
 
+class _Listener(NamedTuple):
+    callback: Callable[..., None]
+    node_types: Optional[Tuple[Type[n.Node], ...]]
+    directive_names: Optional[AbstractSet[str]]
+
+    def accepts(self, ty: Type[n.Node], directive_name: Optional[str]) -> bool:
+        if self.node_types is not None and not issubclass(ty, self.node_types):
+            return False
+
+        return (
+            directive_name is None
+            or self.directive_names is None
+            or directive_name in self.directive_names
+        )
+
+
+class _Dispatch:
+    """The start and end listeners for one kind of node, the fields which hold its
+    children, and the number of nodes of that kind which have been visited."""
+
+    __slots__ = ("start", "end", "fields", "is_root", "count")
+
+    def __init__(
+        self,
+        start: Sequence[Callable[..., None]],
+        end: Sequence[Callable[..., None]],
+        ty: Type[n.Node],
+    ) -> None:
+        self.start = start
+        self.end = end
+        self.fields = n.child_fields(ty)
+        self.is_root = issubclass(ty, n.Root)
+        self.count = 0
+
+
+# Marks the point on the traversal stack at which the node beneath it is exited
+_EXIT = object()
+
+
 class EventParser:
     """Respond to listeners in response to node & page processing events."""
 
@@ -45,24 +96,75 @@ class EventParser:
     OBJECT_END_EVENT = "object_end"
 
     def __init__(self, cancellation_token: threading.Event) -> None:
-        self._event_listeners: Dict[str, List[Callable[..., None]]] = defaultdict(list)
+        self._event_listeners: Dict[str, List[_Listener]] = defaultdict(list)
         self.fileid_stack = FileIdStack()
         self.cancellation_token = cancellation_token
 
-    def add_event_listener(self, event: str, listener: Callable[..., None]) -> None:
-        """Add a listener to be called when a particular type of event occurs"""
+        # Node listeners, keyed by node type and directive name; and, for node types other
+        # than directives, by node type alone
+        self._dispatch: Dict[Tuple[type, Optional[str]], _Dispatch] = {}
+        self._type_dispatch: Dict[type, _Dispatch] = {}
+
+    def add_event_listener(
+        self,
+        event: str,
+        listener: Callable[..., None],
+        node_types: Optional[Tuple[Type[n.Node], ...]] = None,
+        directive_names: Optional[AbstractSet[str]] = None,
+    ) -> None:
+        """Add a listener to be called when a particular type of event occurs. Node event
+        listeners may be limited to nodes of the given types; and, for directives, to
+        those with the given names."""
         listeners = self._event_listeners[event]
-        listeners.append(listener)
+        listeners.append(_Listener(listener, node_types, directive_names))
+        self._dispatch.clear()
+        self._type_dispatch.clear()
 
     def fire_page(self, event: str, fileid: FileIdStack, page: Page) -> None:
         """Iterate through all universal listeners and all listeners of the specified type and call them"""
         for listener in self._event_listeners[event]:
-            listener(fileid, page)
+            listener.callback(fileid, page)
 
     def fire_node(self, event: str, fileid: FileIdStack, node: n.Node) -> None:
-        """Iterate through all universal listeners and all listeners of the specified type and call them"""
+        """Call the listeners for the specified event which accept this node"""
         for listener in self._event_listeners[event]:
-            listener(fileid, node)
+            if listener.accepts(
+                type(node), node.name if isinstance(node, n.Directive) else None
+            ):
+                listener.callback(fileid, node)
+
+    def _get_dispatch(self, node: n.Node) -> _Dispatch:
+        """Return the start and end listeners which accept the given node, and the
+        layout of its children."""
+        ty = type(node)
+        directive_name = node.name if isinstance(node, n.Directive) else None
+        key = (ty, directive_name)
+        dispatch = self._dispatch.get(key)
+        if dispatch is None:
+            start, end = (
+                [
+                    listener.callback
+                    for listener in self._event_listeners[event]
+                    if listener.accepts(ty, directive_name)
+                ]
+                for event in (self.OBJECT_START_EVENT, self.OBJECT_END_EVENT)
+            )
+            dispatch = _Dispatch(start, end, ty)
+            self._dispatch[key] = dispatch
+            if directive_name is None:
+                self._type_dispatch[ty] = dispatch
+
+        return dispatch
+
+    def listener_calls(self) -> Dict[str, int]:
+        """Return the number of times each node listener has been called while consuming
+        pages, by qualified name (e.g. "IncludeHandler.enter_node")."""
+        result: Dict[str, int] = defaultdict(int)
+        for dispatch in self._dispatch.values():
+            for listener in (*dispatch.start, *dispatch.end):
+                result[listener.__qualname__] += dispatch.count
+
+        return dict(result)
 
     def consume(self, d: Iterable[Tuple[FileId, Page]]) -> None:
         """Initializes a parse on the provided key-value map of pages"""
@@ -76,25 +178,40 @@ class EventParser:
 
             self.fileid_stack.clear()
 
-    def _iterate(self, d: n.Node, filename: FileId) -> None:
-        if isinstance(d, n.Root):
-            self.fileid_stack.append(d.fileid)
-
-        self.fire_node(self.OBJECT_START_EVENT, self.fileid_stack, d)
-
-        if isinstance(d, n.Parent):
-            if isinstance(d, n.DefinitionListItem):
-                for child in d.term:
-                    self._iterate(child, filename)
-
-            if isinstance(d, n.Directive):
-                for arg in d.argument:
-                    self._iterate(arg, filename)
-
-            for child in d.children:
-                self._iterate(child, filename)
-
-        self.fire_node(self.OBJECT_END_EVENT, self.fileid_stack, d)
-
-        if isinstance(d, n.Root):
-            self.fileid_stack.pop()
+    def _iterate(self, root: n.Node, filename: FileId) -> None:
+        # Walk the tree with an explicit stack rather than by recursion. A node with
+        # children is pushed back along with its dispatch and an _EXIT marker, and then
+        # its children in reverse order; popping the marker then exits the node.
+        stack: List[Any] = [root]
+        fileid_stack = self.fileid_stack
+        type_dispatch = self._type_dispatch
+        while stack:
+            d = stack.pop()
+            if d is _EXIT:
+                dispatch: _Dispatch = stack.pop()
+                d = stack.pop()
+            else:
+                dispatch = type_dispatch.get(type(d)) or self._get_dispatch(d)
+                dispatch.count += 1
+                if dispatch.is_root:
+                    fileid_stack.append(d.fileid)
+
+                for listener in dispatch.start:
+                    listener(fileid_stack, d)
+
+                fields = dispatch.fields
+                if fields:
+                    stack += (d, dispatch, _EXIT)
+                    # Only a Parent has a term or argument, so a lone field is children
+                    if len(fields) == 1:
+                        stack.extend(reversed(d.children))
+                    else:
+                        for name in reversed(fields):
+                            stack.extend(reversed(getattr(d, name)))
+                    continue
+
+            for listener in dispatch.end:
+                listener(fileid_stack, d)
+
+            if dispatch.is_root:
+                fileid_stack.pop()
@@ -8,6 +8,7 @@ from typing import (
     Callable,
     Dict,
     Iterable,
+    Iterator,
     List,
     Mapping,
     Optional,
@@ -26,6 +27,13 @@ if TYPE_CHECKING:
 
 logger = logging.getLogger(__name__)
 
+#: A function that renders each of a category's reified Giza files into pages, possibly in
+#: parallel. Results must be returned in the same order as the given files.
+GizaRenderer = Callable[
+    [str, Sequence[nodes.GizaFile[Any]]],
+    Iterable[Tuple[List[Page], List[Diagnostic]]],
+]
+
 
 def get_giza_category(path: n.FileId) -> str:
     """Infer the Giza category of a YAML file."""
@@ -34,15 +42,14 @@ def get_giza_category(path: n.FileId) -> str:
 
 def validate_cache(
     cached_entries: Mapping[n.FileId, Tuple[str, bytes]],
-    our_entries: Mapping[n.FileId, Tuple[str, str, List[Diagnostic]]],
+    our_hashes: Mapping[n.FileId, str],
 ) -> bool:
     """Check if a given set of cached giza data is eligable to be used for the YAML files on disk."""
-    if cached_entries.keys() != our_entries.keys():
+    if cached_entries.keys() != our_hashes.keys():
         return False
 
     for fileid, cached_entry in cached_entries.items():
-        our_entry = our_entries[fileid]
-        if cached_entry[0] != our_entry[0]:
+        if cached_entry[0] != our_hashes[fileid]:
             return False
 
     return True
@@ -70,6 +77,7 @@ class GizaYamlDomain:
         self,
         all_diagnostics: Dict[n.FileId, List[Diagnostic]],
         cache: "Optional[CacheData]" = None,
+        renderer: Optional[GizaRenderer] = None,
     ) -> Iterable[Tuple[Page, Sequence[Diagnostic]]]:
         """Load all giza data, either from cache or from YAML files as appropriate."""
         categorized = self.categorize()
@@ -78,16 +86,16 @@ class GizaYamlDomain:
         for prefix, giza_category in self.yaml_mapping.items():
             logger.info("Parsing %s YAML", prefix)
 
-            our_entries: Dict[n.FileId, Tuple[str, str, List[Diagnostic]]] = {}
+            # Hash each file, only reading those that may have changed since they were cached
+            our_hashes: Dict[n.FileId, str] = {}
+            our_texts: Dict[n.FileId, Tuple[str, List[Diagnostic]]] = {}
             for path in categorized[prefix]:
-                text, reading_diagnostics = self.config.read(path)
-                text_blake2b = hashlib.blake2b(bytes(text, "utf-8")).hexdigest()
-                our_entries[path] = (text_blake2b, text, reading_diagnostics)
+                our_hashes[path] = self._hash_file(path, our_texts, cache)
 
             # If we have a usable cache, load all of our YAML data from that
             if cache is not None:
                 cached_entries = cache.get_yaml_entries(prefix)
-                if validate_cache(cached_entries, our_entries):
+                if validate_cache(cached_entries, our_hashes):
                     logger.info(
                         "Cache: loaded %d nodes for %s", len(cached_entries), prefix
                     )
@@ -96,7 +104,7 @@ class GizaYamlDomain:
                         assert isinstance(giza_file, nodes.GizaFile)
                         giza_category.add(
                             fileid,
-                            our_entries[fileid][0],
+                            our_hashes[fileid],
                             giza_file.data,
                             giza_file.diagnostics,
                         )
@@ -107,11 +115,40 @@ class GizaYamlDomain:
                     continue
 
             # Otherwise, generate data anew
-            for fileid, entry in our_entries.items():
-                artifacts, text, diagnostics = giza_category.parse(fileid, entry[1])
-                giza_category.add(fileid, text, artifacts, entry[2] + diagnostics)
+            for fileid in our_hashes:
+                if fileid in our_texts:
+                    text, reading_diagnostics = our_texts[fileid]
+                else:
+                    text, reading_diagnostics = self.config.read(fileid)
+                artifacts, text, diagnostics = giza_category.parse(fileid, text)
+                giza_category.add(
+                    fileid, text, artifacts, reading_diagnostics + diagnostics
+                )
+
+            yield from self.generate_pages(prefix, all_diagnostics, renderer)
+
+    def _hash_file(
+        self,
+        path: n.FileId,
+        texts: Dict[n.FileId, Tuple[str, List[Diagnostic]]],
+        cache: "Optional[CacheData]",
+    ) -> str:
+        """Hash a YAML file's text, storing the text in the given dictionary if it had to be
+        read."""
+
+        def hasher() -> str:
+            texts[path] = self.config.read(path)
+            return hashlib.blake2b(bytes(texts[path][0], "utf-8")).hexdigest()
 
-            yield from self.generate_pages(prefix, all_diagnostics)
+        if cache is None:
+            return hasher()
+
+        try:
+            return cache.lookup_source_hash(
+                path, self.config.get_full_path(path), hasher
+            )
+        except OSError:
+            return hasher()
 
     def categorize(self) -> Dict[str, List[n.FileId]]:
         """Scan the source directory for YAML files we should ingest, and categorize them."""
@@ -126,32 +163,60 @@ class GizaYamlDomain:
         return categorized
 
     def generate_pages(
-        self, category_name: str, all_diagnostics: Dict[n.FileId, List[Diagnostic]]
+        self,
+        category_name: str,
+        all_diagnostics: Dict[n.FileId, List[Diagnostic]],
+        renderer: Optional[GizaRenderer] = None,
     ) -> Iterable[Tuple[Page, Sequence[Diagnostic]]]:
-        """Generate a Page for each node in each of our managed categories."""
+        """Generate a Page for each node in each of our managed categories. Rendering may be
+        delegated to a renderer, e.g. to spread it across processes."""
         # Now that all of our YAML files are loaded, generate a page for each one
         giza_category = self.yaml_mapping[category_name]
         logger.debug("Processing %s YAML: %d nodes", category_name, len(giza_category))
-        for file_id, giza_node in giza_category.reify_all_files(all_diagnostics):
 
-            def create_page(filename: str) -> Tuple[Page, EmbeddedRstParser]:
-                page = Page.create(
-                    giza_node.path,
-                    filename,
-                    giza_node.text,
-                    n.Root((-1,), [], giza_node.path, {}),
-                )
-                return (
-                    page,
-                    self.rst_parser_factory(
-                        self.config, page, giza_node.parse_diagnostics
-                    ),
-                )
+        # Inheritance can cross files, so resolve it for the whole category before rendering
+        reified = [
+            giza_node for _, giza_node in giza_category.reify_all_files(all_diagnostics)
+        ]
+
+        if renderer is None:
+            renderer = self.render_files
 
-            for page in giza_category.to_pages(giza_node.path, create_page, giza_node):
-                assert giza_node.pages is not None
+        for giza_node, (pages, render_diagnostics) in zip(
+            reified, renderer(category_name, reified)
+        ):
+            giza_node.parse_diagnostics.extend(render_diagnostics)
+            giza_node.pages = pages
+            for page in pages:
                 yield (page, giza_node.diagnostics)
 
+    def render_file(
+        self, category_name: str, giza_node: nodes.GizaFile[Any]
+    ) -> Tuple[List[Page], List[Diagnostic]]:
+        """Render a reified Giza file into pages. Returns the pages, and any diagnostics
+        raised while parsing their embedded reStructuredText."""
+        giza_category = self.yaml_mapping[category_name]
+        diagnostics: List[Diagnostic] = []
+
+        def create_page(filename: str) -> Tuple[Page, EmbeddedRstParser]:
+            page = Page.create(
+                giza_node.path,
+                filename,
+                giza_node.text,
+                n.Root((-1,), [], giza_node.path, {}),
+            )
+            return (page, self.rst_parser_factory(self.config, page, diagnostics))
+
+        pages = giza_category.to_pages(giza_node.path, create_page, giza_node)
+        return pages, diagnostics
+
+    def render_files(
+        self, category_name: str, giza_nodes: Sequence[nodes.GizaFile[Any]]
+    ) -> Iterator[Tuple[List[Page], List[Diagnostic]]]:
+        """Render each of the given Giza files in this process."""
+        for giza_node in giza_nodes:
+            yield self.render_file(category_name, giza_node)
+
     def update(
         self,
         path: n.FileId,
@@ -1,8 +1,11 @@
+from collections import defaultdict
 from pathlib import Path
 
 from ..diagnostics import ErrorParsingYAMLFile, GitMergeConflictArtifactFound
 from ..n import FileId
-from ..util_test import make_test
+from ..parser import EmbeddedRstParser, Project
+from ..util_test import BackendTestResults, make_test
+from .domain import GizaYamlDomain
 
 
 def test_yaml_with_read_error() -> None:
@@ -25,3 +28,31 @@ content: |
         assert [
             type(d) for d in result.diagnostics[FileId("includes/extracts-test1.yaml")]
         ] == [GitMergeConflictArtifactFound, ErrorParsingYAMLFile]
+
+
+def test_parallel_rendering() -> None:
+    """Ensure that rendering Giza pages in the project's worker pool matches rendering them
+    in-process."""
+    project = Project(Path("test_data/test_gizaparser"), BackendTestResults(), {})
+    try:
+        with project._get_inner() as inner:
+            inner.build(2, False)
+            parallel = {
+                fileid: (page.ast.serialize(), [type(d) for d in diagnostics])
+                for fileid, (page, _, diagnostics) in inner.pages._parsed.items()
+                if page.fileid.suffix == ".yaml"
+            }
+
+            domain = GizaYamlDomain(inner.config, EmbeddedRstParser)
+            serial = {}
+            for page, diagnostics in domain.load_and_generate(defaultdict(list)):
+                page.finish(list(diagnostics))
+                serial[page.fake_full_fileid()] = (
+                    page.ast.serialize(),
+                    [type(d) for d in diagnostics],
+                )
+    finally:
+        project.close()
+
+    assert parallel
+    assert parallel == serial
@@ -3,20 +3,51 @@
 
    This module is responsible for loading and parsing these inventories."""
 
+import concurrent.futures
 import datetime
+import hashlib
 import logging
+import multiprocessing
+import os
 import re
+import struct
+import sys
 import zlib
+from array import array
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, NamedTuple, Optional, Tuple
-
-from .util import HTTPCache
+from typing import (
+    Any,
+    Dict,
+    List,
+    Mapping,
+    NamedTuple,
+    Optional,
+    Sequence,
+    Tuple,
+    Union,
+)
+
+import requests.exceptions
+
+from .util import HTTPCache, atomic_write
 
 __all__ = ("TargetDefinition", "Inventory")
 INVENTORY_PATTERN = re.compile(r"(?x)(.+?)\s+(\S*:\S*)\s+(-?\d+)\s(\S*)\s+(.*)")
 logger = logging.Logger(__name__)
 
+#: Inventories of at least this many (compressed) bytes are parsed in worker processes if
+#: there are several of them: parsing holds the GIL, and unpickling a parsed inventory is
+#: several times faster than parsing it
+PROCESS_PARSE_THRESHOLD = 512 * 1024
+
+#: The leading bytes of a parsed inventory in binary form. Bump the version byte on any change
+#: to the layout.
+BINARY_MAGIC = b"snooty-inventory\x01"
+BINARY_HEADER = struct.Struct("<III")
+#: A string table index denoting a missing or implied string
+NO_STRING = 0xFFFFFFFF
+
 
 class TargetDefinition(NamedTuple):
     """A definition of a reStructuredText link target."""
@@ -33,12 +64,20 @@ class TargetDefinition(NamedTuple):
         return f"{self.role[0]}:{self.role[1]}"
 
 
-@dataclass
+@dataclass(frozen=True)
 class Inventory:
-    """An inventory of a project's link target definitions."""
+    """An inventory of a project's link target definitions. Inventories are immutable once
+    created, so they are shared rather than copied: copy.copy() and copy.deepcopy() return
+    the inventory itself."""
 
     base_url: str
-    targets: Dict[str, TargetDefinition] = field(default_factory=dict)
+    targets: Mapping[str, TargetDefinition] = field(default_factory=dict)
+
+    def __copy__(self) -> "Inventory":
+        return self
+
+    def __deepcopy__(self, memo: Dict[int, Any]) -> "Inventory":
+        return self
 
     def __len__(self) -> int:
         return len(self.targets)
@@ -89,6 +128,136 @@ class Inventory:
 
         return b"".join(buffer)
 
+    def dumps_binary(self) -> bytes:
+        """Serialize this inventory into a compact binary form that loads much faster than
+        the intersphinx format: a table of unique strings followed by columns of indices into it,
+        compressed with zlib. The base URL is not included."""
+        strings: Dict[str, int] = {}
+
+        def intern(s: str) -> int:
+            index = strings.get(s)
+            if index is None:
+                index = strings[s] = len(strings)
+            return index
+
+        columns = [array("I") for _ in range(7)]
+        keys, names, domains, roles, uri_bases, uris, display_names = columns
+        priorities = array("i")
+        for key, target in self.targets.items():
+            names.append(intern(target.name))
+            domains.append(intern(target.role[0]))
+            roles.append(intern(target.role[1]))
+            uri_bases.append(intern(target.uri_base))
+            priorities.append(target.priority)
+            display_names.append(
+                NO_STRING
+                if target.display_name is None
+                else intern(target.display_name)
+            )
+
+            # The key and full URI are almost always implied by the other fields
+            keys.append(
+                NO_STRING
+                if key == f"{target.role[0]}:{target.role[1]}:{target.name}"
+                else intern(key)
+            )
+            uris.append(
+                NO_STRING
+                if target.uri == _expand_uri(target.uri_base, target.name)
+                else intern(target.uri)
+            )
+
+        table = "\n".join(strings)
+        if table.count("\n") != max(0, len(strings) - 1):
+            raise ValueError("Inventory strings may not contain newlines")
+
+        encoded_table = bytes(table, "utf-8")
+        if sys.byteorder == "big":
+            for column in (*columns, priorities):
+                column.byteswap()
+
+        body = b"".join(
+            (
+                BINARY_HEADER.pack(len(strings), len(encoded_table), len(self.targets)),
+                encoded_table,
+                *(column.tobytes() for column in columns),
+                priorities.tobytes(),
+            )
+        )
+        return BINARY_MAGIC + zlib.compress(body, 1)
+
+    @classmethod
+    def loads_binary(cls, base_url: str, data: bytes) -> "Inventory":
+        """Load an inventory serialized by :py:meth:`dumps_binary`. Raises ValueError if
+        the data is malformed."""
+        if not data.startswith(BINARY_MAGIC):
+            raise ValueError("Not a binary inventory")
+
+        try:
+            data = zlib.decompress(memoryview(data)[len(BINARY_MAGIC) :])
+            n_strings, table_length, n_targets = BINARY_HEADER.unpack_from(data)
+        except (zlib.error, struct.error) as err:
+            raise ValueError(str(err)) from err
+
+        offset = BINARY_HEADER.size
+        strings = (
+            str(data[offset : offset + table_length], "utf-8").split("\n")
+            if n_strings
+            else []
+        )
+        offset += table_length
+
+        columns: List["array[int]"] = []
+        for typecode in "IIIIIIIi":
+            column = array(typecode)
+            end = offset + column.itemsize * n_targets
+            column.frombytes(data[offset:end])
+            if sys.byteorder == "big":
+                column.byteswap()
+            columns.append(column)
+            offset = end
+
+        if len(strings) != n_strings or offset != len(data):
+            raise ValueError("Truncated binary inventory")
+
+        keys, names, domains, roles, uri_bases, uris, display_names, priorities = (
+            columns
+        )
+        role_tuples: Dict[Tuple[int, int], Tuple[str, str]] = {}
+        targets: Dict[str, TargetDefinition] = {}
+        try:
+            for i in range(n_targets):
+                name = strings[names[i]]
+                role_key = (domains[i], roles[i])
+                role = role_tuples.get(role_key)
+                if role is None:
+                    role = role_tuples[role_key] = (
+                        strings[role_key[0]],
+                        strings[role_key[1]],
+                    )
+
+                uri_base = strings[uri_bases[i]]
+                uri = (
+                    _expand_uri(uri_base, name)
+                    if uris[i] == NO_STRING
+                    else strings[uris[i]]
+                )
+                display_name = (
+                    None if display_names[i] == NO_STRING else strings[display_names[i]]
+                )
+                key = (
+                    f"{role[0]}:{role[1]}:{name}"
+                    if keys[i] == NO_STRING
+                    else strings[keys[i]]
+                )
+                targets[key] = TargetDefinition(
+                    name, role, priorities[i], uri_base, uri, display_name
+                )
+        except IndexError as err:
+            raise ValueError("Invalid string index in binary inventory") from err
+
+        return cls(base_url, targets)
+
     @classmethod
     def parse(cls, base_url: str, text: bytes) -> "Inventory":
         """Parse an intersphinx inventory from the given URL prefix and raw inventory contents."""
@@ -98,7 +267,7 @@ class Inventory:
             start_index = text.find(b"\n", start_index) + 1
 
         decompressed = str(zlib.decompress(text[start_index:]), "utf-8")
-        inventory = cls(base_url)
+        targets: Dict[str, TargetDefinition] = {}
         for line in decompressed.split("\n"):
             if not line.strip():
                 continue
@@ -131,8 +300,7 @@ class Inventory:
                 domain_and_role = "py:mod"
 
             uri_base = uri
-            if uri.endswith("$"):
-                uri = uri[:-1] + name
+            uri = _expand_uri(uri, name)
 
             # The spec says that only {dispname} can contain spaces. In practice, this is a lie.
             # Just silently skip invalid lines.
@@ -150,8 +318,8 @@ class Inventory:
             target_definition = TargetDefinition(
                 name, (domain, role), priority, uri_base, uri, dispname
             )
-            inventory.targets[f"{domain_and_role}:{name}"] = target_definition
-        return inventory
+            targets[f"{domain_and_role}:{name}"] = target_definition
+        return cls(base_url, targets)
 
 
 def fetch_inventory(
@@ -159,10 +327,128 @@ def fetch_inventory(
     cache_dir: Optional[Path] = HTTPCache.DEFAULT_CACHE_DIR,
     cache_interval: Optional[datetime.timedelta] = None,
 ) -> Inventory:
-    """Fetch an intersphinx inventory, or use a locally cached copy if it is still valid."""
-    base_url = url.rsplit("/", 1)[0]
-    base_url.rstrip("/")
-    base_url += "/"
+    """Fetch an intersphinx inventory, or use a locally cached copy if it is still valid.
+    If the inventory is unchanged since it was last parsed, the parsed copy is loaded instead.
+    """
+    cache = HTTPCache.for_directory(cache_dir)
+    data = cache.get(url, cache_interval)
+    inventory = _load_parsed(cache, url, data)
+    if inventory is None:
+        inventory = Inventory.parse(_get_base_url(url), data)
+        _store_parsed(cache, url, data, inventory)
+
+    return inventory
+
+
+def fetch_inventories(
+    urls: Sequence[str],
+    cache_dir: Optional[Path] = HTTPCache.DEFAULT_CACHE_DIR,
+    cache_interval: Optional[datetime.timedelta] = None,
+    process_parse_threshold: int = PROCESS_PARSE_THRESHOLD,
+) -> List[Union[Inventory, requests.exceptions.RequestException]]:
+    """Fetch intersphinx inventories concurrently, using locally cached copies where they
+    are still valid. Return, in the order of the given URLs, each inventory or the error
+    that prevented it from being fetched."""
+    cache = HTTPCache.for_directory(cache_dir)
+    results: List[Union[Inventory, bytes, requests.exceptions.RequestException]] = []
+    for url, data in zip(urls, cache.prefetch(urls, cache_interval)):
+        if isinstance(data, bytes):
+            inventory = _load_parsed(cache, url, data)
+            if inventory is not None:
+                results.append(inventory)
+                continue
+
+            # Leave large inventories to be parsed together
+            if len(data) < process_parse_threshold:
+                inventory = Inventory.parse(_get_base_url(url), data)
+                _store_parsed(cache, url, data, inventory)
+                results.append(inventory)
+                continue
+
+        results.append(data)
+
+    large = [i for i, result in enumerate(results) if isinstance(result, bytes)]
+    parsed: Dict[int, Inventory] = {}
+    n_processes = min(len(large), os.cpu_count() or 1)
+    if n_processes > 1:
+        # This process may be running other threads, so do not fork it
+        with concurrent.futures.ProcessPoolExecutor(
+            n_processes, mp_context=multiprocessing.get_context("spawn")
+        ) as process_executor:
+            parsed = dict(
+                zip(
+                    large,
+                    process_executor.map(
+                        Inventory.parse,
+                        [_get_base_url(urls[i]) for i in large],
+                        [results[i] for i in large],
+                    ),
+                )
+            )
+
+    inventories: List[Union[Inventory, requests.exceptions.RequestException]] = []
+    for i, (url, result) in enumerate(zip(urls, results)):
+        if isinstance(result, bytes):
+            inventory = parsed.get(i)
+            if inventory is None:
+                inventory = Inventory.parse(_get_base_url(url), result)
+            _store_parsed(cache, url, result, inventory)
+            result = inventory
+        inventories.append(result)
+
+    return inventories
+
+
+def _get_base_url(url: str) -> str:
+    return url.rsplit("/", 1)[0] + "/"
+
+
+def _expand_uri(uri: str, name: str) -> str:
+    """A trailing "$" in an inventory URI stands for the target name."""
+    return uri[:-1] + name if uri.endswith("$") else uri
+
+
+def _get_parsed_path(cache: HTTPCache, url: str) -> Optional[Path]:
+    path = cache.get_cache_path(url)
+    return None if path is None else path.with_name(path.name + ".parsed")
+
+
+def _load_parsed(cache: HTTPCache, url: str, data: bytes) -> Optional[Inventory]:
+    """Load the parsed copy of an inventory stored next to its raw response, provided that it
+    was parsed from exactly the given raw bytes."""
+    path = _get_parsed_path(cache, url)
+    if path is None:
+        return None
+
+    try:
+        parsed_data = path.read_bytes()
+    except OSError:
+        return None
+
+    digest = hashlib.blake2b(data).digest()
+    if not parsed_data.startswith(digest):
+        return None
+
+    try:
+        return Inventory.loads_binary(_get_base_url(url), parsed_data[len(digest) :])
+    except ValueError as err:
+        logger.debug(f"Discarding invalid parsed inventory {path}: {err}")
+        return None
+
+
+def _store_parsed(
+    cache: HTTPCache, url: str, data: bytes, inventory: Inventory
+) -> None:
+    """Store a parsed inventory next to its raw response, keyed by the hash of the raw bytes."""
+    path = _get_parsed_path(cache, url)
+    if path is None:
+        return
 
-    data = HTTPCache(cache_dir).get(url, cache_interval)
-    return Inventory.parse(base_url, data)
+    try:
+        atomic_write(
+            path,
+            hashlib.blake2b(data).digest() + inventory.dumps_binary(),
+            path.parent,
+        )
+    except (OSError, ValueError, OverflowError) as err:
+        logger.debug(f"Failed to store parsed inventory {path}: {err}")
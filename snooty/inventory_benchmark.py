@@ -0,0 +1,72 @@
+"""Measure the cost of starting a postprocessor with 20 intersphinx inventories loaded, with
+the inventories shared by the clean-slate target database as they are now, and deep-copied
+as they used to be.
+
+Usage: python3 -m snooty.inventory_benchmark [<n-inventories>]
+"""
+
+import copy
+import sys
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from .intersphinx import Inventory
+from .postprocess import Postprocessor
+from .target_database import TargetDatabase
+from .types import ProjectConfig
+
+N_RUNS = 5
+INVENTORY_PATHS = [
+    Path("test_data/test_intersphinx/manual.inv"),
+    Path("test_data/test_intersphinx/django.inv"),
+]
+
+
+def measure(function: Callable[[], object]) -> float:
+    """Return the best time in seconds of several calls to the given function."""
+    times: List[float] = []
+    for _ in range(N_RUNS):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+
+    return min(times)
+
+
+def main() -> None:
+    n_inventories = int(sys.argv[1]) if len(sys.argv) > 1 else 20
+    inventory_data = [path.read_bytes() for path in INVENTORY_PATHS]
+    inventories = {}
+    for i in range(n_inventories):
+        url = f"https://example.com/project-{i}/objects.inv"
+        inventories[url] = Inventory.parse(
+            url.rsplit("/", 1)[0] + "/", inventory_data[i % len(inventory_data)]
+        )
+
+    targets = TargetDatabase(inventories)
+    project_config = ProjectConfig(Path(), "")
+    n_targets = sum(len(inventory) for inventory in inventories.values())
+
+    def deepcopy_clean_slate() -> TargetDatabase:
+        with targets.lock:
+            return TargetDatabase(
+                {
+                    url: Inventory(inventory.base_url, copy.deepcopy(inventory.targets))
+                    for url, inventory in targets.intersphinx_inventories.items()
+                },
+                intersphinx_suggestions=targets.intersphinx_suggestions,
+            )
+
+    print(f"{n_inventories} inventories, {n_targets} targets")
+    print(f"{'copy':>8} {'best (ms)':>10}")
+    for name, copy_targets in (
+        ("deepcopy", deepcopy_clean_slate),
+        ("shared", targets.copy_clean_slate),
+    ):
+        best = measure(lambda: Postprocessor(project_config, copy_targets()))
+        print(f"{name:>8} {best * 1000:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -604,6 +604,8 @@ class LanguageServer(pyls_jsonrpc.dispatchers.MethodDispatcher):
         self._endpoint.shutdown()
         self._debouncer.stop()
         self._postprocessor_debouncer.stop()
+        if self.project:
+            self.project.close()
 
     def __enter__(self) -> "LanguageServer":
         return self
@@ -4,6 +4,7 @@ Usage:
   snooty build [--no-caching]               <source-path> [--output=<path>] [options]
   snooty create-cache [--no-caching]        <source-path> [options]
   snooty [--no-caching] language-server
+  snooty cache gc [--max-size=<bytes>]
 
 Options:
   -h --help                 Show this screen.
@@ -11,6 +12,23 @@ Options:
   --commit=<commit_hash>    Commit hash of build.
   --patch=<patch_id>        Patch ID of build. Must be specified with a commit hash.
   --no-caching              Disable HTTP response caching.
+  --paranoid-cache          Always hash files to validate the parse cache, rather than
+                            trusting unchanged file metadata.
+  --shared-cache            Also reuse pages parsed by other projects and branches, and
+                            share this project's pages with them.
+  --parallel-postprocess    Postprocess shards of the project's pages in parallel, in the
+                            worker processes used for parsing.
+  --max-size=<bytes>        The size to which to shrink the shared parse cache, evicting
+                            the least recently used pages [default: 2147483648].
+  --cache-format=<format>   The format in which create-cache writes the parse cache:
+                            database, or gzip for a single archive suitable for
+                            publishing. Archives compressed with another codec are
+                            written to a .cache.archive file [default: database].
+  --cache-compression=<codec>
+                            The codec with which create-cache compresses the parse
+                            cache: none, gzip, zlib, lzma, or zstd and lz4 if installed,
+                            optionally with a level, e.g. zlib:9. Defaults to gzip for
+                            archives, and zlib for databases.
   --rstspec=<url>           Override the reStructuredText directive & role spec.
   --branch=<branch>         Override branch value for Netlify.
 
@@ -35,9 +53,11 @@ import bson
 from docopt import docopt
 
 from . import __version__, language_server, specparser
+from .compression import Codec, UnknownCodecError
 from .diagnostics import Diagnostic, MakeCorrectionMixin
 from .n import FileId, SerializableType
 from .page import Page
+from .parse_cache import SharedCache
 from .parser import Project, ProjectBackend, ProjectLoadError
 from .types import BuildIdentifierSet, ProjectConfig
 from .util import (
@@ -248,6 +268,18 @@ def _generate_build_identifiers(args: Dict[str, Optional[str]]) -> BuildIdentifi
     return identifiers
 
 
+def collect_shared_cache(max_size: int) -> None:
+    shared_cache = SharedCache.open()
+    try:
+        n_evicted = shared_cache.evict(max_size)
+        shared_cache.compact(force=True)
+        print(
+            f"Evicted {n_evicted} pages; shared parse cache is now {shared_cache.size()} bytes"
+        )
+    finally:
+        shared_cache.close()
+
+
 def main() -> None:
     multiprocessing.freeze_support()
 
@@ -269,6 +301,22 @@ def main() -> None:
         language_server.start()
         return
 
+    if args["cache"] and args["gc"]:
+        collect_shared_cache(int(args["--max-size"]))
+        return
+
+    if args["--cache-format"] not in ("database", "gzip"):
+        print(f"Unknown cache format: {args['--cache-format']}", file=sys.stderr)
+        sys.exit(1)
+
+    cache_codec: Optional[Codec] = None
+    if args["--cache-compression"]:
+        try:
+            cache_codec = Codec.parse(args["--cache-compression"])
+        except UnknownCodecError as err:
+            print(err, file=sys.stderr)
+            sys.exit(1)
+
     output_path = args["--output"]
 
     if output_path:
@@ -301,14 +349,22 @@ def main() -> None:
         sys.exit(1)
 
     if not no_caching:
-        project.load_cache()
+        project.load_cache(
+            paranoid=args["--paranoid-cache"], shared=args["--shared-cache"]
+        )
 
     try:
-        project.build()
+        # Nothing but create-cache needs the parsed pages once they are postprocessed
+        project.build(
+            one_shot=not args["create-cache"],
+            parallel_postprocess=args["--parallel-postprocess"],
+        )
 
         if args["create-cache"]:
             with PerformanceLogger.singleton().start("persist cache"):
-                project.update_cache()
+                project.update_cache(
+                    archive=args["--cache-format"] == "gzip", codec=cache_codec
+                )
 
         if os.environ.get("SNOOTY_PERF_SUMMARY", "0") == "1":
             PerformanceLogger.singleton().print(sys.stderr)
@@ -319,6 +375,7 @@ def main() -> None:
             os.unlink(output_path)
         raise
     finally:
+        project.close()
         backend.close()
 
         print(
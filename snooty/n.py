@@ -20,6 +20,7 @@ from typing import (
     Type,
     TypeVar,
     Union,
+    cast,
 )
 
 __all__ = (
@@ -144,7 +145,12 @@ class Node:
         return self.span
 
     def verify(self) -> None:
-        """Perform optional validations on this node."""
+        """Perform optional validations on this node and its descendants."""
+        for node in walk(self):
+            node.verify_node()
+
+    def verify_node(self) -> None:
+        """Perform optional validations on this node alone."""
         pass
 
 
@@ -196,11 +202,6 @@ class Parent(Node, Generic[_N]):
     def get_text(self) -> str:
         return "".join(child.get_text() for child in self.children)
 
-    def verify(self) -> None:
-        super().verify()
-        for child in self.children:
-            child.verify()
-
     def check_tree(
         self, *types: "Type[Parent[Any]]"
     ) -> "Optional[Tuple[Node, Type[Parent[Any]]]]":
@@ -225,8 +226,8 @@ class Parent(Node, Generic[_N]):
 class InlineParent(InlineNode, Parent[InlineNode]):
     __slots__ = ()
 
-    def verify(self) -> None:
-        super().verify()
+    def verify_node(self) -> None:
+        super().verify_node()
         for child in self.children:
             assert isinstance(child, InlineNode), f"{child.type} is not an inline node"
 
@@ -313,11 +314,6 @@ class DefinitionListItem(Parent[Node]):
     type = "definitionListItem"
     term: MutableSequence[InlineNode]
 
-    def verify(self) -> None:
-        super().verify()
-        for part in self.term:
-            part.verify()
-
 
 @dataclass
 class DefinitionList(Parent[DefinitionListItem]):
@@ -360,11 +356,6 @@ class Directive(Parent[Node]):
     argument: MutableSequence["Text"]
     options: Dict[str, str]
 
-    def verify(self) -> None:
-        super().verify()
-        for arg in self.argument:
-            arg.verify()
-
 
 class TocTreeDirectiveEntry(NamedTuple):
     title: Optional[str]
@@ -453,7 +444,7 @@ class RefRole(Role):
     fileid: Optional[Tuple[str, str]]
     url: Optional[str]
 
-    def verify(self) -> None:
+    def verify_node(self) -> None:
         assert (
             self.fileid is not None or self.url is not None
         ), f"Missing required target field: {self.serialize()}"
@@ -529,3 +520,103 @@ class ComposableDirective(Directive):
 class ComposableContent(Directive):
     __slots__ = "selections"
     selections: Dict[str, str]
+
+
+_CHILD_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def child_fields(ty: Type[Node]) -> Tuple[str, ...]:
+    """Return the names of the fields of a node class which hold child nodes, in the order
+    in which they are traversed."""
+    fields = _CHILD_FIELDS.get(ty)
+    if fields is None:
+        fields = tuple(
+            name
+            for name, base in (
+                ("term", DefinitionListItem),
+                ("argument", Directive),
+                ("children", Parent),
+            )
+            if issubclass(ty, base)
+        )
+        _CHILD_FIELDS[ty] = fields
+
+    return fields
+
+
+def walk(root: Node) -> Iterator[Node]:
+    """Yield each node in an AST in document order. Unlike a recursive traversal, this is
+    not limited by the interpreter's recursion limit."""
+    stack: List[Node] = [root]
+    while stack:
+        node = stack.pop()
+        yield node
+
+        ty = type(node)
+        fields = _CHILD_FIELDS.get(ty)
+        if fields is None:
+            fields = child_fields(ty)
+
+        for name in reversed(fields):
+            stack.extend(reversed(getattr(node, name)))
+
+
+# Values of these types are never modified in place, so copies may share them
+_IMMUTABLE_TYPES = {str, int, float, bool, type(None), tuple, FileId, datetime}
+_NODE_FIELDS: Dict[type, Tuple[str, ...]] = {}
+
+
+def deep_copy(value: _T) -> _T:
+    """Deep copy an AST node, or a list or dict of nodes and primitive values. This walks the
+    tree directly, and is several times faster than util.fast_deep_copy()'s pickle round
+    trip. Tuples, like other immutable values, are shared with the original. Like walk(),
+    this uses an explicit stack, and so is not limited by the interpreter's recursion limit.
+    """
+    immutable_types = _IMMUTABLE_TYPES
+    if type(value) in immutable_types:
+        return value
+
+    # Each entry is a mutable value to copy, and the list, dict, or node into which to
+    # store its copy, under the given index, key, or attribute name
+    root: List[Any] = [None]
+    stack: List[Tuple[Any, Any, Any, bool]] = [(value, root, 0, False)]
+    while stack:
+        original, container, key, is_attribute = stack.pop()
+        ty = type(original)
+        copy: Any
+        if ty is list:
+            copy = list(original)
+            for i, child in enumerate(original):
+                if type(child) not in immutable_types:
+                    stack.append((child, copy, i, False))
+        elif ty is dict:
+            copy = dict(original)
+            for k, child in original.items():
+                if type(child) not in immutable_types:
+                    stack.append((child, copy, k, False))
+        else:
+            fields = _NODE_FIELDS.get(ty)
+            if fields is None:
+                if isinstance(original, (Enum, tuple, str)):
+                    immutable_types.add(ty)
+                    fields = ()
+                else:
+                    fields = tuple(field.name for field in dataclasses.fields(original))
+                    _NODE_FIELDS[ty] = fields
+
+            if ty in immutable_types:
+                copy = original
+            else:
+                copy = object.__new__(ty)
+                for name in fields:
+                    child = getattr(original, name)
+                    setattr(copy, name, child)
+                    if type(child) not in immutable_types:
+                        stack.append((child, copy, name, True))
+
+        if is_attribute:
+            setattr(container, key, copy)
+        else:
+            container[key] = copy
+
+    return cast(_T, root[0])
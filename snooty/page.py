@@ -1,6 +1,6 @@
 import hashlib
 from dataclasses import dataclass, field
-from typing import List, Optional, Set
+from typing import AbstractSet, ClassVar, Dict, List, Optional, Sequence, Set
 
 from . import n
 from .diagnostics import Diagnostic
@@ -25,6 +25,47 @@ class PendingTask:
         pass
 
 
+class NodeIndex:
+    """The notable directives in a page's AST, by name, in document order. The index is
+    recorded when the page is parsed, and persisted along with it, so that postprocessing
+    can find these directives without walking the tree. Only directives of the page
+    itself are indexed: not those which postprocessing expands into it, such as the
+    contents of included files."""
+
+    #: The names of the directives which are indexed
+    DIRECTIVE_NAMES: ClassVar[AbstractSet[str]] = frozenset(
+        {"toctree", "include", "sharedinclude"}
+    )
+
+    __slots__ = ("directives",)
+
+    def __init__(self, directives: Dict[str, List[n.Directive]]) -> None:
+        self.directives = directives
+
+    @classmethod
+    def build(cls, ast: n.Node) -> "NodeIndex":
+        directives: Dict[str, List[n.Directive]] = {}
+        for node in n.walk(ast):
+            if isinstance(node, n.Directive) and node.name in cls.DIRECTIVE_NAMES:
+                directives.setdefault(node.name, []).append(node)
+
+        return cls(directives)
+
+    def get(self, *names: str) -> Sequence[n.Directive]:
+        """Return the directives with any of the given names, in document order if only
+        one name is given."""
+        if len(names) == 1:
+            return self.directives.get(names[0], ())
+
+        return [node for name in names for node in self.directives.get(name, ())]
+
+    def __contains__(self, name: str) -> bool:
+        return name in self.directives
+
+    def __eq__(self, other: object) -> bool:
+        return isinstance(other, NodeIndex) and self.directives == other.directives
+
+
 @dataclass
 class Page:
     fileid: FileId
@@ -37,6 +78,8 @@ class Page:
     pending_tasks: List[PendingTask] = field(default_factory=list)
     facets: Optional[List[Facet]] = field(default=None)
     category: Optional[str] = field(default=None)
+    #: None if the page's AST was not indexed when it was parsed, and must be searched
+    node_index: Optional[NodeIndex] = None
 
     @classmethod
     def create(
@@ -1,11 +1,22 @@
 from __future__ import annotations
 
+import copy
 import pickle
 import pickletools
 import queue
 import threading
+import time
 from dataclasses import dataclass
-from typing import Callable, Dict, List, Optional, Set, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Mapping,
+    Optional,
+    Set,
+    Tuple,
+)
 
 from . import parse_cache, util
 from .diagnostics import Diagnostic
@@ -13,6 +24,7 @@ from .n import FileId
 from .page import Page
 from .postprocess import Postprocessor, PostprocessorResult
 from .target_database import TargetDatabase
+from .util import EXT_FOR_PAGE
 
 
 @dataclass
@@ -21,6 +33,48 @@ class SerializedPageData:
     orphan_diagnostics: Dict[FileId, List[Diagnostic]]
 
 
+class SnapshotPages(Mapping[FileId, Page]):
+    """Copies of parsed pages, each made when it is first read. The postprocessor only reads
+    the pages that it does not reuse from its previous run, so that the rest are never
+    copied. Only pages with the EXT_FOR_PAGE suffix have their ASTs traversed and modified;
+    other pages, such as include files, are only read, and so are copied shallowly, sharing
+    their ASTs with the parsed page.
+
+    Parsed pages are replaced rather than modified when they change, so copies are made
+    outside of the database's lock, and pages can be updated meanwhile."""
+
+    def __init__(
+        self, parsed: Dict[FileId, Page], cancellation_token: threading.Event
+    ) -> None:
+        self._parsed = parsed
+        self._copies: Dict[FileId, Page] = {}
+        self._cancellation_token = cancellation_token
+
+    def __getitem__(self, key: FileId) -> Page:
+        page = self._copies.get(key)
+        if page is not None:
+            return page
+
+        page = self._parsed[key]
+        if key.suffix != EXT_FOR_PAGE:
+            page = copy.copy(page)
+        else:
+            if self._cancellation_token.is_set():
+                raise util.CancelledException()
+
+            page = pickle.loads(pickle.dumps(page, protocol=parse_cache.PROTOCOL))
+            assert isinstance(page, Page)
+
+        self._copies[key] = page
+        return page
+
+    def __iter__(self) -> Iterator[FileId]:
+        return iter(self._parsed)
+
+    def __len__(self) -> int:
+        return len(self._parsed)
+
+
 class PageDatabase:
     """A database of FileId->Page mappings that ensures the postprocessing pipeline
     is run correctly. Raw parsed pages are added, flush() is called, then postprocessed
@@ -34,9 +88,13 @@ class PageDatabase:
 
         self._parsed: Dict[FileId, Tuple[Page, FileId, List[Diagnostic]]] = {}
         self._orphan_diagnostics: Dict[FileId, List[Diagnostic]] = {}
-        self.__cached = PostprocessorResult({}, {}, {}, TargetDatabase())
+        self.__cached = PostprocessorResult({}, {}, {}, TargetDatabase(), {})
         self.__changed_pages: Set[FileId] = set()
 
+        # The fileids and diagnostics of pages handed over to the postprocessor
+        self._transfer_on_flush = False
+        self._released: Dict[FileId, Tuple[FileId, List[Diagnostic]]] = {}
+
         def start(
             cancellation_token: threading.Event,
             args: Postprocessor,
@@ -45,21 +103,29 @@ class PageDatabase:
                 if not self.__changed_pages:
                     return self.__cached
 
-                with util.PerformanceLogger.singleton().start("copy"):
-                    copied_pages = {}
-                    for k in sorted(self._parsed.keys()):
-                        v = self._parsed[k]
-                        if cancellation_token.is_set():
-                            raise util.CancelledException()
+                start_time = time.perf_counter()
+                previous = self.__cached
+                changed = frozenset(self.__changed_pages)
+                copied_pages: Mapping[FileId, Page]
+                if self._transfer_on_flush:
+                    copied_pages = self._release_pages()
+                else:
+                    copied_pages = SnapshotPages(
+                        {k: self._parsed[k][0] for k in sorted(self._parsed.keys())},
+                        cancellation_token,
+                    )
 
-                        copied_pages[k] = util.fast_deep_copy(v[0])
+            util.PerformanceLogger.singleton().record(
+                "copy", start_time, time.perf_counter()
+            )
 
             with util.PerformanceLogger.singleton().start("postprocessing"):
-                result = args.run(copied_pages, cancellation_token)
+                result = args.run(copied_pages, cancellation_token, previous, changed)
 
             with self._lock:
                 self.__cached = result
-                self.__changed_pages.clear()
+                # Pages which changed during the run are postprocessed by the next one
+                self.__changed_pages -= changed
 
             return result
 
@@ -67,6 +133,22 @@ class PageDatabase:
             util.WorkerLauncher("postprocessor", start)
         )
 
+    def transfer_on_flush(self) -> None:
+        """Hand the parsed pages to the next postprocessor run, rather than copying them.
+        This is for one-shot builds, in which nothing reads the parsed pages after they are
+        postprocessed: afterwards only their diagnostics are retained."""
+        with self._lock:
+            self._transfer_on_flush = True
+
+    def _release_pages(self) -> Dict[FileId, Page]:
+        """Remove and return the parsed pages, retaining their diagnostics. Must be called
+        with the lock held."""
+        pages = {k: self._parsed[k][0] for k in sorted(self._parsed.keys())}
+        self._released.update((k, (v[1], v[2])) for k, v in self._parsed.items())
+        self._parsed.clear()
+        self._transfer_on_flush = False
+        return pages
+
     def set_orphan_diagnostics(self, key: FileId, value: List[Diagnostic]) -> None:
         """Some diagnostics can't be associated with a parsed Page because of underlying
         problems like invalid YAML syntax. These are orphan diagnostics, and we need
@@ -113,11 +195,14 @@ class PageDatabase:
 
             self.__changed_pages.add(key)
 
-    def add_to_cache(self, cache: parse_cache.CacheData) -> None:
+    def add_to_cache(
+        self, cache: parse_cache.CacheData, optimize: bool = False
+    ) -> None:
         with self._lock:
+            assert not self._released, "parsed pages were handed to the postprocessor"
             for data in self._parsed.values():
                 page, fileid, diagnostics = data
-                cache.set_page(page, diagnostics)
+                cache.set_page(page, diagnostics, optimize)
 
             for fileid, diagnostics in self._orphan_diagnostics.items():
                 cache.set_orphan_diagnostics(fileid, diagnostics)
@@ -142,6 +227,8 @@ class PageDatabase:
             result: Dict[FileId, List[Diagnostic]] = {
                 v[1]: list(v[2]) for v in self._parsed.values()
             }
+            for fileid, diagnostics in self._released.values():
+                result[fileid] = list(diagnostics)
 
             for key, diagnostics in self._orphan_diagnostics.items():
                 if key in result:
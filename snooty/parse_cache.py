@@ -1,22 +1,43 @@
-import collections
-import gzip
 import hashlib
 import logging
+import os
 import pickle
 import pickletools
+import sqlite3
+import tempfile
+import threading
+import time
+import weakref
+from contextlib import ExitStack, contextmanager
 from dataclasses import dataclass, field
 from pathlib import Path
-from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+from typing import (
+    Callable,
+    Dict,
+    Iterator,
+    List,
+    Literal,
+    Mapping,
+    MutableMapping,
+    Optional,
+    Sequence,
+    Set,
+    Tuple,
+    TypeVar,
+    cast,
+)
 
 import requests.exceptions
 
-from . import __version__, diagnostics, gizaparser, specparser, util
+from . import __version__, compression, diagnostics, gizaparser, specparser, util
+from .compression import Codec, GzipCodec, ZlibCodec
 from .diagnostics import Diagnostic
 from .n import FileId
 from .page import Page
 from .types import ProjectConfig
 
 logger = logging.getLogger(__name__)
+_K = TypeVar("_K", str, Tuple[str, str])
 
 # Specify protocol 5 since it's supported by Python 3.8+, our supported
 # versions of Python.
@@ -35,44 +56,169 @@ class CacheStats:
     misses: int = field(default=0)
     errors: int = field(default=0)
 
+    # File reads avoided by reusing memoized hashes. Informational only.
+    saved_reads: int = field(default=0, compare=False)
+
+    # Hits served from the shared cache. These are also counted in hits.
+    shared_hits: int = field(default=0, compare=False)
+
+    _lock: threading.Lock = field(
+        default_factory=threading.Lock, init=False, compare=False, repr=False
+    )
+
+    def record(
+        self,
+        counter: Literal["hits", "misses", "errors", "saved_reads", "shared_hits"],
+    ) -> None:
+        """Increment a counter. Cache lookups may run concurrently, so use this instead of
+        modifying counters directly."""
+        with self._lock:
+            setattr(self, counter, getattr(self, counter) + 1)
+
 
 @dataclass
 class CacheData:
     specifier: Tuple[str, ...]
-    pages: Dict[Tuple[str, str], bytes] = field(default_factory=dict)
-    orphan_diagnostics: Dict[str, bytes] = field(default_factory=dict)
+    pages: MutableMapping[Tuple[str, str], bytes] = field(default_factory=dict)
+    orphan_diagnostics: MutableMapping[str, bytes] = field(default_factory=dict)
 
-    yaml_nodes: Dict[str, Dict[FileId, Tuple[str, bytes]]] = field(
-        default_factory=lambda: collections.defaultdict(dict)
+    yaml_nodes: MutableMapping[str, Dict[FileId, Tuple[str, bytes]]] = field(
+        default_factory=dict
     )
     yaml_pages: Dict[str, Sequence[Page]] = field(default_factory=dict)
 
+    # Hashes of source file text after constant substitution, and of dependency file bytes
+    source_hashes: util.FileHashMemo = field(default_factory=util.FileHashMemo)
+    dependency_hashes: util.FileHashMemo = field(default_factory=util.FileHashMemo)
+
     stats: CacheStats = field(default_factory=CacheStats)
 
-    def set_page(self, obj: Page, diagnostics: List[Diagnostic]) -> None:
-        self.pages[(obj.ast.fileid.as_posix(), obj.blake2b)] = pickle.dumps(
-            (obj, diagnostics), protocol=PROTOCOL
+    #: The database from which this cache's entries are loaded, if any
+    database: Optional["CacheDatabase"] = field(default=None, compare=False, repr=False)
+
+    #: A store of pages shared with other projects, consulted when a page is not found here
+    shared: Optional["SharedCache"] = field(default=None, compare=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._init_tracking()
+
+    def _init_tracking(self) -> None:
+        # Pages whose serialized form is already stored in this cache, so that they need not
+        # be serialized again when the cache is updated.
+        self._stored_pages: weakref.WeakValueDictionary[Tuple[str, str], Page] = (
+            weakref.WeakValueDictionary()
         )
+        self._stored_pages_lock = threading.Lock()
+
+        # Entries set since the last call to begin_update()
+        self.live_pages: Set[Tuple[str, str]] = set()
+        self.live_orphan_diagnostics: Set[str] = set()
+
+        # Pages to be added to the shared cache at the end of the update
+        self._shared_pending: List[
+            Tuple[str, Dict[FileId, Optional[str]], Callable[[], bytes]]
+        ] = []
+
+    @contextmanager
+    def begin_update(self) -> Iterator[None]:
+        """Within this context, record the pages and orphan diagnostics that are set, so that
+        the cache can be persisted without those entries which are no longer live. If this
+        cache is backed by a database, new entries are written in a single transaction.
+        Pages are added to the shared cache in one batch once the context exits, so that
+        other builds are not locked out of it while pages are serialized.
+        """
+        self.live_pages.clear()
+        self.live_orphan_diagnostics.clear()
+        with ExitStack() as stack:
+            if self.database is not None:
+                stack.enter_context(self.database.transaction())
+            yield None
+
+        self._flush_shared()
+
+    def _flush_shared(self) -> None:
+        pending, self._shared_pending = self._shared_pending, []
+        if self.shared is None or not pending:
+            return
+
+        try:
+            self.shared.add_many(pending)
+        except sqlite3.OperationalError as err:
+            logger.warning("Failed to update the shared parse cache: %s", err)
+
+    def set_page(
+        self, obj: Page, diagnostics: List[Diagnostic], optimize: bool = False
+    ) -> None:
+        key = (obj.ast.fileid.as_posix(), obj.blake2b)
+        self.live_pages.add(key)
+
+        # Serialize at most once, whether for this cache, the shared cache, or both
+        serialized: Optional[bytes] = None
+
+        def serialize() -> bytes:
+            nonlocal serialized
+            if serialized is None:
+                data = pickle.dumps((obj, diagnostics), protocol=PROTOCOL)
+                serialized = pickletools.optimize(data) if optimize else data
+            return serialized
+
+        if self.shared is not None and obj.dependencies.dependencies is not None:
+            self._shared_pending.append(
+                (
+                    SharedCache.make_key(self.specifier, key[0], key[1]),
+                    obj.dependencies.dependencies,
+                    serialize,
+                )
+            )
+
+        # Don't reserialize a page that was loaded from, or already written to, this cache
+        with self._stored_pages_lock:
+            if self._stored_pages.get(key) is obj:
+                return
+
+        self.pages[key] = serialize()
+        with self._stored_pages_lock:
+            self._stored_pages[key] = obj
 
     def ingest_yaml(self, yaml_domain: gizaparser.domain.GizaYamlDomain) -> None:
-        self.yaml_nodes.clear()
+        live_categories: Set[str] = set()
         for category_name, category in yaml_domain.yaml_mapping.items():
             if category.reified_nodes is None:
                 continue
 
-            for node in category.reified_nodes.values():
-                source_hash = hashlib.blake2b(bytes(node.text, "utf-8")).hexdigest()
-                self.yaml_nodes[category_name][node.path] = (
-                    source_hash,
-                    pickle.dumps(node),
-                )
+            live_categories.add(category_name)
+            source_hashes = {
+                node.path: hashlib.blake2b(bytes(node.text, "utf-8")).hexdigest()
+                for node in category.reified_nodes.values()
+            }
+
+            # Only reserialize categories whose sources have changed
+            if isinstance(self.yaml_nodes, _YamlNodeTable):
+                stored_hashes = self.yaml_nodes.source_hashes(category_name)
+            else:
+                stored_hashes = {
+                    fileid: entry[0]
+                    for fileid, entry in self.yaml_nodes.get(category_name, {}).items()
+                }
+
+            if stored_hashes == source_hashes:
+                continue
+
+            self.yaml_nodes[category_name] = {
+                node.path: (source_hashes[node.path], pickle.dumps(node))
+                for node in category.reified_nodes.values()
+            }
+
+        for category_name in set(self.yaml_nodes) - live_categories:
+            del self.yaml_nodes[category_name]
 
     def get_yaml_entries(self, category: str) -> Mapping[FileId, Tuple[str, bytes]]:
-        return self.yaml_nodes[category]
+        return self.yaml_nodes.get(category, {})
 
     def set_orphan_diagnostics(
         self, fileid: FileId, orphan_diagnostics: List[Diagnostic]
     ) -> None:
+        self.live_orphan_diagnostics.add(fileid.as_posix())
         self.orphan_diagnostics[fileid.as_posix()] = pickle.dumps(
             orphan_diagnostics, protocol=PROTOCOL
         )
@@ -83,17 +229,38 @@ class CacheData:
         """Get a specific page from the cached data with the specified blake2b hash. Raises KeyError
         if the page is not found or the checksum does not match."""
 
-        text, _ = config.read(path)
-        file_hash = hashlib.blake2b(bytes(text, "utf-8")).hexdigest()
+        try:
+            file_hash = self._lookup_hash(
+                self.source_hashes,
+                path,
+                config.get_full_path(path),
+                lambda: hashlib.blake2b(
+                    bytes(config.read(path)[0], "utf-8")
+                ).hexdigest(),
+            )
+        except OSError as err:
+            self.stats.record("misses")
+            raise CacheMiss() from err
 
+        key = (path.as_posix(), file_hash)
+        shared = False
         try:
-            page, diagnostics = pickle.loads(self.pages[(path.as_posix(), file_hash)])
+            try:
+                data = self.pages[key]
+            except KeyError:
+                if self.shared is None:
+                    raise
+
+                data = self._get_shared(config, key)
+                shared = True
+
+            page, diagnostics = pickle.loads(data)
         except KeyError as err:
-            self.stats.misses += 1
+            self.stats.record("misses")
             raise CacheMiss() from err
         except Exception as err:
             logger.info("Error loading page from cache: %s", err)
-            self.stats.errors += 1
+            self.stats.record("errors")
             raise CacheMiss()
 
         assert isinstance(page, Page)
@@ -101,43 +268,776 @@ class CacheData:
 
         # Check page dependencies
         try:
-            if not page.dependencies.check_cache(
-                lambda fileid: hashlib.blake2b(
-                    config.get_full_path(fileid).read_bytes()
-                ).hexdigest()
-            ):
-                self.stats.misses += 1
+            if not self._check_dependencies(config, page.dependencies):
+                self.stats.record("misses")
                 raise CacheMiss()
         except OSError:
-            self.stats.misses += 1
+            self.stats.record("misses")
             raise CacheMiss()
 
-        self.stats.hits += 1
+        self.stats.record("hits")
+        if shared:
+            # The page may have been parsed in another checkout
+            self.stats.record("shared_hits")
+            for asset in page.static_assets:
+                asset.path = config.get_full_path(asset.fileid)
+        else:
+            with self._stored_pages_lock:
+                self._stored_pages[key] = page
+
         return page, diagnostics
 
+    def _get_shared(self, config: ProjectConfig, key: Tuple[str, str]) -> bytes:
+        """Return a serialized page from the shared cache. Raises KeyError if it has no
+        entry with matching dependencies."""
+        assert self.shared is not None
+
+        def check(dependencies: Dict[FileId, Optional[str]]) -> bool:
+            try:
+                return self._check_dependencies(
+                    config, util.FileCacheMapping(dependencies)
+                )
+            except OSError:
+                return False
+
+        data = self.shared.get(SharedCache.make_key(self.specifier, *key), check)
+        if data is None:
+            raise KeyError(key)
+
+        return data
+
+    def _check_dependencies(
+        self, config: ProjectConfig, dependencies: util.FileCacheMapping
+    ) -> bool:
+        return dependencies.check_cache(
+            lambda fileid: self._lookup_hash(
+                self.dependency_hashes,
+                fileid,
+                config.get_full_path(fileid),
+                lambda: hashlib.blake2b(
+                    config.get_full_path(fileid).read_bytes()
+                ).hexdigest(),
+            )
+        )
+
+    def _lookup_hash(
+        self,
+        memo: util.FileHashMemo,
+        fileid: FileId,
+        path: Path,
+        hasher: Callable[[], str],
+    ) -> str:
+        file_hash, memoized = memo.lookup(fileid, path, hasher)
+        if memoized:
+            self.stats.record("saved_reads")
+        return file_hash
+
+    def lookup_source_hash(
+        self, fileid: FileId, path: Path, hasher: Callable[[], str]
+    ) -> str:
+        """Return the hash of a source file's text after constant substitution, calling hasher
+        only if the file may have changed since it was last hashed."""
+        return self._lookup_hash(self.source_hashes, fileid, path, hasher)
+
+    def set_paranoid(self, paranoid: bool) -> None:
+        """If paranoid, always hash files instead of trusting unchanged stat information."""
+        self.source_hashes.paranoid = paranoid
+        self.dependency_hashes.paranoid = paranoid
+
+    def ingest_file_hashes(self, other: "CacheData") -> None:
+        """Carry over the file hashes which another cache looked up while it was in use."""
+        self.source_hashes = other.source_hashes
+        self.source_hashes.prune()
+        self.dependency_hashes = other.dependency_hashes
+        self.dependency_hashes.prune()
+
+    def attach_database(self, database: "CacheDatabase") -> None:
+        """Read this cache's pages, orphan diagnostics, and YAML nodes from the given
+        database from now on, closing the database they were previously read from."""
+        previous = self.database
+        self.pages = _BlobTable(database, "pages", ("fileid", "blake2b"))
+        self.orphan_diagnostics = _BlobTable(
+            database, "orphan_diagnostics", ("fileid",)
+        )
+        self.yaml_nodes = _YamlNodeTable(database)
+        self.database = database
+        if previous is not None:
+            previous.close()
+
+    def close(self) -> None:
+        """Release the database backing this cache, if any."""
+        if self.database is not None:
+            self.database.close()
+
     def __len__(self) -> int:
         return len(self.pages)
 
     def __getstate__(self) -> Dict[str, object]:
-        # Delete the statistics field from the pickle state
-        state = self.__dict__.copy()
-        del state["stats"]
+        # Delete the statistics and tracking fields from the pickle state
+        state = {
+            k: v
+            for k, v in self.__dict__.items()
+            if k in self.__dataclass_fields__
+            and k not in ("stats", "database", "shared")
+        }
+
+        # Entries loaded lazily from a database must be read in to be pickled
+        for key in ("pages", "orphan_diagnostics", "yaml_nodes"):
+            state[key] = dict(state[key])
+
         return state
 
     def __setstate__(self, state: Dict[str, object]) -> None:
         # When loading statistics from pickled data, fill in zero'd data
         self.__dict__.update(state)
         self.stats = CacheStats()
+        self.database = None
+        self.shared = None
+        self._init_tracking()
+
+        # Caches written by older versions do not record file hashes
+        self.__dict__.setdefault("source_hashes", util.FileHashMemo())
+        self.__dict__.setdefault("dependency_hashes", util.FileHashMemo())
+
+
+class _Database:
+    """An SQLite database that may be shared between threads. Writes are made through a
+    single connection, while queries are spread over a pool of read-only connections so
+    that concurrent lookups do not wait for each other."""
+
+    #: Compact the database when more than this fraction of it is unused
+    COMPACTION_THRESHOLD = 0.25
+
+    def __init__(
+        self, connection: sqlite3.Connection, path: Path, codec: Codec
+    ) -> None:
+        self.path = path
+        self.codec = codec
+        self._connection = connection
+        self._lock = threading.RLock()
+        self._transaction_depth = 0
+        self._transaction_thread: Optional[int] = None
+        self._readers_lock = threading.Lock()
+        self._idle_readers: List[sqlite3.Connection] = []
+        self._closed = False
+
+    @contextmanager
+    def transaction(self) -> Iterator[sqlite3.Connection]:
+        """Group every statement executed within this context, including by other methods,
+        into a single transaction. Other threads are blocked from writing to the database
+        until the transaction completes, and do not see its changes until then."""
+        with self._lock:
+            if self._transaction_depth > 0:
+                self._transaction_depth += 1
+                try:
+                    yield self._connection
+                finally:
+                    self._transaction_depth -= 1
+                return
+
+            self._transaction_depth = 1
+            self._transaction_thread = threading.get_ident()
+            try:
+                with self._connection:
+                    yield self._connection
+            finally:
+                self._transaction_depth = 0
+                self._transaction_thread = None
+
+    def query(
+        self, sql: str, params: Sequence[object] = ()
+    ) -> List[Tuple[object, ...]]:
+        # Within a transaction, read its uncommitted changes
+        if self._transaction_thread == threading.get_ident():
+            with self._lock:
+                return self._connection.execute(sql, params).fetchall()
+
+        reader = self._acquire_reader()
+        try:
+            return reader.execute(sql, params).fetchall()
+        finally:
+            self._release_reader(reader)
+
+    def _acquire_reader(self) -> sqlite3.Connection:
+        with self._readers_lock:
+            if self._idle_readers:
+                return self._idle_readers.pop()
+
+        return sqlite3.connect(
+            f"{self.path.resolve().as_uri()}?mode=ro", uri=True, check_same_thread=False
+        )
+
+    def _release_reader(self, reader: sqlite3.Connection) -> None:
+        with self._readers_lock:
+            if not self._closed:
+                self._idle_readers.append(reader)
+                return
+
+        reader.close()
+
+    def execute(self, sql: str, params: Sequence[object] = ()) -> int:
+        """Execute a statement, returning the number of rows it modified."""
+        with self.transaction() as connection:
+            return connection.execute(sql, params).rowcount
+
+    def compact(self, force: bool = False) -> None:
+        """Reclaim unused space, if forced or if more than COMPACTION_THRESHOLD of the
+        database is unused."""
+        with self._lock:
+            (page_count,) = self._connection.execute("PRAGMA page_count").fetchone()
+            (free_count,) = self._connection.execute("PRAGMA freelist_count").fetchone()
+            if force or free_count > page_count * self.COMPACTION_THRESHOLD:
+                logger.info("Compacting %s", self.path)
+                self._connection.execute("VACUUM")
+
+    def close(self) -> None:
+        with self._readers_lock:
+            self._closed = True
+            readers, self._idle_readers = self._idle_readers, []
+
+        for reader in readers:
+            reader.close()
+
+        with self._lock:
+            self._connection.close()
+
+
+class CacheDatabase(_Database):
+    """A parse cache stored in an SQLite database. Entries are indexed by key, so that each
+    can be read and decompressed only when it is needed, rather than loading the whole cache
+    up front."""
+
+    SCHEMA_VERSION = 1
+    SCHEMA = """
+        CREATE TABLE metadata (key TEXT PRIMARY KEY, value BLOB NOT NULL);
+        CREATE TABLE pages (
+            fileid TEXT NOT NULL,
+            blake2b TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (fileid, blake2b)
+        );
+        CREATE TABLE orphan_diagnostics (fileid TEXT PRIMARY KEY, data BLOB NOT NULL);
+        CREATE TABLE yaml_nodes (
+            category TEXT NOT NULL,
+            fileid TEXT NOT NULL,
+            blake2b TEXT NOT NULL,
+            data BLOB NOT NULL,
+            PRIMARY KEY (category, fileid)
+        );
+    """
+
+    @classmethod
+    def open(cls, path: Path) -> "CacheDatabase":
+        """Open an existing cache database. Raises sqlite3.Error if it cannot be opened, or
+        was written with an incompatible schema."""
+        connection = sqlite3.connect(
+            f"{path.resolve().as_uri()}?mode=rw", uri=True, check_same_thread=False
+        )
+        try:
+            (version,) = connection.execute("PRAGMA user_version").fetchone()
+            if version != cls.SCHEMA_VERSION:
+                raise sqlite3.DatabaseError(f"Unknown cache schema version: {version}")
+
+            row = connection.execute(
+                "SELECT value FROM metadata WHERE key = 'codec'"
+            ).fetchone()
+            codec = Codec.parse(str(row[0], "utf-8")) if row else ZlibCodec()
+        except ValueError as err:
+            connection.close()
+            raise sqlite3.DatabaseError(str(err)) from err
+        except:
+            connection.close()
+            raise
+
+        return cls(connection, path, codec)
+
+    @classmethod
+    def create(cls, path: Path, codec: Optional[Codec] = None) -> "CacheDatabase":
+        """Create a new, empty cache database at the given path, the entries of which will
+        be compressed using the given codec (zlib by default)."""
+        codec = ZlibCodec() if codec is None else codec
+        connection = sqlite3.connect(path, check_same_thread=False)
+        connection.executescript(cls.SCHEMA)
+        connection.execute(f"PRAGMA user_version = {cls.SCHEMA_VERSION}")
+        with connection:
+            connection.execute(
+                "INSERT INTO metadata VALUES ('codec', ?)",
+                (codec.spec.encode("utf-8"),),
+            )
+        return cls(connection, path, codec)
+
+    def get_metadata(self, key: str) -> object:
+        rows = self.query("SELECT value FROM metadata WHERE key = ?", (key,))
+        if not rows:
+            raise KeyError(key)
+
+        return pickle.loads(cast(bytes, rows[0][0]))
+
+    def set_metadata(self, key: str, value: object) -> None:
+        self.execute(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+            (key, pickle.dumps(value, protocol=PROTOCOL)),
+        )
+
+    def load(self) -> CacheData:
+        """Return a CacheData whose pages, orphan diagnostics, and YAML nodes are read from
+        this database as they are looked up. Only the specifier and file hashes are read
+        immediately."""
+        specifier = self.get_metadata("specifier")
+        if not isinstance(specifier, tuple) or not all(
+            isinstance(x, str) for x in specifier
+        ):
+            raise TypeError("Invalid cache format")
+
+        source_hashes = self.get_metadata("source_hashes")
+        dependency_hashes = self.get_metadata("dependency_hashes")
+        assert isinstance(source_hashes, util.FileHashMemo)
+        assert isinstance(dependency_hashes, util.FileHashMemo)
+
+        data = CacheData(
+            specifier, source_hashes=source_hashes, dependency_hashes=dependency_hashes
+        )
+        data.attach_database(self)
+        return data
+
+    def write(self, data: CacheData) -> None:
+        """Write the contents of a CacheData into this database."""
+        keys, page_data = zip(*data.pages.items()) if data.pages else ((), ())
+        compressed = compression.map_concurrently(self.codec.compress, page_data)
+        with self.transaction():
+            self._write_metadata(data)
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO pages VALUES (?, ?, ?)",
+                (
+                    (fileid, blake2b, compressed_data)
+                    for (fileid, blake2b), compressed_data in zip(keys, compressed)
+                ),
+            )
+            self._connection.executemany(
+                "INSERT OR REPLACE INTO orphan_diagnostics VALUES (?, ?)",
+                (
+                    (fileid, self.codec.compress(diagnostics_data))
+                    for fileid, diagnostics_data in data.orphan_diagnostics.items()
+                ),
+            )
+            for category, entries in data.yaml_nodes.items():
+                self._set_yaml_entries(category, entries)
+
+    def update(self, data: CacheData) -> None:
+        """Finish updating this database from a CacheData loaded from it: delete the pages
+        and orphan diagnostics that were not set during the update, and record the current
+        file hashes. New entries have already been written as they were set. If enough of
+        the database is unused as a result, compact it."""
+        with self.transaction() as connection:
+            self._write_metadata(data)
+            connection.executemany(
+                "DELETE FROM pages WHERE fileid = ? AND blake2b = ?",
+                [
+                    row
+                    for row in connection.execute("SELECT fileid, blake2b FROM pages")
+                    if row not in data.live_pages
+                ],
+            )
+            connection.executemany(
+                "DELETE FROM orphan_diagnostics WHERE fileid = ?",
+                [
+                    row
+                    for row in connection.execute(
+                        "SELECT fileid FROM orphan_diagnostics"
+                    )
+                    if row[0] not in data.live_orphan_diagnostics
+                ],
+            )
+
+        self.compact()
+
+    def _write_metadata(self, data: CacheData) -> None:
+        self._connection.executemany(
+            "INSERT OR REPLACE INTO metadata VALUES (?, ?)",
+            (
+                (key, pickle.dumps(value, protocol=PROTOCOL))
+                for key, value in (
+                    ("specifier", data.specifier),
+                    ("source_hashes", data.source_hashes),
+                    ("dependency_hashes", data.dependency_hashes),
+                )
+            ),
+        )
+
+    def set_yaml_entries(
+        self, category: str, entries: Mapping[FileId, Tuple[str, bytes]]
+    ) -> None:
+        """Replace the reified Giza nodes recorded for a category."""
+        with self.transaction():
+            self._set_yaml_entries(category, entries)
+
+    def _set_yaml_entries(
+        self, category: str, entries: Mapping[FileId, Tuple[str, bytes]]
+    ) -> None:
+        self._connection.execute(
+            "DELETE FROM yaml_nodes WHERE category = ?", (category,)
+        )
+        self._connection.executemany(
+            "INSERT INTO yaml_nodes VALUES (?, ?, ?, ?)",
+            (
+                (
+                    category,
+                    fileid.as_posix(),
+                    blake2b,
+                    self.codec.compress(node_data),
+                )
+                for fileid, (blake2b, node_data) in entries.items()
+            ),
+        )
+
+
+class _BlobTable(MutableMapping[_K, bytes]):
+    """A view of a cache database table mapping keys to compressed blobs. Each blob is only
+    read and decompressed when it is looked up."""
+
+    def __init__(
+        self, db: CacheDatabase, table: str, key_columns: Sequence[str]
+    ) -> None:
+        self.db = db
+        self._table = table
+        self._key_columns = ", ".join(key_columns)
+        self._where = " AND ".join(f"{column} = ?" for column in key_columns)
+
+    @staticmethod
+    def _params(key: _K) -> Tuple[str, ...]:
+        return key if isinstance(key, tuple) else (key,)
+
+    def __getitem__(self, key: _K) -> bytes:
+        rows = self.db.query(
+            f"SELECT data FROM {self._table} WHERE {self._where}", self._params(key)
+        )
+        if not rows:
+            raise KeyError(key)
+
+        return self.db.codec.decompress(cast(bytes, rows[0][0]))
+
+    def __setitem__(self, key: _K, value: bytes) -> None:
+        self.db.execute(
+            f"INSERT OR REPLACE INTO {self._table} ({self._key_columns}, data) "
+            f"VALUES ({', '.join('?' * len(self._params(key)))}, ?)",
+            (*self._params(key), self.db.codec.compress(value)),
+        )
+
+    def __delitem__(self, key: _K) -> None:
+        if not self.db.execute(
+            f"DELETE FROM {self._table} WHERE {self._where}", self._params(key)
+        ):
+            raise KeyError(key)
+
+    def __contains__(self, key: object) -> bool:
+        if not isinstance(key, (str, tuple)):
+            return False
+
+        return bool(
+            self.db.query(
+                f"SELECT 1 FROM {self._table} WHERE {self._where}",
+                self._params(cast(_K, key)),
+            )
+        )
+
+    def __iter__(self) -> Iterator[_K]:
+        for row in self.db.query(f"SELECT {self._key_columns} FROM {self._table}"):
+            yield cast(_K, row if len(row) > 1 else row[0])
+
+    def __len__(self) -> int:
+        return cast(int, self.db.query(f"SELECT COUNT(*) FROM {self._table}")[0][0])
+
+
+class _YamlNodeTable(MutableMapping[str, Dict[FileId, Tuple[str, bytes]]]):
+    """A view of the reified Giza nodes in a cache database. Each category's nodes are read
+    when that category is looked up."""
+
+    def __init__(self, db: CacheDatabase) -> None:
+        self.db = db
+
+    def __getitem__(self, category: str) -> Dict[FileId, Tuple[str, bytes]]:
+        rows = self.db.query(
+            "SELECT fileid, blake2b, data FROM yaml_nodes WHERE category = ?",
+            (category,),
+        )
+        if not rows:
+            raise KeyError(category)
+
+        return {
+            FileId(cast(str, fileid)): (
+                cast(str, blake2b),
+                self.db.codec.decompress(cast(bytes, data)),
+            )
+            for fileid, blake2b, data in rows
+        }
+
+    def source_hashes(self, category: str) -> Dict[FileId, str]:
+        """Return the source hash of each of a category's nodes, without loading the nodes."""
+        rows = self.db.query(
+            "SELECT fileid, blake2b FROM yaml_nodes WHERE category = ?", (category,)
+        )
+        return {
+            FileId(cast(str, fileid)): cast(str, blake2b) for fileid, blake2b in rows
+        }
+
+    def __setitem__(
+        self, category: str, entries: Dict[FileId, Tuple[str, bytes]]
+    ) -> None:
+        self.db.set_yaml_entries(category, entries)
+
+    def __delitem__(self, category: str) -> None:
+        if not self.db.execute(
+            "DELETE FROM yaml_nodes WHERE category = ?", (category,)
+        ):
+            raise KeyError(category)
+
+    def __iter__(self) -> Iterator[str]:
+        for (category,) in self.db.query("SELECT DISTINCT category FROM yaml_nodes"):
+            yield cast(str, category)
+
+    def __len__(self) -> int:
+        return cast(
+            int, self.db.query("SELECT COUNT(DISTINCT category) FROM yaml_nodes")[0][0]
+        )
+
+
+class SharedCache(_Database):
+    """A content-addressed store of parse results, shared between every project and branch
+    built by this user. An entry is keyed by the cache specifier, the page's FileId and
+    source hash, and the hashes of the files it depends on, so that any build which would
+    produce the same page can reuse it. The least recently used entries are evicted to keep
+    the store within a size limit."""
+
+    SCHEMA_VERSION = 1
+    SCHEMA = """
+        CREATE TABLE entries (
+            key TEXT NOT NULL,
+            dependencies_key TEXT NOT NULL,
+            dependencies BLOB NOT NULL,
+            data BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            last_used REAL NOT NULL,
+            PRIMARY KEY (key, dependencies_key)
+        );
+        CREATE INDEX entries_last_used ON entries (last_used);
+    """
+
+    DEFAULT_MAX_SIZE = 2 * 1024 * 1024 * 1024
+
+    # Seconds to wait for another build's write to finish
+    LOCK_TIMEOUT = 60.0
+
+    @staticmethod
+    def default_path() -> Path:
+        return util.HTTPCache.DEFAULT_CACHE_DIR / "parse-cache.db"
+
+    @classmethod
+    def open(cls, path: Optional[Path] = None) -> "SharedCache":
+        """Open the shared cache at the given path, creating it if necessary. Raises
+        sqlite3.Error if it cannot be opened, or was written with an incompatible schema.
+        """
+        path = cls.default_path() if path is None else path
+        path.parent.mkdir(parents=True, exist_ok=True)
+
+        # Several builds may use the store at once; wait for each other's writes
+        connection = sqlite3.connect(
+            path, timeout=cls.LOCK_TIMEOUT, check_same_thread=False
+        )
+        try:
+            connection.execute("PRAGMA journal_mode = WAL")
+            with connection:
+                (version,) = connection.execute("PRAGMA user_version").fetchone()
+                if version == 0:
+                    connection.executescript(
+                        f"BEGIN; {cls.SCHEMA} PRAGMA user_version = {cls.SCHEMA_VERSION};"
+                    )
+                elif version != cls.SCHEMA_VERSION:
+                    raise sqlite3.DatabaseError(
+                        f"Unknown shared cache schema version: {version}"
+                    )
+        except:
+            connection.close()
+            raise
+
+        return cls(connection, path, ZlibCodec())
+
+    @staticmethod
+    def make_key(specifier: Sequence[str], fileid: str, source_hash: str) -> str:
+        hasher = hashlib.blake2b(digest_size=32)
+        for component in (*specifier, fileid, source_hash):
+            hasher.update(bytes(component, "utf-8") + b"\0")
+        return hasher.hexdigest()
+
+    @staticmethod
+    def _dependencies_key(dependencies: Mapping[FileId, Optional[str]]) -> str:
+        hasher = hashlib.blake2b(digest_size=32)
+        for fileid, file_hash in sorted(dependencies.items()):
+            hasher.update(bytes(f"{fileid.as_posix()}\0{file_hash}\0", "utf-8"))
+        return hasher.hexdigest()
+
+    def get(
+        self, key: str, check: Callable[[Dict[FileId, Optional[str]]], bool]
+    ) -> Optional[bytes]:
+        """Return the serialized page stored under the given key, the dependencies of which
+        satisfy check, or None if there is no such page."""
+        candidates = self.query(
+            "SELECT dependencies_key, dependencies FROM entries WHERE key = ? "
+            "ORDER BY last_used DESC",
+            (key,),
+        )
+        for dependencies_key, dependencies in candidates:
+            if not check(pickle.loads(cast(bytes, dependencies))):
+                continue
+
+            rows = self.query(
+                "SELECT data FROM entries WHERE key = ? AND dependencies_key = ?",
+                (key, dependencies_key),
+            )
+            if not rows:
+                continue
+
+            try:
+                self.execute(
+                    "UPDATE entries SET last_used = ? WHERE key = ? AND dependencies_key = ?",
+                    (time.time(), key, dependencies_key),
+                )
+            except sqlite3.OperationalError as err:
+                # Another build holds the store's write lock; the entry is still usable
+                logger.debug("Failed to mark shared cache entry as used: %s", err)
+            return self.codec.decompress(cast(bytes, rows[0][0]))
+
+        return None
+
+    def add(
+        self,
+        key: str,
+        dependencies: Dict[FileId, Optional[str]],
+        get_data: Callable[[], bytes],
+    ) -> None:
+        """Record a serialized page, calling get_data only if it is not already stored."""
+        self.add_many([(key, dependencies, get_data)])
+
+    def add_many(
+        self,
+        entries: Sequence[Tuple[str, Dict[FileId, Optional[str]], Callable[[], bytes]]],
+    ) -> None:
+        """Record serialized pages, calling each get_data only if its page is not already
+        stored. Pages are serialized before the write transaction begins, so that it is
+        held only briefly. Raises sqlite3.OperationalError if the store stays locked by
+        another build."""
+        now = time.time()
+        touched: List[Tuple[float, str, str]] = []
+        inserted: List[Tuple[str, str, bytes, bytes, int, float]] = []
+        for key, dependencies, get_data in entries:
+            dependencies_key = self._dependencies_key(dependencies)
+            if self.query(
+                "SELECT 1 FROM entries WHERE key = ? AND dependencies_key = ?",
+                (key, dependencies_key),
+            ):
+                touched.append((now, key, dependencies_key))
+                continue
+
+            pickled_dependencies = pickle.dumps(dependencies, protocol=PROTOCOL)
+            data = self.codec.compress(get_data())
+            inserted.append(
+                (
+                    key,
+                    dependencies_key,
+                    pickled_dependencies,
+                    data,
+                    len(data) + len(pickled_dependencies),
+                    now,
+                )
+            )
+
+        with self.transaction() as connection:
+            connection.executemany(
+                "UPDATE entries SET last_used = ? WHERE key = ? AND dependencies_key = ?",
+                touched,
+            )
+            # Another build may have stored the same page meanwhile
+            connection.executemany(
+                "INSERT OR IGNORE INTO entries VALUES (?, ?, ?, ?, ?, ?)", inserted
+            )
+
+    def size(self) -> int:
+        """Return the total size of the stored entries, in bytes."""
+        return cast(int, self.query("SELECT COALESCE(SUM(size), 0) FROM entries")[0][0])
+
+    def evict(self, max_size: int = DEFAULT_MAX_SIZE) -> int:
+        """Delete the least recently used entries until the store is no larger than
+        max_size bytes. Returns the number of entries deleted."""
+        with self.transaction() as connection:
+            excess = self.size() - max_size
+            if excess <= 0:
+                return 0
+
+            evicted: List[Tuple[object, ...]] = []
+            for key, dependencies_key, size in connection.execute(
+                "SELECT key, dependencies_key, size FROM entries ORDER BY last_used"
+            ):
+                if excess <= 0:
+                    break
+                evicted.append((key, dependencies_key))
+                excess -= size
+
+            connection.executemany(
+                "DELETE FROM entries WHERE key = ? AND dependencies_key = ?", evicted
+            )
+
+        logger.info("Evicted %d entries from the shared parse cache", len(evicted))
+        self.compact()
+        return len(evicted)
+
+
+#: Memoized hashes of dependency files, shared by everything in this process that reads
+#: them. Dependency hashes are of raw file contents, so they're independent of the
+#: project configuration, and can be keyed by project root.
+_dependency_hashes: Dict[Path, util.FileHashMemo] = {}
+_dependency_hashes_lock = threading.Lock()
+
+
+def get_dependency_hashes(config: ProjectConfig) -> util.FileHashMemo:
+    """Return this process's memo of dependency file hashes for the given project."""
+    with _dependency_hashes_lock:
+        memo = _dependency_hashes.get(config.root)
+        if memo is None:
+            memo = util.FileHashMemo()
+            _dependency_hashes[config.root] = memo
+
+        return memo
+
+
+def reset_dependency_hashes_after_fork() -> None:
+    """Reinitialize this process's dependency hash memos in a forked child process. See
+    FileHashMemo.reset_after_fork()."""
+    global _dependency_hashes_lock
+
+    _dependency_hashes_lock = threading.Lock()
+    for memo in _dependency_hashes.values():
+        memo.reset_after_fork()
 
 
 class ParseCache:
+    """The parse cache for a project. The cache is normally kept in an indexed SQLite
+    database (see CacheDatabase), but may also be imported from or exported to a single
+    compressed pickle archive, which is the format in which caches are published remotely.
+    Archives are gzip-compressed unless another codec is requested (see the compression
+    module), in which case they are given a suffix that does not name a codec.
+    """
+
+    DATABASE_SUFFIX = ".cache.db"
+    ARCHIVE_SUFFIX = ".cache.gz"
+    CODEC_ARCHIVE_SUFFIX = ".cache.archive"
+
     def __init__(self, project_config: ProjectConfig) -> None:
         self.project_config = project_config
         self.specifier = self.generate_specifier()
 
     def read_from_bytes(self, data_bytes: bytes) -> Optional[CacheData]:
+        """Load a cache from the bytes of an archive, detecting its compression codec."""
         try:
-            data = pickle.loads(gzip.decompress(data_bytes))
+            data = pickle.loads(compression.unpack(data_bytes))
             assert isinstance(data, CacheData)
             if not isinstance(data.specifier, tuple) or not all(
                 isinstance(x, str) for x in data.specifier
@@ -147,6 +1047,28 @@ class ParseCache:
             logger.info("Error loading cache file: %s", err)
             return None
 
+        return self._check_specifier(data)
+
+    def read_database(self, path: Path) -> Optional[CacheData]:
+        """Open a cache database. Its entries are loaded lazily as they are looked up."""
+        try:
+            db = CacheDatabase.open(path)
+        except sqlite3.Error as err:
+            logger.info("Error opening cache database: %s", err)
+            return None
+
+        try:
+            data = self._check_specifier(db.load())
+        except Exception as err:
+            logger.info("Error loading cache database: %s", err)
+            data = None
+
+        if data is None:
+            db.close()
+
+        return data
+
+    def _check_specifier(self, data: CacheData) -> Optional[CacheData]:
         if data.specifier != self.specifier:
             logger.info(
                 "Cache file specifier incompatible: %s != %s",
@@ -160,15 +1082,24 @@ class ParseCache:
     def read(
         self, path: Optional[Path] = None, url_prefix: Optional[str] = None
     ) -> CacheData:
-        path = self.path if path is None else path
+        """Load the cache from the given path, the format of which is determined by its
+        suffix. By default, try the local cache database, then a local gzip archive, and
+        finally a gzip archive published at url_prefix, using the first that is usable.
+        """
         url_prefix = (
             url_prefix if url_prefix else specparser.Spec.get().build.cache_url_prefix
         )
         data: Optional[CacheData] = None
-        try:
-            data = self.read_from_bytes(path.read_bytes())
-        except FileNotFoundError:
-            if url_prefix:
+        if path is not None:
+            data = self._read_path(path)
+        else:
+            # Fall through to the next source if one is missing, invalid, or incompatible
+            if self.path.exists():
+                data = self.read_database(self.path)
+            for archive_path in (self.archive_path, self.codec_archive_path):
+                if data is None and archive_path.exists():
+                    data = self._read_path(archive_path)
+            if data is None and url_prefix:
                 url = url_prefix + self.filename
                 try:
                     data = self.read_from_bytes(util.HTTPCache.singleton().get(url))
@@ -179,24 +1110,94 @@ class ParseCache:
             logger.info("No cache usable")
             data = CacheData(specifier=self.specifier)
 
+        # Share dependency hashes with the rest of this process
+        dependency_hashes = get_dependency_hashes(self.project_config)
+        dependency_hashes.merge(data.dependency_hashes)
+        data.dependency_hashes = dependency_hashes
+
         return data
 
+    def _read_path(self, path: Path) -> Optional[CacheData]:
+        if not self._is_archive(path):
+            return self.read_database(path)
+
+        try:
+            return self.read_from_bytes(path.read_bytes())
+        except FileNotFoundError:
+            return None
+
     @property
     def path(self) -> Path:
+        """The path of this project's cache database."""
+        return self.project_config.root / self.database_filename
+
+    @property
+    def archive_path(self) -> Path:
+        """The path to which this project's cache is exported as a gzip archive."""
         return self.project_config.root / self.filename
 
+    @property
+    def codec_archive_path(self) -> Path:
+        """The path to which this project's cache is exported as an archive compressed with
+        a codec other than gzip."""
+        return self.project_config.root / (self._stem + self.CODEC_ARCHIVE_SUFFIX)
+
+    def get_archive_path(self, codec: Optional[Codec] = None) -> Path:
+        """The path to which this project's cache is exported as an archive compressed with
+        the given codec, by default gzip."""
+        if codec is None or isinstance(codec, GzipCodec):
+            return self.archive_path
+
+        return self.codec_archive_path
+
+    def _is_archive(self, path: Path) -> bool:
+        return path.name.endswith((self.ARCHIVE_SUFFIX, self.CODEC_ARCHIVE_SUFFIX))
+
     @property
     def filename(self) -> str:
-        return f".snooty-{self.project_config.name}-{'_'.join(self.specifier)}.cache.gz"
+        """The filename of this project's cache as a gzip archive, as published remotely."""
+        return self._stem + self.ARCHIVE_SUFFIX
+
+    @property
+    def database_filename(self) -> str:
+        return self._stem + self.DATABASE_SUFFIX
+
+    @property
+    def _stem(self) -> str:
+        return f".snooty-{self.project_config.name}-{'_'.join(self.specifier)}"
 
     def persist(
-        self, data: CacheData, path: Optional[Path] = None, optimize: bool = True
+        self,
+        data: CacheData,
+        path: Optional[Path] = None,
+        optimize: bool = True,
+        codec: Optional[Codec] = None,
     ) -> None:
+        """Write the cache to the given path, by default this project's cache database. If
+        the path ends with ARCHIVE_SUFFIX or CODEC_ARCHIVE_SUFFIX, the cache is exported as
+        an archive (see get_archive_path()). The codec
+        defaults to zlib for entries in a database, and gzip for an archive.
+
+        If data was loaded from the database being written, and no different codec is
+        requested, only entries set since CacheData.begin_update() are written. Otherwise the
+        file is rewritten in full.
+        """
         path = self.path if path is None else path
 
-        if optimize:
-            for key, page_data in data.pages.items():
-                data.pages[key] = pickletools.optimize(page_data)
+        if not self._is_archive(path):
+            if (
+                data.database is not None
+                and data.database.path == path
+                and codec in (None, data.database.codec)
+            ):
+                data.database.update(data)
+            else:
+                self._persist_database(data, path, codec)
+
+                # The database that data was loaded from has been replaced
+                if data.database is not None and data.database.path == path:
+                    data.attach_database(CacheDatabase.open(path))
+            return
 
         # Specify protocol 5 since it's supported by Python 3.8+, our supported
         # versions of Python.
@@ -204,7 +1205,32 @@ class ParseCache:
         if optimize:
             pickled = pickletools.optimize(pickled)
 
-        util.atomic_write(path, gzip.compress(pickled, mtime=0), path.parent)
+        util.atomic_write(
+            path,
+            compression.pack(GzipCodec() if codec is None else codec, pickled),
+            path.parent,
+        )
+
+    def _persist_database(
+        self, data: CacheData, path: Path, codec: Optional[Codec]
+    ) -> None:
+        # Build the database alongside its destination, and atomically move it into place
+        fd, temp_name = tempfile.mkstemp(dir=path.parent, prefix=path.name)
+        os.close(fd)
+        try:
+            os.unlink(temp_name)
+            db = CacheDatabase.create(Path(temp_name), codec)
+            try:
+                db.write(data)
+            finally:
+                db.close()
+            os.replace(temp_name, path)
+        except:
+            try:
+                os.unlink(temp_name)
+            except FileNotFoundError:
+                pass
+            raise
 
     def generate_specifier(self) -> Tuple[str, ...]:
         return (
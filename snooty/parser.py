@@ -1,24 +1,29 @@
 from __future__ import annotations
 
+import concurrent.futures
 import contextlib
 import errno
 import getpass
-import hashlib
 import json
 import logging
 import multiprocessing
+import multiprocessing.pool
 import os
+import queue
 import re
+import sqlite3
 import subprocess
 import threading
+import time
 import urllib.parse
-from collections import defaultdict
+import weakref
+from collections import defaultdict, deque
 from copy import deepcopy
 from dataclasses import dataclass
-from functools import partial
 from pathlib import Path, PurePosixPath
 from typing import (
     Any,
+    Deque,
     Dict,
     Iterable,
     Iterator,
@@ -37,6 +42,7 @@ import requests.exceptions
 from yaml import safe_load
 
 from . import (
+    compression,
     gizaparser,
     n,
     parse_cache,
@@ -85,7 +91,7 @@ from .diagnostics import (
 )
 from .icon_names import ICON_SET, LG_ICON_SET
 from .n import ComposableOption, FileId, SerializableType, TocTreeDirectiveEntry
-from .page import Page, PendingTask
+from .page import NodeIndex, Page, PendingTask
 from .page_database import PageDatabase
 from .postprocess import Postprocessor, PostprocessorResult
 from .specparser import Composable
@@ -1123,10 +1129,10 @@ class JSONVisitor:
             )
 
             try:
-                spec_bytes = filepath.read_bytes()
-                self.dependencies[openapi_fileid] = hashlib.blake2b(
-                    spec_bytes
-                ).hexdigest()
+                spec_bytes, spec_hash = parse_cache.get_dependency_hashes(
+                    self.project_config
+                ).read(openapi_fileid, filepath)
+                self.dependencies[openapi_fileid] = spec_hash
                 spec = json.dumps(safe_load(spec_bytes))
                 spec_node = n.Text((line,), spec)
                 doc.children.append(spec_node)
@@ -1169,14 +1175,16 @@ class JSONVisitor:
 
             # Attempt to read the literally included file
             try:
-                file_data = filepath.read_bytes()
+                file_data, file_hash = parse_cache.get_dependency_hashes(
+                    self.project_config
+                ).read(objective_fileid, filepath)
             except OSError as err:
                 self.diagnostics.append(
                     CannotOpenFile(Path(argument_text), err.strerror, line)
                 )
                 return doc
 
-            self.dependencies[objective_fileid] = hashlib.blake2b(file_data).hexdigest()
+            self.dependencies[objective_fileid] = file_hash
 
             try:
                 text = str(file_data, "utf-8")
@@ -1714,6 +1722,9 @@ def parse_rst(
     top_of_state = visitor.state[-1]
     assert isinstance(top_of_state, n.Root)
     page = Page.create(path, None, text, top_of_state)
+    # Index the finished tree, rather than nodes as they are visited: some subtrees, such
+    # as tabs with unknown IDs, are pruned after they are visited
+    page.node_index = NodeIndex.build(top_of_state)
     page.dependencies = visitor.dependencies
     page.static_assets = visitor.static_assets
     page.pending_tasks = visitor.pending
@@ -1816,6 +1827,217 @@ class EmbeddedRstParser:
         return children
 
 
+# Per-process parser state for ParseWorkerPool workers, set by _initialize_worker().
+_worker_parser: Optional[rstparser.Parser[JSONVisitor]] = None
+_worker_yaml_domain: Optional[gizaparser.domain.GizaYamlDomain] = None
+
+
+def _initialize_worker(
+    config: ProjectConfig, spec: Optional[specparser.Spec] = None
+) -> None:
+    """Pre-warm a worker process: install the parent's rstspec, and build the docutils registry
+    and parser up front so that the first file parsed by each worker does not pay for it.
+    """
+    global _worker_parser, _worker_yaml_domain
+
+    # Workers may be forked in the middle of a build, and outlive it
+    parse_cache.reset_dependency_hashes_after_fork()
+    util.HTTPCache.reset_after_fork()
+
+    if spec is not None:
+        specparser.Spec.SPEC = spec
+
+    specparser.Spec.get(config.config_path)
+    rstparser.Registry.get(config.default_domain)
+    _worker_parser = rstparser.Parser(config, JSONVisitor)
+    _worker_yaml_domain = gizaparser.domain.GizaYamlDomain(config, EmbeddedRstParser)
+
+
+def _parse_rst_in_worker(path: FileId) -> Sequence[Tuple[Page, List[Diagnostic]]]:
+    assert _worker_parser is not None, "worker was not initialized"
+    return parse_rst(_worker_parser, path)
+
+
+def _render_giza_file_in_worker(
+    args: Tuple[str, gizaparser.nodes.GizaFile[Any]]
+) -> Tuple[List[Page], List[Diagnostic]]:
+    assert _worker_yaml_domain is not None, "worker was not initialized"
+    return _worker_yaml_domain.render_file(*args)
+
+
+class ParseWorkerPool:
+    """A lazily-started pool of worker processes that lives as long as its project, so that
+    successive builds and updates do not pay the cost of spawning and warming up workers.
+    The pool should be shut down with close(); if it is dropped without being closed, its
+    workers are terminated once it is garbage collected.
+    """
+
+    def __init__(self, config: ProjectConfig) -> None:
+        self.config = config
+        self._pool: Optional[multiprocessing.pool.Pool] = None
+        self._max_workers: Optional[int] = None
+        self._finalizer: Optional[weakref.finalize] = None
+        self._lock = threading.Lock()
+
+    def get(self, max_workers: Optional[int] = None) -> multiprocessing.pool.Pool:
+        """Return the running pool, starting it if necessary. If max_workers is given and
+        differs from the running pool's size, the pool is restarted."""
+        with self._lock:
+            if self._pool is not None and (
+                max_workers is None or max_workers == self._max_workers
+            ):
+                return self._pool
+
+            self._close()
+            self._pool = multiprocessing.Pool(
+                max_workers,
+                initializer=_initialize_worker,
+                initargs=(self.config, specparser.Spec.SPEC),
+            )
+            self._max_workers = max_workers
+            self._finalizer = weakref.finalize(self, self._pool.terminate)
+            return self._pool
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._pool is None:
+            return
+
+        if self._finalizer is not None:
+            self._finalizer.detach()
+            self._finalizer = None
+
+        # We cannot use the multiprocessing.Pool context manager API due to the following:
+        # https://pytest-cov.readthedocs.io/en/latest/subprocess-support.html#if-you-use-multiprocessing-pool
+        self._pool.close()
+        self._pool.join()
+        self._pool = None
+
+
+class ParseResults:
+    """The results of parsing a set of RST files, in order of completion, whether they were
+    loaded from the parse cache or parsed by a worker process. Like the iterators returned by
+    multiprocessing.Pool.imap_unordered(), next() raises multiprocessing.TimeoutError if no
+    result arrives in time, and StopIteration once every file's result has been returned.
+    """
+
+    def __init__(self, n_files: int, max_in_flight: Optional[int] = None) -> None:
+        self._queue: queue.Queue[
+            Union[Sequence[Tuple[Page, List[Diagnostic]]], BaseException]
+        ] = queue.Queue()
+        self._remaining = n_files
+        self._undelivered = n_files
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+
+        # Files are handed to the pool only max_in_flight at a time, so that other work
+        # submitted to the pool meanwhile does not wait behind every file in the project
+        self._max_in_flight = max_in_flight
+        self._in_flight = 0
+        self._waiting: Deque[Tuple[multiprocessing.pool.Pool, FileId]] = deque()
+
+        #: The time.perf_counter() at which the last file's result was delivered
+        self.end_time: Optional[float] = None
+
+    def put(self, result: Sequence[Tuple[Page, List[Diagnostic]]]) -> None:
+        self._delivered()
+        self._queue.put(result)
+
+    def put_error(self, err: BaseException) -> None:
+        """Record that a file could not be parsed; next() will raise the given exception."""
+        self._delivered()
+        self._queue.put(err)
+
+    def _delivered(self) -> None:
+        with self._lock:
+            self._undelivered -= 1
+            if self._undelivered == 0:
+                self.end_time = time.perf_counter()
+
+    def put_cache_hit(self, page: Page, diagnostics: Sequence[Diagnostic]) -> None:
+        with self._lock:
+            self.hits += 1
+        self.put([(page, list(diagnostics))])
+
+    def parse(self, pool: multiprocessing.pool.Pool, path: FileId) -> None:
+        """Parse a file in the worker pool, delivering its result to this stream."""
+        with self._lock:
+            self.misses += 1
+            if (
+                self._max_in_flight is not None
+                and self._in_flight >= self._max_in_flight
+            ):
+                self._waiting.append((pool, path))
+                return
+
+            self._in_flight += 1
+
+        self._submit(pool, path)
+
+    def _submit(self, pool: multiprocessing.pool.Pool, path: FileId) -> None:
+        while True:
+            try:
+                pool.apply_async(
+                    _parse_rst_in_worker,
+                    (path,),
+                    callback=self._parsed,
+                    error_callback=self._parse_failed,
+                )
+                return
+            except ValueError as err:
+                # The pool was shut down
+                self.put_error(err)
+
+            with self._lock:
+                if not self._waiting:
+                    self._in_flight -= 1
+                    return
+
+                pool, path = self._waiting.popleft()
+
+    def _parsed(self, result: Sequence[Tuple[Page, List[Diagnostic]]]) -> None:
+        self._submit_next()
+        self.put(result)
+
+    def _parse_failed(self, err: BaseException) -> None:
+        self._submit_next()
+        self.put_error(err)
+
+    def _submit_next(self) -> None:
+        with self._lock:
+            if not self._waiting:
+                self._in_flight -= 1
+                return
+
+            pool, path = self._waiting.popleft()
+
+        self._submit(pool, path)
+
+    def next(
+        self, timeout: Optional[float] = None
+    ) -> Sequence[Tuple[Page, List[Diagnostic]]]:
+        if self._remaining == 0:
+            raise StopIteration
+
+        try:
+            result = self._queue.get(timeout=timeout)
+        except queue.Empty:
+            raise multiprocessing.TimeoutError() from None
+
+        self._remaining -= 1
+        if self._remaining == 0:
+            logger.info("cache: %d hits and %d misses", self.hits, self.misses)
+
+        if isinstance(result, BaseException):
+            raise result
+
+        return result
+
+
 class ProjectBackend:
     def on_config(self, config: ProjectConfig, branch: str) -> None:
         pass
@@ -1875,6 +2097,7 @@ class _Project:
 
         self.cache_file = parse_cache.ParseCache(self.config)
         self.cache: Optional[parse_cache.CacheData] = None
+        self.shared_cache: Optional[parse_cache.SharedCache] = None
 
         self.targets, failed_requests = TargetDatabase.load(self.config)
         self.initialization_diagnostics: Dict[FileId, List[Diagnostic]] = defaultdict(
@@ -1981,8 +2204,12 @@ class _Project:
         self.prefix = [self.config.name, username, branch]
 
         self.pages = PageDatabase()
+        self.workers = ParseWorkerPool(self.config)
+        self.parallel_postprocess = False
         self.postprocessor_factory = lambda: Postprocessor(
-            self.config, self.targets.copy_clean_slate()
+            self.config,
+            self.targets.copy_clean_slate(),
+            self.workers.get if self.parallel_postprocess else None,
         )
 
         self.asset_dg: "networkx.DiGraph[FileId]" = networkx.DiGraph()
@@ -2018,6 +2245,11 @@ class _Project:
         else:
             self.update_asset(path)
 
+        self._commit_update(pages, diagnostics)
+
+    def _commit_update(
+        self, pages: List[Page], diagnostics: Dict[FileId, List[Diagnostic]]
+    ) -> None:
         with self._backend_lock:
             for source_path, diagnostic_list in diagnostics.items():
                 self.on_diagnostics(source_path, diagnostic_list)
@@ -2047,19 +2279,75 @@ class _Project:
             self.backend.on_delete(fileid, self.build_identifiers)
 
     def build(
-        self, max_workers: Optional[int] = None, postprocess: bool = True
+        self,
+        max_workers: Optional[int] = None,
+        postprocess: bool = True,
+        one_shot: bool = False,
+        parallel_postprocess: bool = False,
     ) -> None:
+        # Within a build, reuse even those file hashes that cannot be trusted across builds
+        with contextlib.ExitStack() as file_hash_scopes:
+            file_hash_scopes.enter_context(
+                parse_cache.get_dependency_hashes(self.config).build()
+            )
+            if self.cache is not None:
+                file_hash_scopes.enter_context(self.cache.source_hashes.build())
+
+            self._parse_project(max_workers)
+
+        if postprocess:
+            if one_shot:
+                self.pages.transfer_on_flush()
+
+            self.parallel_postprocess = parallel_postprocess
+
+            postprocessor_result = self.postprocess()
+
+            static_files: Dict[str, Union[str, bytes]] = {
+                "objects.inv": self.targets.generate_inventory("").dumps(
+                    self.config.name, ""
+                )
+            }
+
+            if "static_files" in postprocessor_result.metadata:
+                cast(
+                    Dict[str, Union[str, bytes]],
+                    postprocessor_result.metadata["static_files"],
+                ).update(static_files)
+
+            with util.PerformanceLogger.singleton().start("commit"):
+                with self._backend_lock:
+                    pages = postprocessor_result.pages
+                    for fileid in list(pages.keys()):
+                        # Nothing reads the pages of a one-shot build after they are
+                        # committed, so release each one as soon as it is
+                        page = pages.pop(fileid) if one_shot else pages[fileid]
+                        self.backend.on_update(
+                            self.prefix, self.build_identifiers, fileid, page
+                        )
+                    self.backend.flush()
+
+            with self._backend_lock:
+                self.backend.on_update_metadata(
+                    self.prefix, self.build_identifiers, postprocessor_result.metadata
+                )
+
+    def _parse_project(self, max_workers: Optional[int]) -> None:
+        """Parse every source file in the project, reusing cached results where possible."""
         nested_projects_diagnostics: Dict[FileId, List[Diagnostic]] = {}
 
-        with util.PerformanceLogger.singleton().start("parse rst"):
-            paths = util.get_files(
-                self.config.source_path,
-                RST_EXTENSIONS,
-                self.config.root,
-                nested_projects_diagnostics,
-            )
-            fileids = (self.config.get_fileid(path) for path in paths)
-            self.parse_rst_files(fileids, max_workers)
+        # Parsing RST is the bulk of the work. Hand it off to our workers, and ingest
+        # pre-existing AST and generate YAML pages while they are busy, committing parse
+        # results to the page database as they arrive.
+        parse_rst_start_time = time.perf_counter()
+        paths = util.get_files(
+            self.config.source_path,
+            RST_EXTENSIONS,
+            self.config.root,
+            nested_projects_diagnostics,
+        )
+        fileids = (self.config.get_fileid(path) for path in paths)
+        rst_results = self._start_parsing_rst_files(fileids, max_workers)
 
         # Handle custom AST from API reference docs
         with util.PerformanceLogger.singleton().start("parse pre-existing AST"):
@@ -2103,54 +2391,47 @@ class _Project:
                 except Exception as e:
                     logger.error(e)
 
+                self._commit_rst_results(rst_results, block=False)
+
         for nested_path, diagnostics in nested_projects_diagnostics.items():
             with self._backend_lock:
                 self.on_diagnostics(nested_path, diagnostics)
 
         all_yaml_diagnostics: Dict[FileId, List[Diagnostic]] = defaultdict(list)
         with util.PerformanceLogger.singleton().start("generate yaml"):
-            yaml_pages = list(
-                self.yaml_domain.load_and_generate(all_yaml_diagnostics, self.cache)
-            )
-            for page, page_diagnostics in yaml_pages:
+            seen_paths: Set[FileId] = set()
+            for page, page_diagnostics in self.yaml_domain.load_and_generate(
+                all_yaml_diagnostics,
+                self.cache,
+                lambda category_name, giza_nodes: self._render_giza_files(
+                    category_name, giza_nodes, max_workers
+                ),
+            ):
                 self._page_updated(page, page_diagnostics)
+                seen_paths.add(page.fileid)
+                self._commit_rst_results(rst_results, block=False)
 
             # Handle parsing and unmarshaling errors that lead to diagnostics not associated with
             # any page.
-            seen_paths = set(page[0].fileid for page in yaml_pages)
             for key in all_yaml_diagnostics:
                 if key not in seen_paths:
                     self.pages.set_orphan_diagnostics(key, all_yaml_diagnostics[key])
                     with self._backend_lock:
                         self.on_diagnostics(key, all_yaml_diagnostics[key])
 
-        if postprocess:
-            postprocessor_result = self.postprocess()
-
-            static_files: Dict[str, Union[str, bytes]] = {
-                "objects.inv": self.targets.generate_inventory("").dumps(
-                    self.config.name, ""
-                )
-            }
+        self._commit_rst_results(rst_results, block=True)
 
-            if "static_files" in postprocessor_result.metadata:
-                cast(
-                    Dict[str, Union[str, bytes]],
-                    postprocessor_result.metadata["static_files"],
-                ).update(static_files)
-
-            with util.PerformanceLogger.singleton().start("commit"):
-                with self._backend_lock:
-                    for fileid, page in postprocessor_result.pages.items():
-                        self.backend.on_update(
-                            self.prefix, self.build_identifiers, fileid, page
-                        )
-                    self.backend.flush()
-
-            with self._backend_lock:
-                self.backend.on_update_metadata(
-                    self.prefix, self.build_identifiers, postprocessor_result.metadata
-                )
+        # Only count the time until the last RST file was parsed, not the work done on the
+        # side while waiting for it
+        util.PerformanceLogger.singleton().record(
+            "parse rst",
+            parse_rst_start_time,
+            (
+                rst_results.end_time
+                if rst_results is not None and rst_results.end_time is not None
+                else parse_rst_start_time
+            ),
+        )
 
     def cancel_postprocessor(self) -> None:
         self.pages.cancel()
@@ -2179,46 +2460,138 @@ class _Project:
     def parse_rst_files(
         self, paths: Iterable[FileId], max_workers: Optional[int] = None
     ) -> None:
-        pool = multiprocessing.Pool(max_workers)
-        try:
-            logger.debug("Processing rst files")
-            cache_misses: List[FileId] = []
+        results = self._start_parsing_rst_files(paths, max_workers)
+        self._commit_rst_results(results, block=True)
+
+    def _start_parsing_rst_files(
+        self, paths: Iterable[FileId], max_workers: Optional[int]
+    ) -> Optional[ParseResults]:
+        """Begin loading cached pages and parsing the rest in the worker pool. Returns a stream
+        of results as they become available, or None if there is nothing to parse.
+
+        Validating and loading cached pages is mostly file I/O and hashing, so it is spread
+        across a pool of threads; each cache miss is handed to a worker process as soon as it
+        is found.
+        """
+        logger.debug("Processing rst files")
+        paths = list(paths)
+        if not paths:
+            return None
 
-            hits = 0
+        # Keep a couple of files per worker queued, so that Giza pages, which are rendered
+        # in the same pool as they are generated, need not wait for every RST file
+        results = ParseResults(len(paths), 2 * (max_workers or os.cpu_count() or 1))
 
-            if self.cache is None:
-                cache_misses = list(paths)
+        # Start the pool before any lookup threads exist: forking while one of them holds
+        # a lock would leave that lock held forever in the workers
+        pool = self.workers.get(max_workers)
+        if self.cache is None:
+            for path in paths:
+                results.parse(pool, path)
+            return results
+
+        cache = self.cache
+
+        def load_from_cache(path: FileId) -> None:
+            try:
+                page, diagnostics = cache.get(self.config, path)
+            except parse_cache.CacheMiss:
+                results.parse(pool, path)
+            except BaseException as err:
+                results.put_error(err)
             else:
-                for path in paths:
-                    try:
-                        page, diagnostics = self.cache.get(self.config, path)
-                        self._page_updated(page, diagnostics)
-                        hits += 1
-                    except parse_cache.CacheMiss:
-                        cache_misses.append(path)
-
-            logger.info("cache: %d hits and %d misses", hits, len(cache_misses))
-
-            results = pool.imap_unordered(partial(parse_rst, self.parser), cache_misses)
-            for sequence in results:
-                for page, diagnostics in sequence:
-                    self._page_updated(page, diagnostics)
-
-        finally:
-            # We cannot use the multiprocessing.Pool context manager API due to the following:
-            # https://pytest-cov.readthedocs.io/en/latest/subprocess-support.html#if-you-use-multiprocessing-pool
-            pool.close()
-            pool.join()
-
-    def load_cache(self) -> None:
+                results.put_cache_hit(page, diagnostics)
+
+        executor = concurrent.futures.ThreadPoolExecutor(
+            max_workers or os.cpu_count(), thread_name_prefix="snooty-cache"
+        )
+        for path in paths:
+            executor.submit(load_from_cache, path)
+
+        # Let the threads exit once the queued lookups are done
+        executor.shutdown(wait=False)
+        return results
+
+    def _render_giza_files(
+        self,
+        category_name: str,
+        giza_nodes: Sequence[gizaparser.nodes.GizaFile[Any]],
+        max_workers: Optional[int],
+    ) -> Iterable[Tuple[List[Page], List[Diagnostic]]]:
+        """Render reified Giza files into pages using the worker pool."""
+        if not giza_nodes:
+            return []
+
+        pool = self.workers.get(max_workers)
+        chunksize = max(1, len(giza_nodes) // (4 * (os.cpu_count() or 1)))
+        return pool.imap(
+            _render_giza_file_in_worker,
+            ((category_name, giza_node) for giza_node in giza_nodes),
+            chunksize,
+        )
+
+    def _commit_rst_results(self, results: Optional[ParseResults], block: bool) -> None:
+        """Commit parse results returned by _start_parsing_rst_files(). If block is False,
+        only commit those results which are already available."""
+        if results is None:
+            return
+
+        while True:
+            try:
+                sequence = results.next(timeout=None if block else 0)
+            except StopIteration:
+                return
+            except multiprocessing.TimeoutError:
+                return
+
+            for page, diagnostics in sequence:
+                self._page_updated(page, diagnostics)
+
+    def load_cache(self, paranoid: bool = False, shared: bool = False) -> None:
         with util.PerformanceLogger.singleton().start("loading cache"):
+            if self.cache is not None:
+                self.cache.close()
             self.cache = self.cache_file.read()
+            self.cache.set_paranoid(paranoid)
+
+            if shared and self.shared_cache is None:
+                try:
+                    self.shared_cache = parse_cache.SharedCache.open()
+                except (OSError, sqlite3.Error) as err:
+                    logger.warning("Failed to open shared parse cache: %s", err)
+            self.cache.shared = self.shared_cache
 
-    def update_cache(self, optimize: bool = True) -> None:
-        cache = parse_cache.CacheData(self.cache_file.generate_specifier(), {})
-        self.pages.add_to_cache(cache)
-        cache.ingest_yaml(self.yaml_domain)
-        self.cache_file.persist(cache, optimize=optimize)
+    def update_cache(
+        self,
+        optimize: bool = True,
+        archive: bool = False,
+        codec: Optional[compression.Codec] = None,
+    ) -> None:
+        # Update a loaded cache database in place, so that unchanged entries need not be
+        # serialized and written again. Otherwise start from scratch.
+        cache = self.cache
+        if archive or cache is None or cache.database is None:
+            cache = parse_cache.CacheData(self.cache_file.generate_specifier(), {})
+            cache.shared = self.shared_cache
+
+        with cache.begin_update():
+            self.pages.add_to_cache(cache, optimize)
+            if self.cache is not None:
+                cache.ingest_file_hashes(self.cache)
+            cache.ingest_yaml(self.yaml_domain)
+
+        self.cache_file.persist(
+            cache,
+            self.cache_file.get_archive_path(codec) if archive else None,
+            optimize=optimize,
+            codec=codec,
+        )
+
+        if self.shared_cache is not None:
+            try:
+                self.shared_cache.evict()
+            except sqlite3.OperationalError as err:
+                logger.warning("Failed to evict from the shared parse cache: %s", err)
 
     def set_diagnostics(self, path: FileId, diagnostics: List[Diagnostic]) -> None:
         self.backend.set_diagnostics(path, filter_diagnostics(self.config, diagnostics))
@@ -2258,13 +2631,41 @@ class _Project:
 
     def update_asset(self, fileid: FileId) -> None:
         # Rebuild any pages depending on this asset
-        for page_id in list(self.asset_dg.predecessors(fileid)):
-            self.update(self.pages[page_id].fileid)
+        dependents = list(self.asset_dg.predecessors(fileid))
+        rst_dependents = [path for path in dependents if path.suffix in RST_EXTENSIONS]
+
+        # Widely-used assets can have many dependents; re-parse those using the worker pool.
+        if len(rst_dependents) > 1:
+            results = self.workers.get().imap(_parse_rst_in_worker, rst_dependents)
+            for path, sequence in zip(rst_dependents, results):
+                pages: List[Page] = []
+                diagnostics: Dict[FileId, List[Diagnostic]] = {path: []}
+                for page, page_diagnostics in sequence:
+                    pages.append(page)
+                    diagnostics[path] = page_diagnostics
+                self._commit_update(pages, diagnostics)
+
+            dependents = [
+                path for path in dependents if path.suffix not in RST_EXTENSIONS
+            ]
+
+        for path in dependents:
+            self.update(path)
+
+    def close(self) -> None:
+        """Shut down this project's worker processes, and close its parse cache."""
+        self.workers.close()
+        if self.cache is not None:
+            self.cache.close()
+        if self.shared_cache is not None:
+            self.shared_cache.close()
 
 
 class Project:
     """A Snooty project, providing high-level operations on a project such as
-    requesting a rebuild, and updating a file based on new contents.
+    requesting a rebuild, and updating a file based on new contents. Projects should be
+    closed once they are no longer needed, either with close() or by using the project as
+    a context manager.
 
     This class's public methods are thread-safe."""
 
@@ -2305,11 +2706,22 @@ class Project:
             self._project.delete(path)
 
     def build(
-        self, max_workers: Optional[int] = None, postprocess: bool = True
+        self,
+        max_workers: Optional[int] = None,
+        postprocess: bool = True,
+        one_shot: bool = False,
+        parallel_postprocess: bool = False,
     ) -> None:
-        """Build the full project."""
+        """Build the full project. If one_shot is set, the postprocessor modifies the parsed
+        pages in place instead of copying them, and each page is released once it has been
+        committed to the backend; the parsed pages can then no longer be rebuilt or cached.
+        If parallel_postprocess is set, passes of page-local postprocessing handlers are run
+        on shards of the project's pages in the worker pool.
+        """
         with self._lock:
-            self._project.build(max_workers, postprocess)
+            self._project.build(
+                max_workers, postprocess, one_shot, parallel_postprocess
+            )
 
     def postprocess(self) -> None:
         # The postprocessor is the only method that is intended to be thread-safe without the
@@ -2319,13 +2731,35 @@ class Project:
     def cancel_postprocessor(self) -> None:
         self._project.cancel_postprocessor()
 
-    def load_cache(self) -> None:
+    def load_cache(self, paranoid: bool = False, shared: bool = False) -> None:
+        """Load the parse cache. If paranoid is set, always hash files to validate cache
+        entries, instead of trusting unchanged stat information. If shared is set, also
+        look up pages in, and contribute pages to, the cache shared between projects."""
         with self._lock:
-            self._project.load_cache()
+            self._project.load_cache(paranoid, shared)
 
-    def update_cache(self, optimize: bool = True) -> None:
+    def update_cache(
+        self,
+        optimize: bool = True,
+        archive: bool = False,
+        codec: Optional[compression.Codec] = None,
+    ) -> None:
+        """Persist the parse cache. If archive is set, export it as a single archive
+        suitable for publishing, instead of updating the local cache database. If a codec
+        is given, compress the cache with it."""
         with self._lock:
-            self._project.update_cache(optimize)
+            self._project.update_cache(optimize, archive, codec)
+
+    def close(self) -> None:
+        """Release resources held by this project, such as its worker processes."""
+        with self._lock:
+            self._project.close()
+
+    def __enter__(self) -> "Project":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
 
     @contextlib.contextmanager
     def _get_inner(self) -> Iterator[_Project]:
@@ -19,6 +19,7 @@ def main() -> None:
 
         print(f"run {i+1}/{n_runs}")
         project.build(1)
+        project.close()
         with PerformanceLogger.singleton().start("serialization"):
             for page in backend.pages.values():
                 page.ast.serialize()
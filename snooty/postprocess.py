@@ -1,6 +1,8 @@
 import collections
 import errno
+import functools
 import logging
+import multiprocessing.pool
 import os.path
 import sys
 import threading
@@ -11,11 +13,14 @@ from copy import deepcopy
 from dataclasses import asdict, dataclass, field
 from pathlib import Path, PurePath
 from typing import (
+    AbstractSet,
     Any,
     Callable,
+    ClassVar,
     Dict,
     Iterable,
     List,
+    Mapping,
     MutableSequence,
     NamedTuple,
     Optional,
@@ -74,7 +79,7 @@ from .flutter import check_type, checked
 from .n import FileId, SerializableType
 from .page import Page
 from .target_database import TargetDatabase
-from .types import Facet, ProjectConfig
+from .types import Facet, ProjectConfig, normalize_target
 from .util import EXT_FOR_PAGE, SOURCE_FILE_EXTENSIONS, bundle, is_txt_in_reserved_dir
 
 logger = logging.getLogger(__name__)
@@ -139,17 +144,49 @@ def extract_inline(
     return None
 
 
+class PageDependencies:
+    """What postprocessing a page read, besides the page itself."""
+
+    __slots__ = ("includes", "targets", "suggestions", "project_wide")
+
+    def __init__(self) -> None:
+        #: The slugs of the files that the page includes, directly or not, whether or not
+        #: they exist
+        self.includes: Set[str] = set()
+
+        #: The normalized keys of the targets that the page refers to, including the
+        #: std:doc targets of pages whose titles it uses
+        self.targets: Set[str] = set()
+
+        #: Whether suggestions were drawn from the keys of every target in the project
+        self.suggestions = False
+
+        #: Whether a project-wide handler was called on the page
+        self.project_wide = False
+
+
 class Context:
     """Store and refer to an instance of a type by that type. This allows referring to
     arbitrary data stores in a type-safe way."""
 
-    __slots__ = ("_ctx", "diagnostics", "pages")
+    __slots__ = ("_ctx", "diagnostics", "pages", "sources", "dependencies")
 
-    def __init__(self, pages: Dict[FileId, Page]) -> None:
+    def __init__(
+        self,
+        pages: Dict[FileId, Page],
+        sources: Optional[Mapping[FileId, Page]] = None,
+    ) -> None:
         self._ctx: Dict[type, object] = {}
         self.diagnostics: Dict[FileId, List[Diagnostic]] = defaultdict(list)
         self.pages = pages
 
+        #: The parsed pages from which includes are expanded. Pages reused from a previous
+        #: run are already postprocessed in pages, and must not be expanded from there.
+        self.sources = pages if sources is None else sources
+
+        #: The dependencies of the page being postprocessed
+        self.dependencies = PageDependencies()
+
     def add(self, val: object) -> None:
         """Add a given instance to this context. If an instance of the same type has
         previously been added, it will be overwritten."""
@@ -163,15 +200,16 @@ class Context:
         return val
 
 
-def propagate_facets(pages: Dict[FileId, Page], context: Context) -> None:
+def find_facets(context: Context) -> Dict[FileId, List[Facet]]:
     """Scans through each directory starting at source/ and
     loads the facets.toml file if one exists. These values get propagated
-    to each subsequent level to add them to the page.facets property if a
-    facets.toml file does not exist in that child directory.
+    to each subsequent level, and are returned as the facets of each file
+    if a facets.toml file does not exist in that child directory.
     """
     config = context[ProjectConfig]
     root = config.source_path
     parent_facets = None
+    result: Dict[FileId, List[Facet]] = {}
 
     for base, _, files in os.walk(root):
         if "facets.toml" in files:
@@ -202,16 +240,65 @@ def propagate_facets(pages: Dict[FileId, Page], context: Context) -> None:
                     # .ast files have their .txt fileids spoofed
                     fileid = FileId(fileid.as_posix().replace(".ast", ".txt"))
 
-                page = pages[fileid]
-                page.facets = parent_facets
+                result[fileid] = parent_facets
+
+    return result
 
 
 class Handler:
     """Base class for postprocessing event handlers."""
 
+    #: If set, enter_node() and exit_node() are only called for nodes of these types
+    node_types: ClassVar[Optional[Tuple[Type[n.Node], ...]]] = None
+
+    #: If set, enter_node() and exit_node() are only called for those directives (nodes
+    #: of type n.Directive, or a subclass) with these names
+    directive_names: ClassVar[Optional[AbstractSet[str]]] = None
+
+    #: Page-local handlers only modify the page being processed, report diagnostics, and
+    #: define targets; any other state that they accumulate is returned by shard_state().
+    #: A pass made up of page-local handlers may be run on shards of the project's pages
+    #: in worker processes, whose Context holds only the ProjectConfig, a TargetDatabase
+    #: with no inventories, the shard's pages, and the pass's own handlers.
+    page_local: ClassVar[bool] = False
+
+    #: Project-wide handlers accumulate state across pages which shard_state() cannot
+    #: return page by page. Every page on which such a handler is called is postprocessed
+    #: again on each run, rather than being reused from the previous run.
+    project_wide: ClassVar[bool] = False
+
+    #: The kinds of state which this handler writes, such as "titles" or "targets". These
+    #: are used by schedule_passes() to order it before the handlers which read them.
+    writes: ClassVar[AbstractSet[str]] = frozenset()
+
+    #: The kinds of state which must be complete before this handler visits any page: it
+    #: is run in a later pass than every handler which writes them. By default, handlers
+    #: see pages whose includes and substitutions have been expanded.
+    reads: ClassVar[AbstractSet[str]] = frozenset({"includes", "substitutions"})
+
+    #: The kinds of state which this handler only reads from each node once the handlers
+    #: which write them have visited it. It may be run in the same pass as those
+    #: handlers, provided that it is listed after them.
+    follows: ClassVar[AbstractSet[str]] = frozenset()
+
     def __init__(self, context: Context) -> None:
         self.context = context
 
+    def shard_state(self) -> Any:
+        """Return the state that this handler accumulated from a shard of pages, to be
+        passed to merge_shard_state() in the main process."""
+        return None
+
+    def merge_shard_state(self, state: Any) -> None:
+        """Merge the state returned by shard_state() from a shard of pages. Shards are
+        merged in page order."""
+        pass
+
+    def reset_shard_state(self) -> None:
+        """Discard the state that shard_state() returns, so that the state accumulated
+        from each page can be recorded separately."""
+        pass
+
     def enter_node(self, fileid_stack: FileIdStack, node: n.Node) -> None:
         pass
 
@@ -229,6 +316,10 @@ class ProgramOptionHandler(Handler):
     """Handle the program & option rstobjects, using the last program target
     to populate option targets."""
 
+    node_types = (n.Target,)
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.pending_program: Optional[n.Target] = None
@@ -277,16 +368,34 @@ class IncludeHandler(Handler):
     Because the include contents are added to the tree on which the event parser is
     running, they will automatically be parsed and have their includes expanded, too."""
 
+    node_types = (n.Directive,)
+    directive_names = {"include", "sharedinclude"}
+    writes = {"includes"}
+    reads = frozenset()
+
+    class Expansion(NamedTuple):
+        children: MutableSequence[n.Node]
+        any_start: bool
+        any_end: bool
+        error: Optional[str]
+
     def __init__(
         self,
         context: Context,
     ) -> None:
         super().__init__(context)
         self.pages = context.pages
+        self.sources = context.sources
         self.slug_fileid_mapping: Dict[str, FileId] = {
             key.without_known_suffix: key for key in self.pages
         }
 
+        # Included subtrees, keyed by include fileid, start-after, and end-before. These are
+        # never modified: each include directive receives its own copy.
+        self.expansions: Dict[
+            Tuple[FileId, Optional[str], Optional[str]], IncludeHandler.Expansion
+        ] = {}
+
     @staticmethod
     def is_bound(node: n.Node, search_text: Optional[str]) -> bool:
         """Helper function to determine if the given node contains specified start-after or end-before text.
@@ -359,11 +468,13 @@ class IncludeHandler(Handler):
 
         include_slug = clean_slug(argument)
         include_fileid = self.slug_fileid_mapping.get(include_slug)
+        self.context.dependencies.includes.add(include_slug)
         # Some `include` FileIds in the mapping include file extensions (.yaml) and others do not
         # This will likely be resolved by DOCSP-7159 https://jira.mongodb.org/browse/DOCSP-7159
         if include_fileid is None:
             include_slug = argument.strip("/")
             include_fileid = self.slug_fileid_mapping.get(include_slug)
+            self.context.dependencies.includes.add(include_slug)
 
             if include_fileid is None:
                 # sharedinclude diagnostics have already been raised in the JSONVisitor
@@ -377,31 +488,29 @@ class IncludeHandler(Handler):
                     )
                 return
 
-        include_page = self.pages.get(include_fileid)
+        include_page = self.sources.get(include_fileid)
         assert include_page is not None
-        ast = include_page.ast
         self.context.pages[fileid_stack.root].static_assets.update(
             include_page.static_assets
         )
-        assert isinstance(ast, n.Parent)
-        deep_copy_children: MutableSequence[n.Node] = [util.fast_deep_copy(ast)]
 
-        # TODO: Move subgraphing implementation into parse layer, where we can
-        # ideally take subgraph of the raw RST
         start_after_text = node.options.get("start-after")
         end_before_text = node.options.get("end-before")
+        key = (include_fileid, start_after_text, end_before_text)
+        expansion = self.expansions.get(key)
+        if expansion is None:
+            expansion = self.expand(include_page, start_after_text, end_before_text)
+            self.expansions[key] = expansion
+
+        # Nested includes are expanded as the event parser walks into this copy
+        deep_copy_children = n.deep_copy(expansion.children)
 
         if start_after_text or end_before_text:
             line = node.span[0]
-            any_start, any_end = False, False
-            try:
-                # Returns a subgraph of the AST based on text bounds
-                deep_copy_children, any_start, any_end = self.bound_included_AST(
-                    deep_copy_children, start_after_text, end_before_text
-                )
-            except Exception as e:
+            any_start, any_end = expansion.any_start, expansion.any_end
+            if expansion.error is not None:
                 self.context.diagnostics[fileid_stack.current].append(
-                    InvalidInclude(str(e), line)
+                    InvalidInclude(expansion.error, line)
                 )
             # Confirm that we found all specified text (with helpful diagnostic )message if not)
             msg = "Please be sure your text is a comment or label. Search is case-sensitive."
@@ -428,16 +537,62 @@ class IncludeHandler(Handler):
         ]
         node.children.extend(deep_copy_children)
 
+    def get_include_fileid(self, argument: str) -> Optional[FileId]:
+        """Return the fileid of the file that an include directive with the given
+        argument includes, if it exists."""
+        return self.slug_fileid_mapping.get(
+            clean_slug(argument)
+        ) or self.slug_fileid_mapping.get(argument.strip("/"))
+
+    def expand(
+        self,
+        include_page: Page,
+        start_after_text: Optional[str],
+        end_before_text: Optional[str],
+    ) -> "IncludeHandler.Expansion":
+        """Return the subtree with which to replace the children of include directives
+        referring to the given page and bounds."""
+        ast = include_page.ast
+        assert isinstance(ast, n.Parent)
+        children: MutableSequence[n.Node] = [n.deep_copy(ast)]
+        if not (start_after_text or end_before_text):
+            return self.Expansion(children, False, False, None)
+
+        # TODO: Move subgraphing implementation into parse layer, where we can
+        # ideally take subgraph of the raw RST
+        try:
+            # Returns a subgraph of the AST based on text bounds
+            bounded_children, any_start, any_end = self.bound_included_AST(
+                children, start_after_text, end_before_text
+            )
+        except Exception as e:
+            return self.Expansion(children, False, False, str(e))
+
+        return self.Expansion(bounded_children, any_start, any_end, None)
+
 
 class NamedReferenceHandlerPass1(Handler):
     """Identify non-anonymous hyperlinks (i.e. those defined with a single underscore) and save them according to {name: url}.
     Attach the associated URL to any uses of this named reference.
     """
 
+    node_types = (n.NamedReference,)
+    writes = {"named-references"}
+    reads = Handler.reads | {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.named_references: Dict[FileId, Dict[str, str]] = defaultdict(dict)
 
+    def shard_state(self) -> Dict[FileId, Dict[str, str]]:
+        return self.named_references
+
+    def merge_shard_state(self, state: Dict[FileId, Dict[str, str]]) -> None:
+        self.named_references.update(state)
+
+    def reset_shard_state(self) -> None:
+        self.named_references = defaultdict(dict)
+
     def enter_node(self, fileid_stack: FileIdStack, node: n.Node) -> None:
         if not isinstance(node, n.NamedReference):
             return
@@ -450,6 +605,9 @@ class NamedReferenceHandlerPass2(Handler):
     Attach the associated URL to any uses of this named reference.
     """
 
+    node_types = (n.Reference,)
+    reads = Handler.reads | {"named-references"}
+
     def enter_node(self, fileid_stack: FileIdStack, node: n.Node) -> None:
         if not isinstance(node, n.Reference):
             return
@@ -479,6 +637,17 @@ SelectorId = Dict[str, Union[str, Dict[str, str], "SelectorId"]]
 class ContentsHandler(Handler):
     """Identify all headings on a given page. If a contents directive appears on the page, save list of headings as a page-level option."""
 
+    node_types = (n.Section, n.Heading, n.Directive)
+    directive_names = {
+        "method-option",
+        "tab",
+        "selected-content",
+        "contents",
+        "collapsible",
+    }
+    page_local = True
+    writes = {"pages"}
+
     class HeadingData(NamedTuple):
         depth: int
         id: str
@@ -591,6 +760,10 @@ class ContentsHandler(Handler):
 
 
 class TabsSelectorHandler(Handler):
+    node_types = (n.Directive,)
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.default_tabs: Dict[str, str] = {}
@@ -719,6 +892,10 @@ class TabsSelectorHandler(Handler):
 
 
 class TargetHandler(Handler):
+    node_types = (n.Target,)
+    writes = {"targets"}
+    reads = Handler.reads | {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.target_counter: typing.Counter[str] = collections.Counter()
@@ -773,6 +950,11 @@ class HeadingHandler(Handler):
     """Construct a slug-title mapping of all pages in property, and rewrite
     heading IDs so as to be unique."""
 
+    node_types = (n.Heading, n.Directive)
+    directive_names = {"collapsible"}
+    page_local = True
+    writes = {"pages", "titles", "targets"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.heading_counter: typing.Counter[str] = collections.Counter()
@@ -782,6 +964,16 @@ class HeadingHandler(Handler):
     def exit_page(self, fileid_stack: FileIdStack, page: Page) -> None:
         self.heading_counter.clear()
 
+    def shard_state(self) -> Dict[str, Sequence[n.InlineNode]]:
+        return self.slug_title_mapping
+
+    def merge_shard_state(self, state: Dict[str, Sequence[n.InlineNode]]) -> None:
+        for slug, title in state.items():
+            self.slug_title_mapping.setdefault(slug, title)
+
+    def reset_shard_state(self) -> None:
+        self.slug_title_mapping = {}
+
     def get_title(self, slug: str) -> Optional[Sequence[n.InlineNode]]:
         return self.slug_title_mapping.get(slug)
 
@@ -835,6 +1027,10 @@ class HeadingHandler(Handler):
 class TocTitleHandler(Handler):
     """Construct a slug - toctree label mapping of all pages in property"""
 
+    node_types = (n.TocTreeDirective,)
+    page_local = True
+    writes = {"titles"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.slug_title_mapping: Dict[str, str] = {}
@@ -842,6 +1038,16 @@ class TocTitleHandler(Handler):
     def get_title(self, slug: str) -> Optional[str]:
         return self.slug_title_mapping.get(slug)
 
+    def shard_state(self) -> Dict[str, str]:
+        return self.slug_title_mapping
+
+    def merge_shard_state(self, state: Dict[str, str]) -> None:
+        for slug, title in state.items():
+            self.slug_title_mapping.setdefault(slug, title)
+
+    def reset_shard_state(self) -> None:
+        self.slug_title_mapping = {}
+
     def enter_node(self, fileid_stack: FileIdStack, node: n.Node) -> None:
         if not isinstance(node, n.TocTreeDirective):
             return
@@ -857,6 +1063,9 @@ class BannerHandler(Handler):
     """Traverse a series of pages matching specified targets in Snooty.toml
     and append Banner directive nodes"""
 
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         self.banners = context[ProjectConfig].banner_nodes
         self.root = context[ProjectConfig].root
@@ -926,6 +1135,11 @@ class BannerHandler(Handler):
 class GuidesHandler(Handler):
     """Constructs a dictionary of chapters and their data and returns metadata on individual guides."""
 
+    node_types = (n.Directive,)
+    directive_names = {"chapters", "time", "short-description"}
+    project_wide = True
+    reads = Handler.reads | {"pages"}
+
     @dataclass
     class ChapterData:
         id: str
@@ -1126,6 +1340,11 @@ class OpenAPIData:
 class OpenAPIHandler(Handler):
     """Constructs metadata for OpenAPI content pages."""
 
+    node_types = (n.Directive,)
+    directive_names = {"openapi"}
+    project_wide = True
+    reads = Handler.reads | {"pages"}
+
     @dataclass
     class SourceData:
         source_type: str
@@ -1239,6 +1458,11 @@ class OpenAPIHandler(Handler):
 class OpenAPIChangelogHandler(Handler):
     """Constructs metadata for OpenAPI content pages."""
 
+    node_types = (n.Directive,)
+    directive_names = {"openapi-changelog"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.has_changelog_directive = False
@@ -1263,6 +1487,11 @@ class OpenAPIChangelogHandler(Handler):
 class InstruqtHandler(Handler):
     """Identify if Instruqt directive is present on a page and add title as a page-level option if so"""
 
+    node_types = (n.Directive,)
+    directive_names = {"instruqt"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.has_instruqt_drawer = False
@@ -1296,6 +1525,11 @@ class InstruqtHandler(Handler):
 class IAHandler(Handler):
     """Identify IA directive on a page and save a list of its entries as a page-level option."""
 
+    node_types = (n.Directive,)
+    directive_names = {"ia", "card-group"}
+    project_wide = True
+    reads = Handler.reads | {"pages", "titles"}
+
     class IAData(NamedTuple):
         title: Sequence[n.InlineNode]
         url: Optional[str]
@@ -1470,6 +1704,19 @@ class IAHandler(Handler):
 
 
 class SubstitutionHandler(Handler):
+    node_types = (
+        n.Directive,
+        n.SubstitutionDefinition,
+        n.SubstitutionReference,
+        n.BlockSubstitutionReference,
+    )
+    directive_names = {"include", "sharedinclude"}
+    page_local = True
+    writes = {"substitutions"}
+    reads = frozenset()
+    # Includes are expanded as they are entered, before the event parser walks into them
+    follows = {"includes"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.project_config = context[ProjectConfig]
@@ -1648,6 +1895,9 @@ class SubstitutionHandler(Handler):
 
 
 class AddTitlesToLabelTargetsHandler(Handler):
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.pending_targets: List[n.Node] = []
@@ -1686,6 +1936,10 @@ class FootnoteHandler(Handler):
     across a single page.
     """
 
+    node_types = (n.FootnoteReference,)
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         # Footnote reference ids from tinydocutils starts at 1
@@ -1703,6 +1957,9 @@ class FootnoteHandler(Handler):
 
 
 class RefsHandler(Handler):
+    node_types = (n.RefRole,)
+    reads = Handler.reads | {"pages", "titles", "targets"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.project_config = context[ProjectConfig]
@@ -1725,6 +1982,7 @@ class RefsHandler(Handler):
             return
 
         key += f":{node.target}"
+        self.context.dependencies.targets.add(normalize_target(key))
 
         # Add title and link target to AST
         target_candidates = self.targets[key]
@@ -1745,6 +2003,7 @@ class RefsHandler(Handler):
 
             # See if there are any near matches
             suggestions = self.targets.get_suggestions(key)
+            self.context.dependencies.suggestions = True
 
             self.context.diagnostics[fileid_stack.current].append(
                 TargetNotFound(node.name, node.target, suggestions, line)
@@ -1844,6 +2103,8 @@ class RefsHandler(Handler):
         )
         slug = clean_slug(relative.as_posix())
         title = self.context[HeadingHandler].get_title(slug)
+        # Page titles change along with the std:doc targets that HeadingHandler defines
+        self.context.dependencies.targets.add(normalize_target(f"std:doc:{slug}"))
 
         if not title:
             line = node.span[0]
@@ -1858,6 +2119,11 @@ class RefsHandler(Handler):
 class FacetsHandler(Handler):
     """Builds page.facets depending on facets found on nodes on this page"""
 
+    node_types = (n.Directive,)
+    directive_names = {"facet"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
 
@@ -1948,6 +2214,11 @@ class ImageHandler(Handler):
     An image is considered below the fold if section index > 1 or index of image on page > 2
     """
 
+    node_types = (n.Section, n.Directive)
+    directive_names = {"image", "figure"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.current_section = 0
@@ -1979,6 +2250,11 @@ class CollapsibleHandler(Handler):
     """Handles nested collapsible directives on a single page.
     If a page has multiple collapsibles, raise a diagnostic"""
 
+    node_types = (n.Directive,)
+    directive_names = {"collapsible"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.collapsible_detected = False
@@ -2001,6 +2277,11 @@ class DismissibleSkillsCardHandler(Handler):
     """Handles 'dismissible-skills-card' directives on a page.
     Only one is allowed per page. Adds the data to page AST options."""
 
+    node_types = (n.Directive,)
+    directive_names = {"dismissible-skills-card"}
+    page_local = True
+    writes = {"pages"}
+
     @dataclass
     class DismissibleSkillsCard:
         skill: str
@@ -2041,6 +2322,10 @@ class DismissibleSkillsCardHandler(Handler):
 class NestedDirectiveHandler(Handler):
     """Prevents a directive from being nested deeper than intended on a page and from being used twice in a single page."""
 
+    node_types = (n.Directive,)
+    page_local = True
+    writes = {"pages"}
+
     def __init__(
         self, context: Context, directive_name: str, skippable_directives: Set[str]
     ):
@@ -2096,6 +2381,10 @@ class WayfindingHandler(NestedDirectiveHandler):
 class MethodSelectorHandler(Handler):
     """Handles page-level validations for method-selector directive and its children."""
 
+    node_types = (n.Directive,)
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.method_option_name = "method-option"
@@ -2158,6 +2447,11 @@ class MethodSelectorHandler(Handler):
 class MultiPageTutorialHandler(Handler):
     """Handles page-wide settings for a multi-page tutorial page."""
 
+    node_types = (n.Directive,)
+    directive_names = {"multi-page-tutorial"}
+    page_local = True
+    writes = {"pages"}
+
     def __init__(self, context: Context) -> None:
         super().__init__(context)
         self.target_directive_name = "multi-page-tutorial"
@@ -2199,6 +2493,10 @@ class ComposableTutorialHandler(Handler):
     Should not be simultaneously present on page with other directives
     Checks presence of selected-content directive in composable-tutorial"""
 
+    node_types = (n.ComposableContent, n.ComposableDirective)
+    page_local = True
+    writes = {"pages"}
+
     def handle_composable_content(
         self, fileid_stack: FileIdStack, node: n.ComposableContent
     ) -> None:
@@ -2414,11 +2712,34 @@ class ComposableTutorialHandler(Handler):
         page.ast.options["has_composable_tutorial"] = True
 
 
+class PassRecord(NamedTuple):
+    """What a pass over a page contributed to the project, in addition to the changes it
+    made to the page."""
+
+    diagnostics: Dict[FileId, List[Diagnostic]]
+    local_definitions: Dict[str, List[TargetDatabase.LocalDefinition]]
+    #: The shard_state() of each of the pass's handlers which override it
+    states: List[Any]
+
+
+class PageRecord(NamedTuple):
+    """A postprocessed page, along with what each pass over it contributed to the project
+    and what it depended upon. A later run reuses the page and replays its contributions,
+    rather than postprocessing it again, so long as its dependencies are unchanged."""
+
+    page: Page
+    #: The facets given to the page by facets.toml files before it was postprocessed
+    facets: Optional[List[Facet]]
+    passes: List[PassRecord]
+    dependencies: PageDependencies
+
+
 class PostprocessorResult(NamedTuple):
     pages: Dict[FileId, Page]
     metadata: Dict[str, SerializableType]
     diagnostics: Dict[FileId, List[Diagnostic]]
     targets: TargetDatabase
+    records: Dict[FileId, PageRecord]
 
 
 def build_manpages(context: Context) -> Dict[str, Union[str, bytes]]:
@@ -2455,6 +2776,200 @@ def build_manpages(context: Context) -> Dict[str, Union[str, bytes]]:
     return result
 
 
+NodeCallback = Callable[[FileIdStack, n.Node], None]
+NodeListener = Tuple[
+    str,
+    NodeCallback,
+    Optional[Tuple[Type[n.Node], ...]],
+    Optional[AbstractSet[str]],
+]
+PageListener = Tuple[str, Callable[[FileIdStack, Page], None]]
+
+
+def handler_listeners(
+    instances: Sequence[Handler],
+) -> Tuple[List[NodeListener], List[PageListener]]:
+    """Return the node and page event listeners which the given handlers implement."""
+    node_listeners: List[NodeListener] = []
+    page_listeners: List[PageListener] = []
+    for instance in instances:
+        ty = type(instance)
+        if ty.enter_node is not Handler.enter_node:
+            node_listeners.append(
+                (
+                    EventParser.OBJECT_START_EVENT,
+                    instance.enter_node,
+                    instance.node_types,
+                    instance.directive_names,
+                )
+            )
+        if ty.exit_node is not Handler.exit_node:
+            node_listeners.append(
+                (
+                    EventParser.OBJECT_END_EVENT,
+                    instance.exit_node,
+                    instance.node_types,
+                    instance.directive_names,
+                )
+            )
+        if ty.enter_page is not Handler.enter_page:
+            page_listeners.append((EventParser.PAGE_START_EVENT, instance.enter_page))
+        if ty.exit_page is not Handler.exit_page:
+            page_listeners.append((EventParser.PAGE_END_EVENT, instance.exit_page))
+
+    return node_listeners, page_listeners
+
+
+def make_event_parser(
+    cancellation_token: threading.Event,
+    node_listeners: Iterable[NodeListener],
+    page_listeners: Iterable[PageListener] = (),
+) -> EventParser:
+    event_parser = EventParser(cancellation_token)
+    for event, node_listener, node_types, directive_names in node_listeners:
+        event_parser.add_event_listener(
+            event, node_listener, node_types, directive_names
+        )
+
+    for event, page_listener in page_listeners:
+        event_parser.add_event_listener(event, page_listener)
+
+    return event_parser
+
+
+class ShardResult(NamedTuple):
+    pages: List[Tuple[FileId, Page]]
+    diagnostics: Dict[FileId, List[Diagnostic]]
+    local_definitions: Dict[str, List[TargetDatabase.LocalDefinition]]
+    states: List[Any]
+    listener_calls: Dict[str, int]
+
+
+def _postprocess_shard(
+    args: Tuple[
+        Sequence[Sequence[Type[Handler]]],
+        ProjectConfig,
+        List[Tuple[FileId, Page]],
+    ]
+) -> ShardResult:
+    """Run passes of page-local handlers on a shard of pages in a worker process."""
+    passes, project_config, pages = args
+    targets = TargetDatabase()
+    context = Context(dict(pages))
+    context.add(project_config)
+    context.add(targets)
+
+    all_instances: List[Handler] = []
+    listener_calls: typing.Counter[str] = collections.Counter()
+    for project_pass in passes:
+        instances = [ty(context) for ty in project_pass]
+        for instance in instances:
+            context.add(instance)
+
+        event_parser = make_event_parser(
+            threading.Event(), *handler_listeners(instances)
+        )
+        event_parser.consume(pages)
+        listener_calls.update(event_parser.listener_calls())
+        all_instances.extend(instances)
+
+    # All of a shard's pages, and the state that refers to them, are pickled together, so
+    # that the nodes they share are still shared once they are merged
+    return ShardResult(
+        pages,
+        dict(context.diagnostics),
+        dict(targets.local_definitions),
+        [instance.shard_state() for instance in all_instances],
+        dict(listener_calls),
+    )
+
+
+def mark_project_wide(context: Context, listener: NodeCallback) -> NodeCallback:
+    """Wrap a project-wide handler's node listener to record that it was called on the
+    page being postprocessed."""
+
+    @functools.wraps(listener)
+    def wrapper(fileid_stack: FileIdStack, node: n.Node) -> None:
+        context.dependencies.project_wide = True
+        listener(fileid_stack, node)
+
+    return wrapper
+
+
+def schedule_passes(
+    handlers: Sequence[Type[Handler]], fuse: bool = True
+) -> List[List[Type[Handler]]]:
+    """Group handlers into the fewest passes over the project that their declared
+    dependencies allow. Each handler is run in the earliest pass after those of the
+    handlers which write the state that it reads; and, if fuse is set, in the same pass
+    as the handlers which write the state that it follows. Otherwise, a handler follows
+    them in a later pass. Handlers sharing a pass are called in the order given.
+
+    Raises ValueError if the dependencies are circular, or if a handler shares a pass
+    with a handler that it follows but which is listed after it."""
+    writers: Dict[str, List[Type[Handler]]] = defaultdict(list)
+    for handler in handlers:
+        for state in handler.writes:
+            writers[state].append(handler)
+
+    levels: Dict[Type[Handler], int] = {}
+    visiting: List[Type[Handler]] = []
+
+    def get_level(handler: Type[Handler]) -> int:
+        level = levels.get(handler)
+        if level is not None:
+            return level
+
+        if handler in visiting:
+            cycle = visiting[visiting.index(handler) :] + [handler]
+            raise ValueError(
+                "Circular handler dependencies: "
+                + " -> ".join(ty.__name__ for ty in cycle)
+            )
+
+        visiting.append(handler)
+        level = 0
+        for states, distance in (
+            (handler.reads, 1),
+            (handler.follows, 0 if fuse else 1),
+        ):
+            for state in states:
+                for writer in writers[state]:
+                    if writer is not handler:
+                        level = max(level, get_level(writer) + distance)
+
+        visiting.pop()
+        levels[handler] = level
+        return level
+
+    passes: List[List[Type[Handler]]] = []
+    for handler in handlers:
+        level = get_level(handler)
+        while len(passes) <= level:
+            passes.append([])
+        passes[level].append(handler)
+
+    order = {handler: i for i, handler in enumerate(handlers)}
+    for handler in handlers:
+        for state in handler.follows:
+            for writer in writers[state]:
+                if levels[writer] == levels[handler] and order[writer] > order[handler]:
+                    raise ValueError(
+                        f"{handler.__name__} follows {state}, and so must be listed "
+                        f"after {writer.__name__}"
+                    )
+
+    return passes
+
+
+def format_schedule(passes: Sequence[Sequence[Type[Handler]]]) -> str:
+    """Describe the handlers run in each pass, one pass per line."""
+    return "\n".join(
+        f"pass {i}: {', '.join(ty.__name__ for ty in project_pass)}"
+        for i, project_pass in enumerate(passes, 1)
+    )
+
+
 class Postprocessor:
     """Handles all postprocessing operations on parsed AST files.
 
@@ -2462,91 +2977,363 @@ class Postprocessor:
     handles calling all other methods and ensures that parse operations are run in the correct order.
     """
 
-    PASSES: Sequence[Sequence[Type[Handler]]] = [
-        [IncludeHandler],
-        [SubstitutionHandler],
-        [
-            HeadingHandler,
-            TocTitleHandler,
-            AddTitlesToLabelTargetsHandler,
-            FootnoteHandler,
-            ProgramOptionHandler,
-            TabsSelectorHandler,
-            MethodSelectorHandler,
-            MultiPageTutorialHandler,
-            ComposableTutorialHandler,
-            ContentsHandler,
-            InstruqtHandler,
-            BannerHandler,
-            GuidesHandler,
-            OpenAPIHandler,
-            OpenAPIChangelogHandler,
-            FacetsHandler,
-            ImageHandler,
-            CollapsibleHandler,
-            WayfindingHandler,
-            DismissibleSkillsCardHandler,
-        ],
-        [TargetHandler, IAHandler, NamedReferenceHandlerPass1],
-        [RefsHandler, NamedReferenceHandlerPass2],
+    #: Every handler, in the order in which those sharing a pass are called
+    HANDLERS: Sequence[Type[Handler]] = [
+        IncludeHandler,
+        SubstitutionHandler,
+        HeadingHandler,
+        TocTitleHandler,
+        AddTitlesToLabelTargetsHandler,
+        FootnoteHandler,
+        ProgramOptionHandler,
+        TabsSelectorHandler,
+        MethodSelectorHandler,
+        MultiPageTutorialHandler,
+        ComposableTutorialHandler,
+        ContentsHandler,
+        InstruqtHandler,
+        BannerHandler,
+        OpenAPIChangelogHandler,
+        FacetsHandler,
+        ImageHandler,
+        CollapsibleHandler,
+        WayfindingHandler,
+        DismissibleSkillsCardHandler,
+        TargetHandler,
+        IAHandler,
+        NamedReferenceHandlerPass1,
+        GuidesHandler,
+        OpenAPIHandler,
+        RefsHandler,
+        NamedReferenceHandlerPass2,
     ]
 
-    def __init__(self, project_config: ProjectConfig, targets: TargetDatabase) -> None:
+    #: The traversals of the project's pages, and the handlers run in each
+    PASSES: Sequence[Sequence[Type[Handler]]] = schedule_passes(HANDLERS)
+
+    #: Passes of page-local handlers are only sharded if each shard would have at least
+    #: this many pages
+    MIN_SHARD_SIZE = 32
+
+    def __init__(
+        self,
+        project_config: ProjectConfig,
+        targets: TargetDatabase,
+        get_pool: Optional[Callable[[], multiprocessing.pool.Pool]] = None,
+    ) -> None:
+        """If get_pool is given, passes made up of page-local handlers are run on shards
+        of the project's pages in the worker pool that it returns."""
         self.project_config = project_config
+        self.get_pool = get_pool
         self.toctree: Dict[str, SerializableType] = {}
         self.pages: Dict[FileId, Page] = {}
         self.targets = targets
         self.pending_program: Optional[SerializableType] = None
 
+        #: The number of times each handler's enter_node() and exit_node() were called
+        self.listener_calls: typing.Counter[str] = collections.Counter()
+
     def run(
-        self, pages: Dict[FileId, Page], cancellation_token: threading.Event
+        self,
+        pages: Mapping[FileId, Page],
+        cancellation_token: threading.Event,
+        previous: Optional[PostprocessorResult] = None,
+        changed: AbstractSet[FileId] = frozenset(),
     ) -> PostprocessorResult:
-        """Run all postprocessing operations and return a dictionary containing the metadata document to be saved."""
+        """Run all postprocessing operations and return a dictionary containing the metadata document to be saved.
+
+        If the result of a previous run is given, along with the fileids of the pages which
+        have changed since, each page is reused from it unless the page, a file that it
+        includes, or its facets have changed. Reused pages which refer to targets that have
+        changed are postprocessed again before the last pass, which resolves references.
+        Pages are only read from the given mapping if they are postprocessed again."""
         if not pages:
-            return PostprocessorResult({}, {}, {}, self.targets)
+            return PostprocessorResult({}, {}, {}, self.targets, {})
 
-        self.pages = pages
+        self.pages = {}
         self.cancellation_token = cancellation_token
-        context = Context(pages)
+        context = Context(self.pages, pages)
         context.add(self.project_config)
         context.add(self.targets)
 
-        propagate_facets(self.pages, context)
+        facets = find_facets(context)
+        changed_slugs = {fileid.without_known_suffix for fileid in changed}
+        previous_records = self.reusable_records(previous)
+        reused: Dict[FileId, PageRecord] = {}
+        for fileid in pages:
+            record = previous_records.get(fileid)
+            if record is not None and self.is_reusable(
+                fileid, record, facets.get(fileid), changed_slugs
+            ):
+                self.pages[fileid] = record.page
+                reused[fileid] = record
+            else:
+                self.load_page(fileid, pages, facets)
 
-        for project_pass in self.PASSES:
-            instances = [ty(context) for ty in project_pass]
+        page_ids = [k for k in self.pages if k.suffix == EXT_FOR_PAGE]
+        processed: Dict[FileId, List[PassRecord]] = {
+            k: [] for k in page_ids if k not in reused
+        }
+        dependencies = {k: PageDependencies() for k in processed}
+
+        logger.debug("Postprocessing schedule:\n%s", format_schedule(self.PASSES))
+        passes = list(self.PASSES)
+        sharded = False
+        while passes:
+            # Consecutive passes of page-local handlers are run together on each shard, in
+            # a single round trip to the worker pool
+            n_sharded = 0
+            if self.get_pool is not None:
+                while n_sharded < len(passes) and all(
+                    ty.page_local for ty in passes[n_sharded]
+                ):
+                    n_sharded += 1
+
+            if n_sharded and self.run_sharded(passes[:n_sharded], context):
+                del passes[:n_sharded]
+                sharded = True
+                continue
+
+            if len(passes) == 1 and reused and previous is not None:
+                affected = self.find_affected_pages(previous, reused, processed)
+                self.rerun_passes(
+                    self.PASSES[:-1], affected, pages, facets, dependencies
+                )
+                for fileid in affected:
+                    processed[fileid] = reused.pop(fileid).passes[:-1]
+
+            pass_index = len(self.PASSES) - len(passes)
+            instances = [ty(context) for ty in passes.pop(0)]
             for instance in instances:
                 context.add(instance)
 
-            self.run_event_parser(
-                [
-                    (EventParser.OBJECT_START_EVENT, instance.enter_node)
-                    for instance in instances
-                    if instance.__class__.enter_node is not Handler.enter_node
-                ]
-                + [
-                    (EventParser.OBJECT_END_EVENT, instance.exit_node)
-                    for instance in instances
-                    if instance.__class__.exit_node is not Handler.exit_node
-                ],
-                [
-                    (EventParser.PAGE_START_EVENT, instance.enter_page)
-                    for instance in instances
-                    if instance.__class__.enter_page is not Handler.enter_page
-                ]
-                + [
-                    (EventParser.PAGE_END_EVENT, instance.exit_page)
-                    for instance in instances
-                    if instance.__class__.exit_page is not Handler.exit_page
-                ],
+            self.run_pass(
+                pass_index,
+                context,
+                instances,
+                page_ids,
+                processed,
+                reused,
+                dependencies,
             )
 
+        if logger.isEnabledFor(logging.DEBUG):
+            for name, count in self.listener_calls.most_common():
+                logger.debug("Handler calls: %s %d", name, count)
+
+        # Sharded passes' contributions cannot be told apart page by page
+        records: Dict[FileId, PageRecord] = {}
+        if not sharded:
+            for fileid in page_ids:
+                record = reused.get(fileid)
+                records[fileid] = (
+                    record
+                    if record is not None
+                    else PageRecord(
+                        self.pages[fileid],
+                        facets.get(fileid),
+                        processed[fileid],
+                        dependencies[fileid],
+                    )
+                )
+
         document = self.generate_metadata(context)
         self.finalize(context, document)
         return PostprocessorResult(
-            self.pages, document, context.diagnostics, self.targets
+            self.pages, document, context.diagnostics, self.targets, records
+        )
+
+    def reusable_records(
+        self, previous: Optional[PostprocessorResult]
+    ) -> Dict[FileId, PageRecord]:
+        """Return the page records of a previous run which this run may reuse."""
+        if (
+            previous is None
+            or self.get_pool is not None
+            or previous.targets.intersphinx_inventories.keys()
+            != self.targets.intersphinx_inventories.keys()
+        ):
+            return {}
+
+        return previous.records
+
+    @staticmethod
+    def is_reusable(
+        fileid: FileId,
+        record: PageRecord,
+        facets: Optional[List[Facet]],
+        changed_slugs: AbstractSet[str],
+    ) -> bool:
+        dependencies = record.dependencies
+        return (
+            not dependencies.project_wide
+            and fileid.without_known_suffix not in changed_slugs
+            and dependencies.includes.isdisjoint(changed_slugs)
+            and record.facets == facets
         )
 
+    def load_page(
+        self,
+        fileid: FileId,
+        pages: Mapping[FileId, Page],
+        facets: Dict[FileId, List[Facet]],
+    ) -> None:
+        """Take a page to be postprocessed, giving it the facets from facets.toml files."""
+        page = pages[fileid]
+        page_facets = facets.get(fileid)
+        if page_facets:
+            page.facets = page_facets
+
+        self.pages[fileid] = page
+
+    def find_affected_pages(
+        self,
+        previous: PostprocessorResult,
+        reused: Dict[FileId, PageRecord],
+        processed: Dict[FileId, List[PassRecord]],
+    ) -> List[FileId]:
+        """Return the reused pages which refer to targets whose definitions have changed
+        since the previous run; or, if any target has been added or removed, which
+        suggested alternatives to targets that do not exist."""
+        keys: Set[str] = set()
+        for fileid, record in previous.records.items():
+            if fileid not in reused:
+                for pass_record in record.passes:
+                    keys.update(pass_record.local_definitions)
+
+        for pass_records in processed.values():
+            for pass_record in pass_records:
+                keys.update(pass_record.local_definitions)
+
+        old = previous.targets.local_definitions
+        new = self.targets.local_definitions
+        changed_keys = {key for key in keys if old.get(key) != new.get(key)}
+        keys_changed = any((key in old) != (key in new) for key in changed_keys)
+
+        return [
+            fileid
+            for fileid, record in reused.items()
+            if not record.dependencies.targets.isdisjoint(changed_keys)
+            or (keys_changed and record.dependencies.suggestions)
+        ]
+
+    def rerun_passes(
+        self,
+        passes: Sequence[Sequence[Type[Handler]]],
+        fileids: Sequence[FileId],
+        pages: Mapping[FileId, Page],
+        facets: Dict[FileId, List[Facet]],
+        dependencies: Dict[FileId, PageDependencies],
+    ) -> None:
+        """Postprocess fresh copies of reused pages with the given passes, apart from the
+        rest of the project. Their contributions to it are unchanged, and so are discarded.
+        """
+        if not fileids:
+            return
+
+        context = Context(self.pages, pages)
+        context.add(self.project_config)
+        context.add(TargetDatabase())
+        for fileid in fileids:
+            self.load_page(fileid, pages, facets)
+            dependencies[fileid] = PageDependencies()
+
+        def enter_page(fileid_stack: FileIdStack, page: Page) -> None:
+            context.dependencies = dependencies[fileid_stack.root]
+
+        for project_pass in passes:
+            instances = [ty(context) for ty in project_pass]
+            for instance in instances:
+                context.add(instance)
+
+            node_listeners, page_listeners = handler_listeners(instances)
+            self.run_event_parser(
+                ((k, self.pages[k]) for k in fileids),
+                node_listeners,
+                [(EventParser.PAGE_START_EVENT, enter_page), *page_listeners],
+            )
+
+    def run_pass(
+        self,
+        pass_index: int,
+        context: Context,
+        instances: Sequence[Handler],
+        page_ids: Sequence[FileId],
+        processed: Dict[FileId, List[PassRecord]],
+        reused: Dict[FileId, PageRecord],
+        dependencies: Dict[FileId, PageDependencies],
+    ) -> None:
+        """Run a pass of handlers on the pages that are being postprocessed, recording what
+        it contributes from each page. Then merge each page's contributions, whether new or
+        recorded by a previous run, in page order."""
+        stateful = [
+            instance
+            for instance in instances
+            if type(instance).shard_state is not Handler.shard_state
+        ]
+        node_listeners, page_listeners = handler_listeners(instances)
+        for i, (event, listener, node_types, directive_names) in enumerate(
+            node_listeners
+        ):
+            handler = getattr(listener, "__self__", None)
+            if isinstance(handler, Handler) and handler.project_wide:
+                node_listeners[i] = (
+                    event,
+                    mark_project_wide(context, listener),
+                    node_types,
+                    directive_names,
+                )
+
+        diagnostics = context.diagnostics
+
+        def enter_page(fileid_stack: FileIdStack, page: Page) -> None:
+            context.diagnostics = defaultdict(list)
+            self.targets.definition_sink = defaultdict(list)
+            context.dependencies = dependencies[fileid_stack.root]
+
+        def exit_page(fileid_stack: FileIdStack, page: Page) -> None:
+            states: List[Any] = []
+            for instance in stateful:
+                states.append(instance.shard_state())
+                instance.reset_shard_state()
+
+            processed[fileid_stack.root].append(
+                PassRecord(
+                    dict(context.diagnostics),
+                    dict(self.targets.definition_sink or {}),
+                    states,
+                )
+            )
+
+        try:
+            self.run_event_parser(
+                ((k, self.pages[k]) for k in page_ids if k in processed),
+                node_listeners,
+                [
+                    (EventParser.PAGE_START_EVENT, enter_page),
+                    *page_listeners,
+                    (EventParser.PAGE_END_EVENT, exit_page),
+                ],
+            )
+        finally:
+            context.diagnostics = diagnostics
+            self.targets.definition_sink = None
+            context.dependencies = PageDependencies()
+
+        for fileid in page_ids:
+            pass_records = processed.get(fileid)
+            pass_record = (
+                pass_records[-1]
+                if pass_records is not None
+                else reused[fileid].passes[pass_index]
+            )
+            for key, page_diagnostics in pass_record.diagnostics.items():
+                context.diagnostics[key].extend(page_diagnostics)
+
+            self.targets.merge_local_definitions(pass_record.local_definitions)
+            for instance, state in zip(stateful, pass_record.states):
+                instance.merge_shard_state(state)
+
     def finalize(self, context: Context, metadata: n.SerializedNode) -> None:
         pass
 
@@ -2614,19 +3401,54 @@ class Postprocessor:
 
     def run_event_parser(
         self,
-        node_listeners: Iterable[Tuple[str, Callable[[FileIdStack, n.Node], None]]],
-        page_listeners: Iterable[Tuple[str, Callable[[FileIdStack, Page], None]]] = (),
+        pages: Iterable[Tuple[FileId, Page]],
+        node_listeners: Iterable[NodeListener],
+        page_listeners: Iterable[PageListener] = (),
     ) -> None:
-        event_parser = EventParser(self.cancellation_token)
-        for event, node_listener in node_listeners:
-            event_parser.add_event_listener(event, node_listener)
+        event_parser = make_event_parser(
+            self.cancellation_token, node_listeners, page_listeners
+        )
+        event_parser.consume(pages)
+        self.listener_calls.update(event_parser.listener_calls())
 
-        for event, page_listener in page_listeners:
-            event_parser.add_event_listener(event, page_listener)
+    def run_sharded(
+        self, passes: Sequence[Sequence[Type[Handler]]], context: Context
+    ) -> bool:
+        """Run passes of page-local handlers on contiguous shards of the project's pages in
+        the worker pool. Each shard's pages replace the originals, and its diagnostics,
+        target definitions, and handler state are merged in page order. Returns False,
+        having run nothing, if there are too few pages to be worth sharding."""
+        assert self.get_pool is not None
+        pages = [(k, v) for k, v in self.pages.items() if k.suffix == EXT_FOR_PAGE]
+        n_shards = min(len(pages) // self.MIN_SHARD_SIZE, 4 * (os.cpu_count() or 1))
+        if n_shards < 2:
+            return False
+
+        instances = [ty(context) for project_pass in passes for ty in project_pass]
+        for instance in instances:
+            context.add(instance)
+
+        shard_size = -(-len(pages) // n_shards)
+        shards = [
+            (passes, self.project_config, pages[i : i + shard_size])
+            for i in range(0, len(pages), shard_size)
+        ]
 
-        event_parser.consume(
-            (k, v) for k, v in self.pages.items() if k.suffix == EXT_FOR_PAGE
-        )
+        for result in self.get_pool().imap(_postprocess_shard, shards):
+            if self.cancellation_token.is_set():
+                raise util.CancelledException()
+
+            self.pages.update(result.pages)
+            for fileid, diagnostics in result.diagnostics.items():
+                context.diagnostics[fileid].extend(diagnostics)
+
+            self.targets.merge_local_definitions(result.local_definitions)
+            for instance, state in zip(instances, result.states):
+                instance.merge_shard_state(state)
+
+            self.listener_calls.update(result.listener_calls)
+
+        return True
 
     @staticmethod
     def build_iatree(context: Context) -> Dict[str, SerializableType]:
@@ -2704,7 +3526,6 @@ class Postprocessor:
             "slug": "/",
             "children": [],
         }
-        ast = context.pages[starting_fileid].ast
 
         toc_landing_pages = [
             clean_slug(slug) for slug in context[ProjectConfig].toc_landing_pages
@@ -2714,15 +3535,15 @@ class Postprocessor:
         )
         ref_project_set: Set[Tuple[Optional[str], Optional[str]]] = set()
         visited_fileids: Set[FileId] = {starting_fileid}
-        cls.find_toctree_nodes(
+        cls.find_page_toctree_nodes(
             context,
             starting_fileid,
-            ast,
             root,
             toc_landing_pages,
             associated_project_names,
             ref_project_set,
             visited_fileids,
+            cls.find_toctree_directives(context),
         )
 
         # Locate orphaned files
@@ -2736,6 +3557,85 @@ class Postprocessor:
 
         return root
 
+    @staticmethod
+    def find_toctree_directives(
+        context: Context,
+    ) -> Dict[FileId, Optional[Sequence[n.Node]]]:
+        """Find the pages which, once their includes are expanded, may contain toctree
+        directives, using the node indexes recorded when the pages were parsed. Return a
+        mapping from each such page to its toctree directives; or to None if they must be
+        searched for, because the page was not indexed or includes one which may contain
+        toctree directives itself."""
+        include_handler = context[IncludeHandler]
+        includes: Dict[FileId, List[FileId]] = {}
+        included_by: Dict[FileId, List[FileId]] = defaultdict(list)
+        pending: List[FileId] = []
+        for fileid, page in context.pages.items():
+            index = page.node_index
+            if index is None or "toctree" in index:
+                pending.append(fileid)
+            if index is None:
+                continue
+
+            includes[fileid] = []
+            for directive in index.get("include", "sharedinclude"):
+                include_fileid = include_handler.get_include_fileid(
+                    "".join(arg.get_text() for arg in directive.argument)
+                )
+                if include_fileid is not None:
+                    includes[fileid].append(include_fileid)
+                    included_by[include_fileid].append(fileid)
+
+        found = set(pending)
+        while pending:
+            for including_fileid in included_by[pending.pop()]:
+                if including_fileid not in found:
+                    found.add(including_fileid)
+                    pending.append(including_fileid)
+
+        result: Dict[FileId, Optional[Sequence[n.Node]]] = {}
+        for fileid in found:
+            index = context.pages[fileid].node_index
+            if index is None or not found.isdisjoint(includes[fileid]):
+                result[fileid] = None
+            else:
+                result[fileid] = index.get("toctree")
+
+        return result
+
+    @classmethod
+    def find_page_toctree_nodes(
+        cls,
+        context: Context,
+        fileid: FileId,
+        node: Dict[str, Any],
+        toc_landing_pages: List[str],
+        associated_project_names: Set[str],
+        external_nodes: Set[Tuple[Optional[str], Optional[str]]],
+        visited_file_ids: Set[FileId],
+        toctree_directives: Dict[FileId, Optional[Sequence[n.Node]]],
+    ) -> None:
+        """Construct the nodes for a page's toctree directives in the unified toctree,
+        going straight to the directives if find_toctree_directives() found them."""
+        if fileid not in toctree_directives:
+            return
+
+        directives = toctree_directives[fileid]
+        for ast in (
+            directives if directives is not None else [context.pages[fileid].ast]
+        ):
+            cls.find_toctree_nodes(
+                context,
+                fileid,
+                ast,
+                node,
+                toc_landing_pages,
+                associated_project_names,
+                external_nodes,
+                visited_file_ids,
+                toctree_directives,
+            )
+
     @classmethod
     def find_toctree_nodes(
         cls,
@@ -2747,6 +3647,7 @@ class Postprocessor:
         associated_project_names: Set[str],
         external_nodes: Set[Tuple[Optional[str], Optional[str]]],
         visited_file_ids: Set[FileId],
+        toctree_directives: Dict[FileId, Optional[Sequence[n.Node]]],
     ) -> None:
         """Iterate over AST to find toctree directives and construct their nodes for the unified toctree"""
 
@@ -2852,16 +3753,15 @@ class Postprocessor:
                     # Don't recurse on the index page
                     if slug_fileid not in visited_file_ids:
                         visited_file_ids.add(slug_fileid)
-                        new_ast = context.pages[slug_fileid].ast
-                        cls.find_toctree_nodes(
+                        cls.find_page_toctree_nodes(
                             context,
                             slug_fileid,
-                            new_ast,
                             toctree_node,
                             toc_landing_pages,
                             associated_project_names,
                             external_nodes,
                             visited_file_ids,
+                            toctree_directives,
                         )
 
                 if toctree_node:
@@ -2878,6 +3778,7 @@ class Postprocessor:
                 associated_project_names,
                 external_nodes,
                 visited_file_ids,
+                toctree_directives,
             )
 
     @staticmethod
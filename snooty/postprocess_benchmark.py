@@ -0,0 +1,64 @@
+"""Compare the number of traversals of a project's pages, and the time taken to postprocess
+them, with and without handlers sharing passes as their dependencies allow.
+
+Usage: python3 -m snooty.postprocess_benchmark <project-root>
+"""
+
+import logging
+import pickle
+import sys
+import threading
+import time
+from pathlib import Path
+from typing import Callable, List
+
+from .parser import Project
+from .postprocess import Postprocessor, format_schedule, schedule_passes
+from .util import EXT_FOR_PAGE
+from .util_test import BackendTestResults
+
+N_RUNS = 3
+
+
+def main() -> None:
+    logging.basicConfig(level=logging.WARNING)
+    root_path = Path(sys.argv[1])
+
+    project = Project(root_path, BackendTestResults(), {})
+    try:
+        project.build(postprocess=False)
+        with project._get_inner() as inner:
+            pickled = pickle.dumps(
+                {k: v[0] for k, v in sorted(inner.pages._parsed.items())}
+            )
+            postprocessor_factory: Callable[[], Postprocessor] = (
+                inner.postprocessor_factory
+            )
+
+            n_pages = sum(1 for k in inner.pages._parsed if k.suffix == EXT_FOR_PAGE)
+            print(f"{n_pages} pages")
+            print(f"{'schedule':>9} {'passes':>7} {'traversals':>11} {'best (s)':>9}")
+            for name, fuse in (("unfused", False), ("fused", True)):
+                passes = schedule_passes(Postprocessor.HANDLERS, fuse)
+                times: List[float] = []
+                for _ in range(N_RUNS):
+                    pages = pickle.loads(pickled)
+                    postprocessor = postprocessor_factory()
+                    postprocessor.PASSES = passes
+                    start_time = time.perf_counter()
+                    postprocessor.run(pages, threading.Event())
+                    times.append(time.perf_counter() - start_time)
+
+                print(
+                    f"{name:>9} {len(passes):>7} {len(passes) * n_pages:>11} "
+                    f"{min(times):>9.3f}"
+                )
+
+            print()
+            print(format_schedule(Postprocessor.PASSES))
+    finally:
+        project.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -1,17 +1,15 @@
-import copy
 import enum
-import itertools
 import logging
 import re
 import threading
 import urllib
-from collections import defaultdict
+from collections import Counter, defaultdict
 from dataclasses import dataclass, field
 from typing import (
     DefaultDict,
     Dict,
-    Iterable,
     List,
+    Mapping,
     NamedTuple,
     Optional,
     Sequence,
@@ -34,6 +32,171 @@ TargetType = enum.Enum("TargetType", ("fileid", "url"))
 
 PAT_TARGET_PART_SEPARATOR = re.compile(r"[_-]+")
 
+#: The maximum edit distance between each part of a target name and its suggested correction
+MAX_SUGGESTION_DISTANCE = 2
+
+
+def _bag_distance(a_counts: "Counter[str]", b: str) -> int:
+    """Return the bag distance between two strings, given the character counts of the
+    first: a lower bound of their Damerau-Levenshtein distance."""
+    b_counts = Counter(b)
+    return max(sum((a_counts - b_counts).values()), sum((b_counts - a_counts).values()))
+
+
+class SuggestionIndex:
+    """An index of target keys, from which the keys with names similar to a misspelled
+    name can be found without comparing it to every key. Keys are grouped by the number
+    of parts in their names (tokens separated by - and _), and then by the lengths of
+    those parts: two parts cannot be within MAX_SUGGESTION_DISTANCE edits of each other
+    if their lengths differ by more than that, so most groups are skipped wholesale."""
+
+    class Entry(NamedTuple):
+        sequence: int
+        key: str
+        name_length: int
+        parts: List[str]
+
+    def __init__(self) -> None:
+        #: Whether the index has been filled, if it is filled lazily by its owner
+        self.populated = False
+        self.lock = threading.Lock()
+        self.n_entries = 0
+        self.groups: Dict[int, Dict[Tuple[int, ...], List[SuggestionIndex.Entry]]] = (
+            defaultdict(lambda: defaultdict(list))
+        )
+
+    def add(self, key: str) -> None:
+        name = key.split(":", 2)[2]
+        parts = PAT_TARGET_PART_SEPARATOR.split(name)
+        shape = tuple(len(part) for part in parts)
+        self.groups[len(parts)][shape].append(
+            SuggestionIndex.Entry(self.n_entries, key, len(name), parts)
+        )
+        self.n_entries += 1
+
+    def search(self, name: str) -> List[str]:
+        """Return the keys whose names are similar to the given name, in the order in which
+        they were added."""
+        parts = PAT_TARGET_PART_SEPARATOR.split(name)
+        shape = tuple(len(part) for part in parts)
+        part_counts = [Counter(part) for part in parts]
+        matches: List[SuggestionIndex.Entry] = []
+
+        # Tokens tend to be separated by - and _: if there's a different number of
+        # separators, don't attempt a typo correction
+        for candidate_shape, entries in self.groups.get(len(parts), {}).items():
+            if any(
+                abs(length - candidate_length) > MAX_SUGGESTION_DISTANCE
+                for length, candidate_length in zip(shape, candidate_shape)
+            ):
+                continue
+
+            for entry in entries:
+                if abs(len(name) - entry.name_length) > MAX_SUGGESTION_DISTANCE:
+                    continue
+
+                # The number of characters that two strings do not have in common bounds
+                # their edit distance from below, and is much cheaper to compute: rule out
+                # most candidates with it before computing any edit distances.
+                if not all(
+                    p1 == p2 or _bag_distance(counts, p2) <= MAX_SUGGESTION_DISTANCE
+                    for p1, p2, counts in zip(parts, entry.parts, part_counts)
+                ):
+                    continue
+
+                # Evaluate each part separately, since we can abort before evaluating the
+                # rest. Small bonus: complexity is O(N*M)
+                if all(
+                    p1 == p2
+                    or util.damerau_levenshtein_distance(p1, p2)
+                    <= MAX_SUGGESTION_DISTANCE
+                    for p1, p2 in zip(parts, entry.parts)
+                ):
+                    matches.append(entry)
+
+        matches.sort()
+        return [entry.key for entry in matches]
+
+
+class InventoryIndex:
+    """A merged index of the keys of a set of intersphinx inventories, from which all of
+    the inventories' definitions of a key are found with a single lookup rather than by
+    querying each inventory in turn. Each key maps to the positions of the inventories
+    defining it; the ExternalResult for each definition is computed once, on first use,
+    and shared by every database using this index."""
+
+    def __init__(self) -> None:
+        #: Whether the index has been filled, if it is filled lazily by its owner
+        self.populated = False
+        self.lock = threading.Lock()
+        self.inventories: List[intersphinx.Inventory] = []
+        self.positions: Dict[str, Tuple[int, ...]] = {}
+        self.results: Dict[Tuple[int, str], "TargetDatabase.ExternalResult"] = {}
+
+    def populate(self, inventories: Sequence[intersphinx.Inventory]) -> None:
+        self.inventories = list(inventories)
+
+        # Most keys are defined by a single inventory: share their position tuples
+        singletons = [(i,) for i in range(len(self.inventories))]
+        positions = self.positions
+        for i, inventory in enumerate(self.inventories):
+            singleton = singletons[i]
+            for key in inventory.targets:
+                existing = positions.get(key)
+                positions[key] = singleton if existing is None else existing + singleton
+
+        self.populated = True
+
+    def lookup(self, key: str) -> Tuple["TargetDatabase.ExternalResult", ...]:
+        """Return the definitions of a normalized key, in inventory order. The caller must
+        hold the lock."""
+        matches = [(i, key) for i in self.positions.get(key, ())]
+
+        # Sphinx, at least older versions, have a habit of lower-casing its intersphinx
+        # inventory sections. Try that in the inventories without an exact match.
+        fallbacks = [key.lower()]
+
+        # FIXME: temporary until DOP-2345 is complete
+        if key.startswith("mongodb:php"):
+            fallbacks.append(key.replace("\\\\", "\\"))
+
+        for fallback in fallbacks:
+            if len(matches) == len(self.inventories):
+                break
+
+            if fallback == key:
+                continue
+
+            found = {i for i, _ in matches}
+            matches.extend(
+                (i, fallback)
+                for i in self.positions.get(fallback, ())
+                if i not in found
+            )
+
+        matches.sort()
+        return tuple(self._get_result(i, inventory_key) for i, inventory_key in matches)
+
+    def _get_result(self, i: int, key: str) -> "TargetDatabase.ExternalResult":
+        result = self.results.get((i, key))
+        if result is not None:
+            return result
+
+        inventory = self.inventories[i]
+        entry = inventory.targets[key]
+        url = urllib.parse.urljoin(inventory.base_url, entry.uri)
+
+        display_name = entry.display_name
+        if display_name is None:
+            display_name = specparser.Spec.get().strip_prefix_from_name(
+                entry.domain_and_role, entry.name
+            )
+
+        result = self.results[(i, key)] = TargetDatabase.ExternalResult(
+            url, entry.name, (n.Text((-1,), display_name),)
+        )
+        return result
+
 
 @dataclass
 class TargetDatabase:
@@ -66,11 +229,49 @@ class TargetDatabase:
 
     lock: threading.Lock = field(default_factory=threading.Lock)
 
+    #: If set, define_local_target() adds definitions here rather than to
+    #: local_definitions, so that the definitions made by each page can be told apart
+    definition_sink: Optional[DefaultDict[str, List[LocalDefinition]]] = None
+
+    #: The keys of the intersphinx inventories, indexed when suggestions are first needed.
+    #: Copies made by copy_clean_slate() share this index, since they share the inventories.
+    intersphinx_suggestions: SuggestionIndex = field(
+        default_factory=SuggestionIndex, repr=False, compare=False
+    )
+
+    #: The keys of local_definitions, indexed when suggestions are first needed, and
+    #: kept up to date as targets are defined thereafter
+    local_suggestions: Optional[SuggestionIndex] = field(
+        default=None, repr=False, compare=False
+    )
+
+    #: The definitions of the intersphinx inventories, indexed when a target is first
+    #: looked up. Copies made by copy_clean_slate() share this index.
+    intersphinx_index: InventoryIndex = field(
+        default_factory=InventoryIndex, repr=False, compare=False
+    )
+
+    #: The normalized form and intersphinx definitions of each key looked up in this
+    #: database. Each postprocessor run has its own database, and so its own memo.
+    intersphinx_memo: Dict[str, Tuple[str, Tuple[ExternalResult, ...]]] = field(
+        default_factory=dict, repr=False, compare=False
+    )
+
     def __getitem__(self, key: str) -> Sequence["TargetDatabase.Result"]:
-        key = normalize_target(key)
-        results: List[TargetDatabase.Result] = []
+        memoized = self.intersphinx_memo.get(key)
+        if memoized is None:
+            normalized_key = normalize_target(key)
+            intersphinx_index = self.intersphinx_index
+            with intersphinx_index.lock:
+                if not intersphinx_index.populated:
+                    intersphinx_index.populate(
+                        list(self.intersphinx_inventories.values())
+                    )
+                memoized = (normalized_key, intersphinx_index.lookup(normalized_key))
+            self.intersphinx_memo[key] = memoized
 
-        spec = specparser.Spec.get()
+        key, external_results = memoized
+        results: List[TargetDatabase.Result] = []
 
         with self.lock:
             # Check to see if the target is defined locally
@@ -88,77 +289,33 @@ class TargetDatabase:
             except KeyError:
                 pass
 
-            # Get URL from intersphinx inventories
-            for inventory in self.intersphinx_inventories.values():
-                entry = inventory.get(key)
-
-                # Sphinx, at least older versions, have a habit of lower-casing its intersphinx
-                # inventory sections. Try that.
-                if not entry:
-                    entry = inventory.get(key.lower())
-
-                # FIXME: temporary until DOP-2345 is complete
-                if not entry and key.startswith("mongodb:php"):
-                    entry = inventory.get(key.replace("\\\\", "\\"))
-
-                if entry:
-                    base_url = inventory.base_url
-                    url = urllib.parse.urljoin(base_url, entry.uri)
-
-                    display_name = entry.display_name
-                    if display_name is None:
-                        display_name = entry.name
-
-                        display_name = spec.strip_prefix_from_name(
-                            entry.domain_and_role, display_name
-                        )
-
-                    title: List[n.InlineNode] = [n.Text((-1,), display_name)]
-                    results.append(
-                        TargetDatabase.ExternalResult(url, entry.name, title)
-                    )
+        # Get URL from intersphinx inventories
+        results.extend(external_results)
 
         return results
 
     def get_suggestions(self, key: str) -> Sequence[str]:
         key = normalize_target(key)
         key = key.split(":", 2)[2]
-        candidates: List[str] = []
-
-        with self.lock:
-            intersphinx_keys: Iterable[str] = itertools.chain.from_iterable(
-                (str(s) for s in inventory.targets.keys())
-                for inventory in self.intersphinx_inventories.values()
-            )
-            all_keys: Iterable[str] = itertools.chain(
-                self.local_definitions.keys(), intersphinx_keys
-            )
 
-            key_parts = PAT_TARGET_PART_SEPARATOR.split(key)
-
-            for original_key_definition in all_keys:
-                key_definition = original_key_definition.split(":", 2)[2]
-                if abs(len(key) - len(key_definition)) > 2:
-                    continue
+        intersphinx_suggestions = self.intersphinx_suggestions
+        with intersphinx_suggestions.lock:
+            if not intersphinx_suggestions.populated:
+                for inventory in self.intersphinx_inventories.values():
+                    for target in inventory.targets.keys():
+                        intersphinx_suggestions.add(str(target))
+                intersphinx_suggestions.populated = True
 
-                # Tokens tend to be separated by - and _: if there's a different number of
-                # separators, don't attempt a typo correction
-                key_definition_parts = PAT_TARGET_PART_SEPARATOR.split(key_definition)
-                if len(key_definition_parts) != len(key_parts):
-                    continue
+        with self.lock:
+            if self.local_suggestions is None:
+                self.local_suggestions = SuggestionIndex()
+                for local_key in self.local_definitions.keys():
+                    self.local_suggestions.add(local_key)
 
-                # Evaluate each part separately, since we can abort before evaluating the rest.
-                # Small bonus: complexity is O(N*M)
-                if all(
-                    dist <= 2
-                    for dist in (
-                        util.damerau_levenshtein_distance(p1, p2)
-                        for p1, p2 in zip(key_parts, key_definition_parts)
-                    )
-                ):
-                    candidates.append(original_key_definition)
+            candidates = self.local_suggestions.search(key)
 
-            return candidates
+        candidates.extend(intersphinx_suggestions.search(key))
+        return candidates
 
     def define_local_target(
         self,
@@ -176,15 +333,38 @@ class TargetDatabase:
         canonical_target_name = max(targets, key=lambda x: x.count("."))
 
         with self.lock:
+            definitions = (
+                self.local_definitions
+                if self.definition_sink is None
+                else self.definition_sink
+            )
             for target in targets:
                 target = normalize_target(target)
                 key = f"{domain}:{name}:{target}"
-                self.local_definitions[key].append(
+                if definitions is self.local_definitions:
+                    self._add_local_key(key)
+                definitions[key].append(
                     TargetDatabase.LocalDefinition(
                         canonical_target_name, pageid, title, html5_id
                     )
                 )
 
+    def merge_local_definitions(
+        self, definitions: Mapping[str, Sequence[LocalDefinition]]
+    ) -> None:
+        """Add local target definitions made in another database, such as one used to
+        postprocess a shard of pages in a worker process."""
+        with self.lock:
+            for key, key_definitions in definitions.items():
+                self._add_local_key(key)
+                self.local_definitions[key].extend(key_definitions)
+
+    def _add_local_key(self, key: str) -> None:
+        """Index a key about to be added to local_definitions for suggestions, if the index
+        has been built. The caller must hold the lock."""
+        if self.local_suggestions is not None and key not in self.local_definitions:
+            self.local_suggestions.add(key)
+
     def reset(self, config: "ProjectConfig") -> Sequence[Tuple[str, str]]:
         """Reset this database to a "blank" state with intersphinx inventories defined by
         the given ProjectConfig instance."""
@@ -192,15 +372,21 @@ class TargetDatabase:
         logger.debug("Loading %s intersphinx inventories", len(config.intersphinx))
         fetched_inventories: Dict[str, intersphinx.Inventory] = {}
 
-        for url in config.intersphinx:
-            try:
-                fetched_inventories[url] = intersphinx.fetch_inventory(url)
-            except requests.exceptions.RequestException as err:
-                failed_requests.append((url, str(err)))
+        for url, result in zip(
+            config.intersphinx, intersphinx.fetch_inventories(config.intersphinx)
+        ):
+            if isinstance(result, requests.exceptions.RequestException):
+                failed_requests.append((url, str(result)))
+            else:
+                fetched_inventories[url] = result
 
         with self.lock:
             self.intersphinx_inventories = fetched_inventories
+            self.intersphinx_suggestions = SuggestionIndex()
+            self.intersphinx_index = InventoryIndex()
+            self.intersphinx_memo = {}
             self.local_definitions.clear()
+            self.local_suggestions = None
 
         return failed_requests
 
@@ -237,10 +423,15 @@ class TargetDatabase:
             return intersphinx.Inventory(base_url, targets)
 
     def copy_clean_slate(self) -> "TargetDatabase":
-        """Create a deep copy of this database that only inherits the intersphinx targets.
-        This is used for seeding the postprocessor."""
+        """Create a copy of this database that only inherits the intersphinx targets.
+        This is used for seeding the postprocessor. Inventories are immutable, so the
+        copy shares them with this database."""
         with self.lock:
-            return type(self)(copy.deepcopy(self.intersphinx_inventories))
+            return type(self)(
+                dict(self.intersphinx_inventories),
+                intersphinx_suggestions=self.intersphinx_suggestions,
+                intersphinx_index=self.intersphinx_index,
+            )
 
     @classmethod
     def load(
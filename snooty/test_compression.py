@@ -0,0 +1,65 @@
+import gzip
+import os
+
+import pytest
+
+from . import compression
+from .compression import Codec, GzipCodec, UnknownCodecError, ZlibCodec
+
+
+def test_parse_codec() -> None:
+    assert Codec.parse("zlib") == ZlibCodec()
+    assert Codec.parse("zlib:9").level == 9
+    assert Codec.parse("gzip").spec == "gzip:9"
+    assert Codec.parse("none").spec == "none"
+    assert {Codec.parse("zlib:6"), ZlibCodec()} == {ZlibCodec(6)}
+
+    with pytest.raises(UnknownCodecError):
+        Codec.parse("brotli")
+
+    with pytest.raises(UnknownCodecError):
+        Codec.parse("zlib:fast")
+
+
+@pytest.mark.parametrize("codec_name", list(compression.CODECS))
+def test_round_trip(codec_name: str) -> None:
+    codec = Codec.parse(codec_name)
+    data = os.urandom(1000) + b"snooty" * 10000
+    assert codec.decompress(codec.compress(data)) == data
+
+    # Archives split into several chunks must be reassembled in order
+    for payload in (data, b""):
+        packed = compression.pack(codec, payload, chunk_size=4096, max_workers=4)
+        assert compression.unpack(packed, max_workers=4) == payload
+
+
+def test_archive_format() -> None:
+    data = b"snooty" * 10000
+
+    # Gzip archives remain plain gzip streams, readable by older versions of snooty
+    packed = compression.pack(GzipCodec(), data, chunk_size=4096)
+    assert gzip.decompress(packed) == data
+    assert compression.unpack(gzip.compress(data)) == data
+
+    # Their members are listed, so that they can be decompressed in parallel
+    members = compression._split_gzip_members(packed)
+    assert members is not None
+    assert len(members) == len(range(0, len(data), 4096))
+    assert b"".join(gzip.decompress(member) for member in members) == data
+    assert compression.unpack(packed, max_workers=4) == data
+    assert compression._split_gzip_members(gzip.compress(data)) is None
+
+    # Other codecs are recorded in a header
+    packed = compression.pack(ZlibCodec(), data, chunk_size=4096)
+    assert packed.startswith(compression.MAGIC)
+
+    with pytest.raises(ValueError):
+        compression.unpack(packed[:-1])
+
+    # Headers cut short are reported as corrupt, rather than as struct errors
+    for length in (len(compression.MAGIC) + 1, len(compression.MAGIC) + 8, 24):
+        with pytest.raises(ValueError):
+            compression.unpack(packed[:length])
+
+    with pytest.raises(ValueError):
+        compression.unpack(b"not an archive")
@@ -0,0 +1,109 @@
+import sys
+import threading
+from typing import List, Tuple
+
+from . import n
+from .eventparser import EventParser, FileIdStack
+from .n import FileId
+from .page import Page
+
+
+class Recorder:
+    def __init__(self) -> None:
+        self.calls: List[Tuple[str, str]] = []
+
+    def on_any(self, fileid_stack: FileIdStack, node: n.Node) -> None:
+        self.calls.append(("any", node.type))
+
+    def on_text(self, fileid_stack: FileIdStack, node: n.Node) -> None:
+        self.calls.append(("text", node.type))
+
+    def on_toctree(self, fileid_stack: FileIdStack, node: n.Node) -> None:
+        self.calls.append(("toctree", node.type))
+
+
+def test_dispatch() -> None:
+    page = Page.create(FileId("index.txt"), None, "")
+    page.ast.children = [
+        n.Paragraph((1,), [n.Text((1,), "foo"), n.Emphasis((1,), [])]),
+        n.Directive((2,), [n.Text((3,), "bar")], "", "note", [], {}),
+        n.TocTreeDirective((4,), [], "", "toctree", [], {}, []),
+    ]
+
+    recorder = Recorder()
+    parser = EventParser(threading.Event())
+    parser.add_event_listener(EventParser.OBJECT_START_EVENT, recorder.on_any)
+    parser.add_event_listener(
+        EventParser.OBJECT_START_EVENT, recorder.on_text, (n.Text,)
+    )
+    parser.add_event_listener(
+        EventParser.OBJECT_START_EVENT,
+        recorder.on_toctree,
+        (n.InlineParent, n.Directive),
+        {"toctree"},
+    )
+    parser.consume([(FileId("index.txt"), page)])
+
+    # Listeners are only called for nodes of their types, and directives of their names
+    assert [call for call in recorder.calls if call[0] != "any"] == [
+        ("text", "text"),
+        ("toctree", "emphasis"),
+        ("text", "text"),
+        ("toctree", "directive"),
+    ]
+    assert parser.listener_calls() == {
+        "Recorder.on_any": 7,
+        "Recorder.on_text": 2,
+        "Recorder.on_toctree": 2,
+    }
+
+
+def test_traversal_order() -> None:
+    events: List[Tuple[str, str, str]] = []
+
+    def on_start(fileid_stack: FileIdStack, node: n.Node) -> None:
+        events.append(("start", node.type, fileid_stack.current.as_posix()))
+
+    def on_end(fileid_stack: FileIdStack, node: n.Node) -> None:
+        events.append(("end", node.type, fileid_stack.current.as_posix()))
+
+    include = n.Directive(
+        (2,), [n.Root((0,), [], FileId("fact.rst"), {})], "", "include", [], {}
+    )
+    include.argument = [n.Text((2,), "/fact.rst")]
+    page = Page.create(FileId("index.txt"), None, "")
+    page.ast.children = [
+        n.DefinitionListItem((1,), [], [n.Text((1,), "term")]),
+        include,
+    ]
+
+    parser = EventParser(threading.Event())
+    parser.add_event_listener(EventParser.OBJECT_START_EVENT, on_start)
+    parser.add_event_listener(EventParser.OBJECT_END_EVENT, on_end)
+    parser.consume([(FileId("index.txt"), page)])
+
+    # Each node is exited after its term, argument, and children; and nested roots
+    # are reflected in the file ID stack
+    assert events == [
+        ("start", "root", "index.txt"),
+        ("start", "definitionListItem", "index.txt"),
+        ("start", "text", "index.txt"),
+        ("end", "text", "index.txt"),
+        ("end", "definitionListItem", "index.txt"),
+        ("start", "directive", "index.txt"),
+        ("start", "text", "index.txt"),
+        ("end", "text", "index.txt"),
+        ("start", "root", "fact.rst"),
+        ("end", "root", "fact.rst"),
+        ("end", "directive", "index.txt"),
+        ("end", "root", "index.txt"),
+    ]
+
+    # Trees deeper than the recursion limit can be traversed
+    deep: n.Parent[n.Node] = n.Section((0,), [])
+    for _ in range(sys.getrecursionlimit() * 2):
+        deep = n.Section((0,), [deep])
+    page.ast.children = [deep]
+    events.clear()
+    parser.consume([(FileId("index.txt"), page)])
+    assert len(events) == (sys.getrecursionlimit() * 2 + 2) * 2
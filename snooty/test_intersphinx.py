@@ -1,17 +1,27 @@
+import http.server
 import os
 import shutil
+import threading
 from pathlib import Path
+from typing import Iterator, List
 
+import pytest
 import requests
 from pytest import raises
 
 from . import n
 from .diagnostics import FetchError
-from .intersphinx import Inventory, TargetDefinition, fetch_inventory
+from .intersphinx import (
+    Inventory,
+    TargetDefinition,
+    fetch_inventories,
+    fetch_inventory,
+)
 from .n import FileId
 from .parser import Project
 from .target_database import TargetDatabase
 from .test_project import Backend
+from .util import HTTPCache
 from .util_test import make_test
 
 TESTING_CACHE_DIR = Path(f".intersphinx_cache-{os.getpid()}")
@@ -48,16 +58,16 @@ def test_fetch() -> None:
         stat = INVENTORY_PATH.stat()
 
         try:
-            original_requests_get = requests.get
+            original_request = requests.Session.request
 
-            def get_fail(*args: object, **kwargs: object) -> object:
+            def request_fail(*args: object, **kwargs: object) -> object:
                 assert False, "Made a get request but shouldn't have"
 
-            requests.get = get_fail  # type: ignore
+            requests.Session.request = request_fail  # type: ignore
             # Make sure that an immediate followup request does not change the mtime
             fetch_inventory(INVENTORY_URL, TESTING_CACHE_DIR)
         finally:
-            requests.get = original_requests_get
+            requests.Session.request = original_request  # type: ignore
 
         assert INVENTORY_PATH.is_file()
         stat2 = INVENTORY_PATH.stat()
@@ -89,12 +99,88 @@ def test_intersphinx_generation() -> None:
         inventory.dumps("", "foo\nbar")
 
 
+def test_binary_inventory() -> None:
+    for name in ("manual", "django", "ecosystem"):
+        inventory = Inventory.parse(
+            INVENTORY_URL,
+            Path(f"test_data/test_intersphinx/{name}.inv").read_bytes(),
+        )
+        data = inventory.dumps_binary()
+        loaded = Inventory.loads_binary(INVENTORY_URL, data)
+        assert loaded == inventory
+        assert list(loaded.targets) == list(inventory.targets)
+
+    # Keys and URIs that are not implied by the other fields survive a round trip
+    inventory = Inventory(
+        INVENTORY_URL,
+        {
+            "std:label:foo": TargetDefinition(
+                "bar", ("std", "label"), -1, "foo$", "foo.html", None
+            ),
+            "std:label:baz": TargetDefinition(
+                "baz", ("std", "label"), 1, "baz/$", "baz/baz", "Baz"
+            ),
+        },
+    )
+    assert Inventory.loads_binary(INVENTORY_URL, inventory.dumps_binary()) == inventory
+    assert Inventory.loads_binary(
+        INVENTORY_URL, Inventory(INVENTORY_URL).dumps_binary()
+    ) == Inventory(INVENTORY_URL)
+
+    with raises(ValueError):
+        Inventory.loads_binary(INVENTORY_URL, inventory.dumps_binary()[:-4])
+
+    with raises(ValueError):
+        Inventory(
+            INVENTORY_URL,
+            {
+                "std:label:foo": TargetDefinition(
+                    "foo", ("std", "label"), -1, "foo", "foo", "foo\nbar"
+                )
+            },
+        ).dumps_binary()
+
+
+def test_parsed_inventory_cache(
+    tmp_path: Path, monkeypatch: pytest.MonkeyPatch
+) -> None:
+    url = "https://example.invalid/manual/objects.inv"
+    raw_path = HTTPCache(tmp_path).get_cache_path(url)
+    assert raw_path is not None
+    raw_path.write_bytes(Path("test_data/test_intersphinx/manual.inv").read_bytes())
+
+    inventory = fetch_inventory(url, tmp_path)
+    assert inventory.base_url == "https://example.invalid/manual/"
+    assert raw_path.with_name(raw_path.name + ".parsed").is_file()
+
+    # An unchanged raw payload is loaded from its parsed copy
+    original_parse = Inventory.parse
+
+    def parse_fail(*args: object, **kwargs: object) -> object:
+        assert False, "Parsed an inventory but shouldn't have"
+
+    monkeypatch.setattr(Inventory, "parse", parse_fail)
+    assert fetch_inventory(url, tmp_path) == inventory
+    assert fetch_inventories([url], tmp_path) == [inventory]
+    monkeypatch.setattr(Inventory, "parse", original_parse)
+
+    # A changed raw payload is parsed again
+    ecosystem_bytes = Path("test_data/test_intersphinx/ecosystem.inv").read_bytes()
+    raw_path.write_bytes(ecosystem_bytes)
+    expected = Inventory.parse("https://example.invalid/manual/", ecosystem_bytes)
+    assert fetch_inventory(url, tmp_path) == expected
+    monkeypatch.setattr(Inventory, "parse", parse_fail)
+    assert fetch_inventory(url, tmp_path) == expected
+
+
 def test_dump_target_database() -> None:
     backend = Backend()
-    project = Project(Path("test_data/test_intersphinx"), backend, {})
-    project.build()
-    with project._lock:
-        generated_inventory = project._project.targets.generate_inventory(INVENTORY_URL)
+    with Project(Path("test_data/test_intersphinx"), backend, {}) as project:
+        project.build()
+        with project._lock:
+            generated_inventory = project._project.targets.generate_inventory(
+                INVENTORY_URL
+            )
 
     with open("test_data/test_intersphinx/ecosystem.inv", "rb") as f:
         reference_inventory = Inventory.parse(INVENTORY_URL, f.read())
@@ -150,14 +236,90 @@ def test_target_strange_fields() -> None:
     # Now corrupt the domain:role name pair to ensure we don't crash
     good_role_name = "std:label:foo:bar"
     weird_role_name = "std:lab:el:foo:bar"
-    inventory.targets[weird_role_name] = inventory.targets[good_role_name]._replace(
+    targets = dict(inventory.targets)
+    targets[weird_role_name] = targets.pop(good_role_name)._replace(
         role=("std", "lab:el")
     )
-    del inventory.targets[good_role_name]
+    inventory = Inventory(inventory.base_url, targets)
     inventory_bytes = inventory.dumps("", "")
     Inventory.parse("", inventory_bytes)
 
 
+def test_intersphinx_lookup() -> None:
+    def define(name: str, uri: str) -> TargetDefinition:
+        domain, role, target = name.split(":", 2)
+        return TargetDefinition(target, (domain, role), -1, uri, uri, None)
+
+    first = Inventory(
+        "https://example.com/first/",
+        {
+            "std:label:shared": define("std:label:shared", "shared.html"),
+            "std:label:lowercase": define("std:label:lowercase", "lowercase.html"),
+            "mongodb:dbcommand:dbcmd.find": define(
+                "mongodb:dbcommand:dbcmd.find", "find.html"
+            ),
+        },
+    )
+    second = Inventory(
+        "https://example.com/second/",
+        {
+            "std:label:Lowercase": define("std:label:Lowercase", "upper.html"),
+            "std:label:shared": define("std:label:shared", "shared.html"),
+            "mongodb:phpclass:MongoDB\\Client": define(
+                "mongodb:phpclass:MongoDB\\Client", "client-class.html"
+            ),
+        },
+    )
+    db = TargetDatabase(intersphinx_inventories={"first": first, "second": second})
+
+    def urls(key: str) -> List[str]:
+        return [
+            result.url
+            for result in db[key]
+            if isinstance(result, TargetDatabase.ExternalResult)
+        ]
+
+    # Results are in inventory order, and each inventory falls back to lower-cased keys
+    # independently
+    assert urls("std:label:shared") == [
+        "https://example.com/first/shared.html",
+        "https://example.com/second/shared.html",
+    ]
+    assert urls("std:label:Lowercase") == [
+        "https://example.com/first/lowercase.html",
+        "https://example.com/second/upper.html",
+    ]
+    assert urls("mongodb:phpclass:MongoDB\\\\Client") == [
+        "https://example.com/second/client-class.html"
+    ]
+    assert db["std:label:missing"] == []
+
+    # Titles are taken from the target name, with the role's prefix stripped
+    (result,) = db["mongodb:dbcommand:dbcmd.find"]
+    assert result == TargetDatabase.ExternalResult(
+        "https://example.com/first/find.html",
+        "dbcmd.find",
+        (n.Text((-1,), "find"),),
+    )
+
+    # Lookups are memoized in each database, and resolved once across clean copies
+    assert db["std:label:shared"][0] is db["std:label:shared"][0]
+    clean = db.copy_clean_slate()
+    assert clean.intersphinx_index is db.intersphinx_index
+    assert not clean.intersphinx_memo
+    assert clean["std:label:shared"][0] is db["std:label:shared"][0]
+
+    # Local definitions come first, and are not memoized
+    clean.define_local_target(
+        "std", "label", ["shared"], FileId("index.txt"), [], "std-label-shared"
+    )
+    assert [type(result) for result in clean["std:label:shared"]] == [
+        TargetDatabase.InternalResult,
+        TargetDatabase.ExternalResult,
+        TargetDatabase.ExternalResult,
+    ]
+
+
 def test_targets() -> None:
     db = TargetDatabase()
 
@@ -235,6 +397,92 @@ intersphinx = ["booglygoogly not a real URL"]
         ]
 
 
+class InventoryServer(http.server.ThreadingHTTPServer):
+    """A local stand-in for the servers that host intersphinx inventories. Each request
+    for an inventory waits until as many requests are in flight as there are inventories,
+    so that fetching them one at a time fails."""
+
+    def __init__(self, n_inventories: int) -> None:
+        super().__init__(("127.0.0.1", 0), InventoryRequestHandler)
+        self.barrier = threading.Barrier(n_inventories, timeout=10)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class InventoryRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: InventoryServer
+
+    def do_GET(self) -> None:
+        path = Path("test_data/test_intersphinx").joinpath(self.path.rsplit("/", 1)[1])
+        if not path.is_file():
+            self.send_error(404)
+            return
+
+        try:
+            self.server.barrier.wait()
+        except threading.BrokenBarrierError:
+            self.send_error(500)
+            return
+
+        data = path.read_bytes()
+        self.send_response(200)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def inventory_server() -> Iterator[InventoryServer]:
+    server = InventoryServer(3)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+@pytest.mark.parametrize("process_parse_threshold", [0, 1024 * 1024])
+def test_fetch_inventories(
+    inventory_server: InventoryServer, tmp_path: Path, process_parse_threshold: int
+) -> None:
+    urls = [
+        f"{inventory_server.url}/manual/manual.inv",
+        f"{inventory_server.url}/missing/missing.inv",
+        f"{inventory_server.url}/django/django.inv",
+        f"{inventory_server.url}/ecosystem/ecosystem.inv",
+    ]
+    results = fetch_inventories(
+        urls, tmp_path, process_parse_threshold=process_parse_threshold
+    )
+
+    # Results are in the order of the URLs, with the errors of failed fetches
+    assert isinstance(results[1], requests.exceptions.HTTPError)
+    inventories = [results[0], results[2], results[3]]
+    assert [
+        inventory.base_url
+        for inventory in inventories
+        if isinstance(inventory, Inventory)
+    ] == [
+        f"{inventory_server.url}/manual/",
+        f"{inventory_server.url}/django/",
+        f"{inventory_server.url}/ecosystem/",
+    ]
+
+    for inventory, name in zip(inventories, ("manual", "django", "ecosystem")):
+        expected = Inventory.parse(
+            f"{inventory_server.url}/{name}/",
+            Path(f"test_data/test_intersphinx/{name}.inv").read_bytes(),
+        )
+        assert inventory == expected
+
+
 def test_suggestions() -> None:
     inventory_bytes = Path("test_data/test_intersphinx/manual.inv").read_bytes()
     inventory = Inventory.parse(INVENTORY_URL, inventory_bytes)
@@ -271,6 +519,45 @@ def test_suggestions() -> None:
         "std:label:a-label-on-index"
     ]
 
+    # Targets defined after the suggestion index is built must also be suggested, in
+    # the order in which they were defined
+    db.define_local_target(
+        "std",
+        "label",
+        ["a-label-in-index"],
+        FileId("reference/index.txt"),
+        [n.Text(span=(7,), value="A Label in Index")],
+        "std-label-a-label-in-index",
+    )
+    assert db.get_suggestions("std:label:a-labal-on-index") == [
+        "std:label:a-label-on-index",
+        "std:label:a-label-in-index",
+    ]
+
+    # Local targets come before intersphinx targets
+    db.define_local_target(
+        "std",
+        "label",
+        ["3.6-bind-to-localhosts"],
+        FileId("reference/index.txt"),
+        [n.Text(span=(7,), value="Bind to Localhosts")],
+        "std-label-3.6-bind-to-localhosts",
+    )
+    assert db.get_suggestions("std:label:3.6-bind-to-localhst") == [
+        "std:label:3.6-bind-to-localhosts",
+        "std:label:3.6-bind-to-localhost",
+    ]
+
+    # Clean copies share the intersphinx index, but not the local targets
+    clean = db.copy_clean_slate()
+    assert clean.intersphinx_suggestions is db.intersphinx_suggestions
+    assert clean.intersphinx_inventories["manual"] is inventory
+    assert clean.local_definitions is not db.local_definitions
+    assert clean.get_suggestions("std:label:a-labal-on-index") == []
+    assert clean.get_suggestions("std:label:3.6-bind-to-localhst") == [
+        "std:label:3.6-bind-to-localhost"
+    ]
+
 
 def test_cross_reference_roles() -> None:
     inventory_bytes = Path("test_data/test_intersphinx/django.inv").read_bytes()
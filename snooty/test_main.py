@@ -105,8 +105,8 @@ def test_manifest() -> None:
         f = io.BytesIO()
         zf = zipfile.ZipFile(f, mode="w")
         backend = main.ZipBackend(zf)
-        project = Project(Path("test_data/test_project/"), backend, {})
-        project.build()
+        with Project(Path("test_data/test_project/"), backend, {}) as project:
+            project.build()
         backend.flush()
         backend.close()
 
@@ -14,8 +14,10 @@ from .util_test import check_ast_testing_string
 def backend() -> Backend:
     backend = Backend()
     build_identifiers: BuildIdentifierSet = {}
-    project = Project(Path("test_data/test_mongodb_domain"), backend, build_identifiers)
-    project.build()
+    with Project(
+        Path("test_data/test_mongodb_domain"), backend, build_identifiers
+    ) as project:
+        project.build()
 
     return backend
 
@@ -0,0 +1,76 @@
+import sys
+
+import pytest
+
+from . import n
+from .n import FileId
+
+
+def test_deep_copy() -> None:
+    text = n.Text((1,), "foo")
+    directive = n.Directive(
+        (1,), [n.Paragraph((2,), [text])], "", "include", [], {"start-after": "bar"}
+    )
+    root = n.Root((0,), [directive], FileId("index.txt"), {"title": ["Foo"]})
+
+    copy = n.deep_copy(root)
+    assert copy == root
+    assert copy.serialize() == root.serialize()
+
+    # Nodes, lists, and dicts are copied; immutable values are shared
+    copied_directive = copy.children[0]
+    assert isinstance(copied_directive, n.Directive)
+    assert copied_directive is not directive
+    assert copied_directive.children[0] is not directive.children[0]
+    assert copied_directive.options is not directive.options
+    assert copy.options["title"] is not root.options["title"]
+    assert copy.fileid is root.fileid
+
+    copied_directive.options["start-after"] = "baz"
+    assert directive.options["start-after"] == "bar"
+
+
+def test_walk() -> None:
+    item = n.DefinitionListItem(
+        (1,), [n.Paragraph((2,), [])], [n.Literal((1,), [n.Text((1,), "term")])]
+    )
+    directive = n.Directive((3,), [n.Text((4,), "body")], "", "note", [], {})
+    directive.argument = [n.Text((3,), "title")]
+    root = n.Root((0,), [n.DefinitionList((1,), [item]), directive], FileId("a"), {})
+
+    # Terms and arguments are visited before children
+    assert [node.type for node in n.walk(root)] == [
+        "root",
+        "definitionList",
+        "definitionListItem",
+        "literal",
+        "text",
+        "paragraph",
+        "directive",
+        "text",
+        "text",
+    ]
+    assert [node.value for node in n.walk(directive) if isinstance(node, n.Text)] == [
+        "title",
+        "body",
+    ]
+
+    # Trees deeper than the recursion limit can be walked and verified
+    deep: n.Parent[n.Node] = n.Section((0,), [])
+    for _ in range(sys.getrecursionlimit() * 2):
+        deep = n.Section((0,), [deep])
+    assert sum(1 for _ in n.walk(deep)) == sys.getrecursionlimit() * 2 + 1
+    deep.verify()
+    deep_copy = n.deep_copy(deep)
+    assert sum(1 for _ in n.walk(deep_copy)) == sys.getrecursionlimit() * 2 + 1
+    assert all(
+        copied is not original and copied.children is not original.children
+        for copied, original in zip(n.walk(deep_copy), n.walk(deep))
+        if isinstance(copied, n.Parent) and isinstance(original, n.Parent)
+    )
+
+    # Verification applies to every node in the tree
+    bad_role = n.RefRole((0,), [], "", "ref", "foo", "", None, None)
+    directive.children.append(n.Paragraph((5,), [bad_role]))
+    with pytest.raises(AssertionError):
+        root.verify()
@@ -1,20 +1,85 @@
+import threading
 from pathlib import Path
 
 from .n import FileId
-from .page_database import PageDatabase
+from .page_database import PageDatabase, SnapshotPages
 from .parser import Project
 from .test_project import Backend
 
 
 def test_persistence() -> None:
     backend = Backend()
-    project = Project(Path("test_data/test_project_embedding_includes/"), backend, {})
-    project.build()
+    with Project(
+        Path("test_data/test_project_embedding_includes/"), backend, {}
+    ) as project:
+        project.build()
 
-    with project._lock:
-        persisted = project._project.pages.persist()
-        loaded = PageDatabase.from_persisted(persisted)
-        assert loaded == project._project.pages
+        with project._lock:
+            persisted = project._project.pages.persist()
+            loaded = PageDatabase.from_persisted(persisted)
+            assert loaded == project._project.pages
 
-        loaded._parsed[FileId("index.txt")][0].ast.children[0].span = (2,)
-        assert loaded != project._project.pages
+            loaded._parsed[FileId("index.txt")][0].ast.children[0].span = (2,)
+            assert loaded != project._project.pages
+
+
+def test_snapshots() -> None:
+    backend = Backend()
+    with Project(
+        Path("test_data/test_project_embedding_includes/"), backend, {}
+    ) as project:
+        project.build()
+
+        with project._lock:
+            pages = project._project.pages
+            index_page = pages._parsed[FileId("index.txt")][0]
+            include_fileid = next(
+                fileid for fileid in pages._parsed if fileid.suffix == ".rst"
+            )
+            include_page = pages._parsed[include_fileid][0]
+
+            # Pages which the postprocessor modifies are copied; other pages share their ASTs
+            postprocessed_index = pages[FileId("index.txt")]
+            assert postprocessed_index is not index_page
+            assert postprocessed_index.ast is not index_page.ast
+            assert pages[include_fileid] is not include_page
+            assert pages[include_fileid].ast is include_page.ast
+
+            # Pages are copied only once they are read
+            snapshot = SnapshotPages(
+                {k: v[0] for k, v in pages._parsed.items()}, threading.Event()
+            )
+            assert not snapshot._copies
+            index_copy = snapshot[FileId("index.txt")]
+            assert index_copy is not index_page
+            assert snapshot[FileId("index.txt")] is index_copy
+            assert list(snapshot._copies) == [FileId("index.txt")]
+
+            pages[include_fileid] = pages._parsed[include_fileid]
+            project._project.postprocess()
+            assert pages[FileId("index.txt")] is not postprocessed_index
+
+
+def test_one_shot_build() -> None:
+    path = Path("test_data/test_project_embedding_includes/")
+    backend = Backend()
+    one_shot_backend = Backend()
+    with Project(path, backend, {}) as project, Project(
+        path, one_shot_backend, {}
+    ) as one_shot_project:
+        project.build()
+        one_shot_project.build(one_shot=True)
+
+        # The postprocessor modifies the parsed pages, rather than copies of them
+        assert one_shot_backend.pages.keys() == backend.pages.keys()
+        for fileid, page in backend.pages.items():
+            assert (
+                one_shot_backend.pages[fileid].ast.serialize() == page.ast.serialize()
+            )
+
+        with one_shot_project._lock:
+            pages = one_shot_project._project.pages
+            assert not pages._parsed
+            assert (
+                pages.merge_diagnostics() == project._project.pages.merge_diagnostics()
+            )
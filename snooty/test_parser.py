@@ -1,6 +1,7 @@
+import pickle
 from pathlib import Path
 
-from . import rstparser, util
+from . import n, rstparser, util
 from .diagnostics import (
     AmbiguousLiteralInclude,
     CannotOpenFile,
@@ -2886,6 +2887,43 @@ This is an autonumbered footnote [#]_ in use.
     )
 
 
+def test_node_index() -> None:
+    project_config = ProjectConfig(ROOT_PATH, "", source="./")
+    parser = rstparser.Parser(project_config, JSONVisitor)
+    page, diagnostics = parse_rst(
+        parser,
+        FileId("test.rst"),
+        """
+.. include:: /includes/a.rst
+
+.. note::
+
+   .. toctree::
+
+      /page1
+
+.. include:: /includes/b.rst
+""",
+    )
+    page.finish(diagnostics)
+    index = page.node_index
+    assert index is not None
+    assert "toctree" in index and "sharedinclude" not in index
+    assert [
+        "".join(arg.get_text() for arg in node.argument)
+        for node in index.get("include")
+    ] == ["/includes/a.rst", "/includes/b.rst"]
+
+    # Indexed nodes are those of the tree, even once the page is pickled, as it is in
+    # the parse cache
+    page = pickle.loads(pickle.dumps(page))
+    assert page.node_index is not None
+    toctree = page.node_index.get("toctree")[0]
+    note = page.ast.children[1]
+    assert isinstance(note, n.Directive)
+    assert note.children[0] is toctree
+
+
 def test_toctree() -> None:
     project_root = ROOT_PATH.joinpath("test_project")
     [project_config, project_config_diagnostics] = ProjectConfig.open(project_root)
@@ -2,7 +2,9 @@
 Eventually most postprocessor tests should probably be moved into this format."""
 
 from pathlib import Path, PurePath
-from typing import Any, Dict, cast
+from typing import Any, Dict, List, Optional, Sequence, Tuple, Type, cast
+
+import pytest
 
 from snooty.types import Facet
 
@@ -22,6 +24,7 @@ from .diagnostics import (
     InvalidContextError,
     InvalidIAEntry,
     InvalidIALinkedData,
+    InvalidInclude,
     InvalidNestedTabStructure,
     MissingChild,
     MissingTab,
@@ -35,12 +38,23 @@ from .diagnostics import (
     UnknownDefaultTabId,
     UnknownOptionId,
 )
+from . import n
 from .n import FileId
+from .postprocess import (
+    Context,
+    Handler,
+    IncludeHandler,
+    Postprocessor,
+    PostprocessorResult,
+    SubstitutionHandler,
+    schedule_passes,
+)
 from .util_test import (
     ast_to_testing_string,
     check_ast_testing_string,
     check_toctree_testing_string,
     make_test,
+    make_test_project,
 )
 
 
@@ -801,6 +815,73 @@ def test_toctree_self_add() -> None:
         )
 
 
+def test_toctree_from_node_index(monkeypatch: pytest.MonkeyPatch) -> None:
+    find_toctree_directives = Postprocessor.find_toctree_directives
+    found: List[Dict[FileId, Optional[Sequence[n.Node]]]] = []
+
+    def spy(context: Context) -> Dict[FileId, Optional[Sequence[n.Node]]]:
+        found.append(find_toctree_directives(context))
+        return found[-1]
+
+    monkeypatch.setattr(Postprocessor, "find_toctree_directives", staticmethod(spy))
+    with make_test(
+        {
+            Path(
+                "source/index.txt"
+            ): """
+.. include:: /includes/toc.rst
+
+.. toctree::
+
+   /page3
+""",
+            Path(
+                "source/includes/toc.rst"
+            ): """
+.. toctree::
+
+   /page1
+""",
+            Path(
+                "source/page1.txt"
+            ): """
+.. note::
+
+   .. toctree::
+
+      /page2
+""",
+            Path("source/page2.txt"): "",
+            Path("source/page3.txt"): "",
+            Path("source/page4.txt"): "",
+        }
+    ) as result:
+        check_toctree_testing_string(
+            result.metadata["toctree"],
+            """
+<toctree slug="/">
+    <title><text>untitled</text></title>
+    <toctree slug="page1" drawer="True">
+        <toctree slug="page2" drawer="True" />
+    </toctree>
+    <toctree slug="page3" drawer="True" />
+</toctree>
+""",
+        )
+        assert [type(d) for d in result.diagnostics[FileId("page4.txt")]] == [
+            OrphanedPage
+        ]
+
+    # Pages which include a toctree must be searched; others are found in the index
+    directives = found[0]
+    assert directives[FileId("index.txt")] is None
+    page1_directives = directives[FileId("page1.txt")]
+    assert page1_directives is not None
+    assert [cast(n.Directive, d).name for d in page1_directives] == ["toctree"]
+    assert FileId("includes/toc.rst") in directives
+    assert FileId("page2.txt") not in directives
+
+
 def test_toctree_duplicate_node() -> None:
     with make_test(
         {
@@ -1811,6 +1892,58 @@ Paragraph
         ), "Should raise 3 diagnostics"
 
 
+def test_include_repeated() -> None:
+    """Each include directive receives its own copy of the included content, with nested
+    includes expanded, and its own diagnostics."""
+    with make_test(
+        {
+            Path(
+                "source/index.txt"
+            ): """
+.. include:: /includes/outer.rst
+   :start-after: fake-start-text
+
+.. include:: /includes/outer.rst
+   :start-after: fake-start-text
+
+.. include:: /includes/outer.rst
+""",
+            Path(
+                "source/includes/outer.rst"
+            ): """
+.. include:: /includes/inner.rst
+""",
+            Path(
+                "source/includes/inner.rst"
+            ): """
+Inner paragraph.
+""",
+        }
+    ) as result:
+        assert [
+            (type(d), d.start[0]) for d in result.diagnostics[FileId("index.txt")]
+        ] == [(InvalidInclude, 1), (InvalidInclude, 4)]
+
+        ast = result.pages[FileId("index.txt")].ast
+        includes = list(ast.get_child_of_type(n.Directive))
+        assert len(includes) == 3
+        for include in includes:
+            check_ast_testing_string(
+                include.children[0],
+                """
+<root fileid="includes/outer.rst">
+    <directive name="include"><text>/includes/inner.rst</text>
+        <root fileid="includes/inner.rst">
+            <paragraph><text>Inner paragraph.</text></paragraph>
+        </root>
+    </directive>
+</root>""",
+            )
+
+        outer = [include.children[0] for include in includes]
+        assert outer[0] is not outer[1] and outer[0] is not outer[2]
+
+
 def test_replacements() -> None:
     with make_test(
         {
@@ -5142,3 +5275,323 @@ This file makes sure that rst files nested in a code-examples subdirectory is ok
     </section>
 </root>""",
         )
+
+
+def test_schedule_passes() -> None:
+    class A(Handler):
+        writes = {"a"}
+        reads = frozenset()
+
+    class B(Handler):
+        writes = {"b"}
+        reads = {"a"}
+
+    class C(Handler):
+        reads = frozenset()
+        follows = {"a"}
+
+    class D(Handler):
+        reads = {"b"}
+
+    assert schedule_passes([A, C, B, D]) == [[A, C], [B], [D]]
+    assert schedule_passes([A, C, B, D], fuse=False) == [[A], [C, B], [D]]
+
+    # A handler must be listed after the handlers that it follows in the same pass
+    with pytest.raises(ValueError):
+        schedule_passes([C, A])
+
+    class E(Handler):
+        writes = {"e"}
+        reads = {"d"}
+
+    class F(Handler):
+        writes = {"d"}
+        reads = {"e"}
+
+    with pytest.raises(ValueError):
+        schedule_passes([E, F])
+
+    # Each handler runs after every handler which writes the state that it reads
+    levels = {
+        ty: i
+        for i, project_pass in enumerate(Postprocessor.PASSES)
+        for ty in project_pass
+    }
+    assert set(levels) == set(Postprocessor.HANDLERS)
+    for ty in Postprocessor.HANDLERS:
+        for writer in Postprocessor.HANDLERS:
+            if writer is not ty and not writer.writes.isdisjoint(ty.reads):
+                assert levels[writer] < levels[ty]
+
+    # Includes and substitutions are expanded in a single traversal
+    assert Postprocessor.PASSES[0] == [IncludeHandler, SubstitutionHandler]
+    assert (
+        len(schedule_passes(Postprocessor.HANDLERS, fuse=False))
+        == len(Postprocessor.PASSES) + 1
+    )
+
+
+def test_sharded_postprocessing(monkeypatch: pytest.MonkeyPatch) -> None:
+    """Postprocessing shards of pages in the worker pool gives the same result as
+    postprocessing them in order."""
+    monkeypatch.setattr(Postprocessor, "MIN_SHARD_SIZE", 1)
+    run_sharded = Postprocessor.run_sharded
+    sharded_passes: List[int] = []
+
+    def spy(
+        self: Postprocessor,
+        passes: Sequence[Sequence[Type[Handler]]],
+        context: Context,
+    ) -> bool:
+        sharded_passes.append(len(passes))
+        return run_sharded(self, passes, context)
+
+    monkeypatch.setattr(Postprocessor, "run_sharded", spy)
+    files: Dict[PurePath, str] = {
+        Path(
+            "source/index.txt"
+        ): """
+=====
+Index
+=====
+
+.. toctree::
+
+   Page 1 </page1>
+   /page2
+   /page3
+   /page4
+
+See :ref:`page4-target` and |missing|.
+""",
+        Path(
+            "source/includes/shared.rst"
+        ): """
+Shared Heading
+--------------
+
+.. _shared-target:
+
+Shared paragraph with a footnote [#f1]_ and |sub|.
+
+.. [#f1] Footnote.
+""",
+    }
+    for i in range(1, 5):
+        files[
+            Path(f"source/page{i}.txt")
+        ] = f"""
+.. |sub| replace:: Substitution {i}
+
+.. _page{i}-target:
+
+======
+Page {i}
+======
+
+.. include:: /includes/shared.rst
+
+.. include:: /includes/shared.rst
+
+See :ref:`page1-target`.
+"""
+
+    results = []
+    for parallel_postprocess in (False, True):
+        with make_test_project(files, "test_sharded_postprocessing") as (
+            project,
+            backend,
+        ):
+            project.build(parallel_postprocess=parallel_postprocess)
+            results.append(
+                (
+                    {
+                        fileid.as_posix(): page.ast.serialize()
+                        for fileid, page in backend.pages.items()
+                    },
+                    backend.metadata,
+                    {
+                        fileid.as_posix(): [d.serialize() for d in diagnostics]
+                        for fileid, diagnostics in backend.diagnostics.items()
+                        if diagnostics
+                    },
+                )
+            )
+
+    # Substitutions are expanded along with includes, so only the following pass is
+    # sharded
+    assert sharded_passes == [1]
+
+    serial, sharded = results
+    assert serial == sharded
+    assert serial[2]["index.txt"]
+    assert set(cast(Dict[str, Any], serial[1]["slugToTitle"])) == {
+        "index",
+        "page1",
+        "page2",
+        "page3",
+        "page4",
+    }
+
+
+def test_incremental_postprocessing() -> None:
+    """Postprocessing only the pages affected by each change gives the same result as
+    postprocessing every page."""
+    files: Dict[PurePath, str] = {
+        Path(
+            "source/index.txt"
+        ): """
+=====
+Index
+=====
+
+.. toctree::
+
+   /page1
+   /page2
+   /page3
+   /page4
+
+See :ref:`page2-target` and :doc:`/page3`.
+
+.. include:: /page6.txt
+""",
+        Path(
+            "source/page6.txt"
+        ): """
+.. program:: mongod
+
+.. option:: --port
+
+   The port.
+""",
+        Path(
+            "source/includes/shared.rst"
+        ): """
+.. _shared-target:
+
+Shared paragraph.
+""",
+        Path(
+            "source/page1.txt"
+        ): """
+=====
+Page1
+=====
+
+.. include:: /includes/shared.rst
+
+See :ref:`page2-target`.
+""",
+        Path(
+            "source/page2.txt"
+        ): """
+.. _page2-target:
+
+=====
+Page2
+=====
+
+.. include:: /includes/shared.rst
+""",
+        Path(
+            "source/page3.txt"
+        ): """
+=====
+Page3
+=====
+
+See :ref:`page9-target`.
+""",
+        Path(
+            "source/page4.txt"
+        ): """
+=====
+Page4
+=====
+
+.. include:: /includes/missing.rst
+""",
+    }
+
+    edits: List[Tuple[str, Optional[str]]] = [
+        ("includes/shared.rst", ".. _other-target:\n\nChanged paragraph.\n"),
+        ("page2.txt", ".. _page9-target:\n\n=====\nPage2\n=====\n"),
+        ("page3.txt", "=========\nNew Title\n=========\n\nSee :ref:`page9-target`.\n"),
+        ("includes/missing.rst", "Now it exists.\n"),
+        ("page4.txt", None),
+        ("page5.txt", "=====\nPage5\n=====\n\nSee :ref:`shared-target`.\n"),
+        # Pages including a reused page expand it from its parsed copy
+        ("index.txt", "=====\nIndex\n=====\n\n.. include:: /page6.txt\n"),
+    ]
+
+    def summarize(result: PostprocessorResult) -> Tuple[Any, ...]:
+        return (
+            {
+                fileid.as_posix(): page.ast.serialize()
+                for fileid, page in result.pages.items()
+                if fileid.suffix == ".txt"
+            },
+            # build() adds the project's inventory to the static files
+            {k: v for k, v in result.metadata.items() if k != "static_files"},
+            {
+                fileid.as_posix(): [d.serialize() for d in diagnostics]
+                for fileid, diagnostics in result.diagnostics.items()
+                if diagnostics
+            },
+        )
+
+    with make_test_project(files, "test_incremental_postprocessing") as (
+        project,
+        backend,
+    ):
+        project.build()
+        with project._get_inner() as inner:
+            previous = inner.pages.flush_and_wait(inner.postprocessor_factory)
+
+        for path, text in edits:
+            fileid = FileId(path)
+            if text is None:
+                del files[Path("source", path)]
+                project.delete(fileid)
+            else:
+                files[Path("source", path)] = text
+                project.update(fileid, text)
+
+            with project._get_inner() as inner:
+                result = inner.pages.flush_and_wait(inner.postprocessor_factory)
+
+            with make_test_project(files, "test_incremental_postprocessing") as (
+                full_project,
+                full_backend,
+            ):
+                full_project.build()
+                with full_project._get_inner() as inner:
+                    full_result = inner.pages.flush_and_wait(
+                        inner.postprocessor_factory
+                    )
+                    assert summarize(result) == summarize(full_result)
+
+            # Pages which do not depend on the change are reused
+            reused = {
+                fileid.as_posix()
+                for fileid, page in result.pages.items()
+                if fileid.suffix == ".txt" and previous.pages.get(fileid) is page
+            }
+            # Removing shared-target changes the suggestions for page3's missing target
+            if path == "includes/shared.rst":
+                assert reused == {"index.txt", "page4.txt", "page6.txt"}
+            elif path == "page2.txt":
+                assert reused == {"page4.txt", "page6.txt"}
+            elif path == "includes/missing.rst":
+                assert reused == {
+                    "index.txt",
+                    "page1.txt",
+                    "page2.txt",
+                    "page3.txt",
+                    "page6.txt",
+                }
+            elif path == "index.txt":
+                assert "page6.txt" in reused
+
+            previous = result
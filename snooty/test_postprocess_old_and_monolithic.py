@@ -22,8 +22,10 @@ ROOT_PATH = Path("test_data")
 def backend() -> Backend:
     backend = Backend()
     build_identifiers: BuildIdentifierSet = {"commit_hash": "123456", "patch_id": "678"}
-    project = Project(Path("test_data/test_postprocessor"), backend, build_identifiers)
-    project.build()
+    with Project(
+        Path("test_data/test_postprocessor"), backend, build_identifiers
+    ) as project:
+        project.build()
 
     return backend
 
@@ -1,12 +1,18 @@
+import concurrent.futures
+import gc
+import multiprocessing.pool
+import os
 import shutil
+import sqlite3
 import tempfile
 from collections import defaultdict
 from dataclasses import dataclass, field
 from pathlib import Path, PurePath
-from typing import DefaultDict, Dict, List
+from typing import Callable, DefaultDict, Dict, List, Tuple, cast
 
 import pytest
 
+from .compression import MAGIC, LzmaCodec, ZlibCodec
 from .diagnostics import (
     ConstantNotDeclared,
     Diagnostic,
@@ -17,8 +23,14 @@ from .diagnostics import (
 )
 from .n import FileId, SerializableType
 from .page import Page
-from .parse_cache import CacheStats
-from .parser import Project, ProjectBackend, ProjectLoadError
+from .parse_cache import CacheStats, SharedCache
+from .parser import (
+    ParseResults,
+    ParseWorkerPool,
+    Project,
+    ProjectBackend,
+    ProjectLoadError,
+)
 from .target_database import TargetDatabase
 from .types import BuildIdentifierSet, ProjectConfig
 from .util_test import (
@@ -353,6 +365,184 @@ Testing {+foo+}
                     )
 
 
+def test_cache_formats() -> None:
+    """Ensure that the cache database is loaded lazily, and that caches can still be exported
+    to and imported from gzip archives."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_cache_formats"
+""",
+            Path("source/index.txt"): "Foo",
+            Path("source/other.txt"): "Bar",
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache()
+            assert project.cache_file.path.exists()
+            assert not project.cache_file.archive_path.exists()
+
+            project.load_cache()
+            assert project.cache is not None
+            assert not isinstance(project.cache.pages, dict)
+            assert len(project.cache) == 2
+            project.build(1, False)
+            assert project.cache.stats == CacheStats(hits=2, misses=0, errors=0)
+
+            project.update_cache(archive=True, codec=LzmaCodec())
+            assert not project.cache_file.archive_path.exists()
+            assert project.cache_file.codec_archive_path.read_bytes().startswith(MAGIC)
+            project.cache_file.path.unlink()
+
+            project.load_cache()
+            assert isinstance(project.cache.pages, dict)
+            project.build(1, False)
+            assert project.cache.stats == CacheStats(hits=2, misses=0, errors=0)
+
+            # A corrupt database is ignored in favor of the archive
+            project.cache_file.path.write_bytes(b"garbage")
+            project.load_cache()
+            assert isinstance(project.cache.pages, dict)
+            assert len(project.cache) == 2
+
+            project.cache_file.codec_archive_path.unlink()
+            project.load_cache()
+            assert len(project.cache) == 0
+
+
+def test_cache_codec_change() -> None:
+    """Ensure that a cache keeps being updated after its database is rewritten with a
+    different codec."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_cache_codec_change"
+""",
+            Path("source/index.txt"): "Foo",
+            Path("source/other.txt"): "Bar",
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache()
+
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache(codec=LzmaCodec())
+            assert project.cache is not None
+            assert project.cache.database is not None
+            assert project.cache.database.codec == LzmaCodec()
+
+            (_project.config.source_path / "other.txt").write_text("Baz")
+            project.build(1, False)
+            project.update_cache(codec=ZlibCodec())
+
+            project.load_cache()
+            project.build(1, False)
+            assert project.cache.stats == CacheStats(hits=2, misses=0, errors=0)
+
+
+def test_incremental_cache_update() -> None:
+    """Ensure that updating a cache database only writes new or changed pages, and deletes
+    pages that are no longer live."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_incremental_cache_update"
+""",
+            Path("source/index.txt"): "Foo",
+            Path("source/other.txt"): "Bar",
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache()
+
+            def stored_pages() -> Dict[object, object]:
+                assert project.cache is not None
+                assert project.cache.database is not None
+                rows = project.cache.database.query("SELECT fileid, rowid FROM pages")
+                return {fileid: rowid for fileid, rowid in rows}
+
+            project.load_cache()
+            original_pages = stored_pages()
+            (_project.config.source_path / "other.txt").write_text("Baz")
+            project.build(1, False)
+            project.update_cache()
+
+            updated_pages = stored_pages()
+            assert updated_pages.keys() == {"index.txt", "other.txt"}
+            assert updated_pages["index.txt"] == original_pages["index.txt"]
+            assert updated_pages["other.txt"] != original_pages["other.txt"]
+
+            project.load_cache()
+            project.build(1, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=2, misses=0, errors=0)
+
+
+def test_shared_cache(tmp_path: Path, monkeypatch: pytest.MonkeyPatch) -> None:
+    """Ensure that pages are reused from the shared cache by other checkouts of a project,
+    and that the shared cache is kept within its size limit."""
+    monkeypatch.setattr(SharedCache, "default_path", lambda: tmp_path / "shared.db")
+    files: Dict[PurePath, str] = {
+        Path(
+            "snooty.toml"
+        ): """
+name = "test_shared_cache"
+""",
+        Path("source/index.txt"): "Foo",
+        Path("source/other.txt"): "Bar",
+    }
+
+    with make_test_project(files) as (project, backend):
+        project.load_cache(shared=True)
+        project.build(1, False)
+        project.update_cache()
+
+    files[Path("source/other.txt")] = "Baz"
+    with make_test_project(files) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache(shared=True)
+            project.build(1, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=1, misses=1, errors=0)
+            assert project.cache.stats.shared_hits == 1
+            project.update_cache()
+
+            assert project.shared_cache is not None
+            assert len(project.shared_cache.query("SELECT key FROM entries")) == 3
+            assert project.shared_cache.evict(project.shared_cache.size() - 1) == 1
+            assert len(project.shared_cache.query("SELECT key FROM entries")) == 2
+
+    # A build must not fail while another holds the shared cache's write lock
+    monkeypatch.setattr(SharedCache, "LOCK_TIMEOUT", 0.1)
+    files[Path("source/other.txt")] = "Qux"
+    with make_test_project(files) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache(shared=True)
+            project.build(1, False)
+            other = sqlite3.connect(tmp_path / "shared.db")
+            try:
+                other.execute("BEGIN IMMEDIATE")
+                project.update_cache()
+            finally:
+                other.close()
+
+            assert project.shared_cache is not None
+            assert len(project.shared_cache.query("SELECT key FROM entries")) == 2
+
+
 def test_image_invalidation() -> None:
     """In DOP-4491 we learned that the parser was not properly invalidating page parses when an
     image resource is changed. Ensure that changing a referenced image results in re-reading
@@ -477,6 +667,205 @@ info:
             )
 
 
+def test_stat_cache_validation() -> None:
+    """Ensure that the parse cache trusts unchanged stat information unless told to be paranoid."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_stat_cache_validation"
+""",
+            Path("source/index.txt"): "Foo",
+            Path("source/other.txt"): "Bar",
+        }
+    ) as (_project, backend):
+        index_path = _project.config.source_path / "index.txt"
+        other_path = _project.config.source_path / "other.txt"
+        for path in (index_path, other_path):
+            os.utime(path, ns=(0, 0))
+
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache()
+
+            # Sneakily change a file without changing its size or mtime
+            index_path.write_text("Baz")
+            os.utime(index_path, ns=(0, 0))
+
+            project.load_cache()
+            project.build(1, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=2, misses=0, errors=0)
+            assert project.cache.source_hashes.hits == 2
+
+            project.load_cache(paranoid=True)
+            project.build(1, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=1, misses=1, errors=0)
+            page = project.pages._parsed[FileId("index.txt")][0]
+            assert page.source == "Baz"
+
+
+def test_shared_dependency_hashing() -> None:
+    """Ensure that a dependency shared by many pages is only hashed once per build."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_shared_dependency_hashing"
+""",
+            Path("source/example.py"): "print('hello')\n",
+            **{
+                Path(f"source/page{i}.txt"): ".. literalinclude:: /example.py\n"
+                for i in range(3)
+            },
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(1, False)
+            project.update_cache()
+
+            project.load_cache()
+            project.build(1, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=3, misses=0, errors=0)
+            assert project.cache.stats.saved_reads == 2
+
+
+def test_concurrent_cache_lookups() -> None:
+    """Ensure that cache hits and misses looked up concurrently all reach the page database."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_concurrent_cache_lookups"
+""",
+            **{Path(f"source/page{i}.txt"): f"Page {i}\n" for i in range(8)},
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.load_cache()
+            project.build(4, False)
+            project.update_cache()
+
+            (_project.config.source_path / "page3.txt").write_text("Changed\n")
+
+            project.load_cache()
+            project.build(4, False)
+            assert project.cache is not None
+            assert project.cache.stats == CacheStats(hits=7, misses=1, errors=0)
+            for i in range(8):
+                page = project.pages._parsed[FileId(f"page{i}.txt")][0]
+                assert page.source == ("Changed\n" if i == 3 else f"Page {i}\n")
+
+            # Other threads read committed entries without waiting for a transaction
+            database = project.cache.database
+            assert database is not None
+            with database.transaction():
+                database.set_metadata("pending", True)
+                assert database.get_metadata("pending") is True
+                with concurrent.futures.ThreadPoolExecutor(1) as executor:
+                    future = executor.submit(database.get_metadata, "pending")
+                    with pytest.raises(KeyError):
+                        future.result(timeout=10)
+
+
+def test_worker_pool_reuse() -> None:
+    """Ensure that a project's worker processes survive across builds and asset updates."""
+    with make_test_project(
+        {
+            Path(
+                "snooty.toml"
+            ): """
+name = "test_worker_pool_reuse"
+""",
+            Path(
+                "source/index.txt"
+            ): """
+.. figure:: /images/foo.svg
+   :alt: A figure
+""",
+            Path(
+                "source/other.txt"
+            ): """
+.. figure:: /images/foo.svg
+   :alt: Another figure
+""",
+            Path("source/images/foo.svg"): "foo",
+        }
+    ) as (_project, backend):
+        with _project._get_inner() as project:
+            project.build(1, False)
+            pool = project.workers.get()
+            project.build(1, False)
+            assert project.workers.get() is pool
+
+            # Changing a shared image re-parses its dependents using the same pool
+            (_project.config.source_path / "images/foo.svg").write_text("bar")
+            project.update(FileId("images/foo.svg"))
+            assert project.workers.get() is pool
+            for fileid in (FileId("index.txt"), FileId("other.txt")):
+                page = project.pages._parsed[fileid][0]
+                assert [asset._data for asset in page.static_assets] == [b"bar"]
+
+            project.close()
+            assert project.workers._pool is None
+
+
+def test_parse_results_window() -> None:
+    """Ensure that only a window of files is handed to the worker pool at once, and that
+    the next file is submitted as each one finishes, whether or not it succeeds."""
+
+    class RecordingPool:
+        def __init__(self) -> None:
+            self.submitted: List[
+                Tuple[FileId, Callable[[object], None], Callable[[BaseException], None]]
+            ] = []
+
+        def apply_async(
+            self,
+            func: object,
+            args: Tuple[FileId],
+            callback: Callable[[object], None],
+            error_callback: Callable[[BaseException], None],
+        ) -> None:
+            self.submitted.append((args[0], callback, error_callback))
+
+    pool = RecordingPool()
+    paths = [FileId(f"page{i}.txt") for i in range(3)]
+    results = ParseResults(len(paths), max_in_flight=2)
+    for path in paths:
+        results.parse(cast(multiprocessing.pool.Pool, pool), path)
+    assert [path for path, _, _ in pool.submitted] == paths[:2]
+
+    pool.submitted[0][1]([])
+    assert [path for path, _, _ in pool.submitted] == paths
+    pool.submitted[1][2](ValueError("failed"))
+    pool.submitted[2][1]([])
+
+    assert results.next() == []
+    with pytest.raises(ValueError):
+        results.next()
+    assert results.next() == []
+    with pytest.raises(StopIteration):
+        results.next()
+
+
+def test_worker_pool_finalization() -> None:
+    """Ensure that a worker pool which is dropped without being closed still terminates its
+    workers."""
+    workers = ParseWorkerPool(ProjectConfig(Path("test_data/test_project"), ""))
+    pool = workers.get(1)
+    del workers
+    gc.collect()
+    assert pool._state == multiprocessing.pool.TERMINATE  # type: ignore
+
+
 def test_silencing_diagnostics() -> None:
     with make_test(
         {
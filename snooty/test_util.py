@@ -1,14 +1,19 @@
 import copy
+import datetime
+import hashlib
+import http.server
 import os
 import sys
 import threading
 import time
 from pathlib import Path, PurePath, PurePosixPath
-from typing import Dict, Optional, Sequence, Set, Tuple, Union
+from typing import Dict, Iterator, List, Optional, Sequence, Set, Tuple, Union
 
 import pytest
+import requests
 
 from . import util
+from .n import FileId
 
 
 def test_reroot_path() -> None:
@@ -271,3 +276,221 @@ def test_toml_exception_to_source_info() -> None:
     with pytest.raises(util.TOMLDecodeErrorWithSourceInfo) as exception:
         util.parse_toml_and_add_line_info("[constants]\n\nfoo=5\nfoo=10")
     assert exception.value.lineno == 4
+
+
+def test_performance_logger_overlaps() -> None:
+    perf = util.PerformanceLogger()
+    perf.record("parse", 0.0, 10.0)
+    perf.record("yaml", 2.0, 5.0)
+    perf.record("commit", 10.0, 11.0)
+
+    # Like times, overlaps are the minimum across runs
+    perf.record("parse", 20.0, 29.0)
+    perf.record("yaml", 27.0, 32.0)
+    perf.record("commit", 32.0, 33.0)
+
+    assert perf.times() == {"parse": 9.0, "yaml": 3.0, "commit": 1.0}
+    assert perf.overlaps() == {("parse", "yaml"): 2.0}
+
+
+def test_performance_logger_peak_rss() -> None:
+    perf = util.PerformanceLogger()
+    with perf.start("parse"):
+        pass
+
+    if util.peak_rss() is None:
+        assert perf.peak_rss() == {}
+    else:
+        assert perf.peak_rss()["parse"] > 0
+
+
+def test_file_hash_memo(tmp_path: Path) -> None:
+    path = tmp_path / "foo.txt"
+    path.write_text("foo")
+    fileid = FileId("foo.txt")
+    calls: List[Path] = []
+
+    def hasher(p: Path) -> str:
+        calls.append(p)
+        return p.read_text()
+
+    # Recently-modified files are hashed, but not trusted
+    memo = util.FileHashMemo()
+    assert memo.get(fileid, path, hasher) == "foo"
+    assert memo.get(fileid, path, hasher) == "foo"
+    assert len(calls) == 2 and len(memo) == 0
+
+    # Files with old timestamps are trusted while their stat information is unchanged
+    os.utime(path, ns=(0, 0))
+    assert memo.get(fileid, path, hasher) == "foo"
+    assert memo.get(fileid, path, hasher) == "foo"
+    assert len(calls) == 3
+    assert (memo.hits, memo.misses) == (1, 3)
+
+    path.write_text("barbaz")
+    os.utime(path, ns=(0, 0))
+    assert memo.get(fileid, path, hasher) == "barbaz"
+    assert len(calls) == 4
+
+    # Entries survive pickling, and paranoid mode ignores them
+    memo = copy.deepcopy(memo)
+    assert memo.get(fileid, path, hasher) == "barbaz"
+    assert len(calls) == 4
+    memo.paranoid = True
+    assert memo.get(fileid, path, hasher) == "barbaz"
+    assert len(calls) == 5
+
+    with pytest.raises(OSError):
+        memo.get(FileId("missing.txt"), tmp_path / "missing.txt", hasher)
+
+    # Reading a file always hashes what was read, even if its stat information is unchanged
+    memo.paranoid = False
+    path.write_text("quux")
+    os.utime(path, ns=(0, 0))
+    data, file_hash = memo.read(fileid, path)
+    assert data == b"quux"
+    assert file_hash == hashlib.blake2b(b"quux").hexdigest()
+    assert memo.get(fileid, path, hasher) == file_hash
+
+    # Hashes trusted only for the current build are dropped in forked children
+    recent_path = tmp_path / "recent.txt"
+    recent_path.write_text("recent")
+    recent_fileid = FileId("recent.txt")
+    with memo.build():
+        assert memo.get(recent_fileid, recent_path, hasher) == "recent"
+        assert memo.get(recent_fileid, recent_path, hasher) == "recent"
+        n_calls = len(calls)
+        memo.reset_after_fork()
+        assert memo.get(recent_fileid, recent_path, hasher) == "recent"
+        assert len(calls) == n_calls + 1
+
+
+class RecordingServer(http.server.ThreadingHTTPServer):
+    """A local HTTP server that records the requests made to it. Responses are held back
+    until release is set."""
+
+    ETAG = '"v1"'
+
+    def __init__(self) -> None:
+        super().__init__(("127.0.0.1", 0), RecordingRequestHandler)
+        self.release = threading.Event()
+        self.release.set()
+        self.lock = threading.Lock()
+        #: The path, If-None-Match header, and client port of each request
+        self.requests: List[Tuple[str, Optional[str], int]] = []
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.server_port}"
+
+
+class RecordingRequestHandler(http.server.BaseHTTPRequestHandler):
+    server: RecordingServer
+    protocol_version = "HTTP/1.1"
+
+    def do_GET(self) -> None:
+        with self.server.lock:
+            self.server.requests.append(
+                (self.path, self.headers.get("If-None-Match"), self.client_address[1])
+            )
+
+        self.server.release.wait(10)
+        if self.path == "/missing":
+            self.send_error(404)
+            return
+
+        if self.headers.get("If-None-Match") == RecordingServer.ETAG:
+            self.send_response(304)
+            self.end_headers()
+            return
+
+        data = bytes(f"body of {self.path}", "utf-8")
+        self.send_response(200)
+        self.send_header("ETag", RecordingServer.ETAG)
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@pytest.fixture
+def http_server() -> Iterator[RecordingServer]:
+    server = RecordingServer()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield server
+    finally:
+        server.release.set()
+        server.shutdown()
+        server.server_close()
+
+
+def test_http_cache(tmp_path: Path, http_server: RecordingServer) -> None:
+    cache = util.HTTPCache(tmp_path)
+    url = f"{http_server.url}/a"
+    assert cache.get(url) == b"body of /a"
+
+    # A fresh cached copy is used without a request
+    assert cache.get(url) == b"body of /a"
+    assert len(http_server.requests) == 1
+
+    # A stale cached copy is revalidated with its ETag, over the same connection
+    assert cache.get(url, datetime.timedelta(0)) == b"body of /a"
+    assert len(http_server.requests) == 2
+    (_, first_etag, first_port), (_, second_etag, second_port) = http_server.requests
+    assert first_etag is None
+    assert second_etag == RecordingServer.ETAG
+    assert first_port == second_port
+
+    with pytest.raises(requests.exceptions.HTTPError):
+        cache.get(f"{http_server.url}/missing")
+
+
+def test_http_cache_single_flight(http_server: RecordingServer) -> None:
+    cache = util.HTTPCache(None)
+    url = f"{http_server.url}/a"
+    results: List[bytes] = []
+
+    def fetch() -> None:
+        results.append(cache.get(url))
+
+    http_server.release.clear()
+    threads = [threading.Thread(target=fetch) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+
+    # Give every thread the chance to ask for the URL while the first request is held
+    time.sleep(0.5)
+    http_server.release.set()
+    for thread in threads:
+        thread.join()
+
+    assert results == [b"body of /a"] * 8
+    assert len(http_server.requests) == 1
+
+    # Once the request is done, the next one is made afresh
+    assert cache.get(url) == b"body of /a"
+    assert len(http_server.requests) == 2
+
+
+def test_http_cache_prefetch(tmp_path: Path, http_server: RecordingServer) -> None:
+    cache = util.HTTPCache(tmp_path)
+    results = cache.prefetch(
+        [f"{http_server.url}/a", f"{http_server.url}/missing", f"{http_server.url}/b"]
+    )
+    assert results[0] == b"body of /a"
+    assert isinstance(results[1], requests.exceptions.HTTPError)
+    assert results[2] == b"body of /b"
+
+    # Prefetched responses are served from the cache
+    assert cache.get(f"{http_server.url}/b") == b"body of /b"
+    assert len(http_server.requests) == 3
+
+    # Every user of a cache directory shares one cache and its connections
+    shared = util.HTTPCache.for_directory(tmp_path)
+    assert util.HTTPCache.for_directory(tmp_path) is shared
+    assert shared is not cache
+    cache.close()
@@ -0,0 +1,100 @@
+"""Measure the time taken to traverse a synthetic AST of about 100,000 nodes with each of
+snooty's tree walkers.
+
+Usage: python3 -m snooty.traversal_benchmark [<n-nodes>]
+"""
+
+import sys
+import threading
+import time
+from typing import Callable, List
+
+from . import n
+from .eventparser import EventParser, FileIdStack
+from .n import FileId
+from .page import Page
+from .util import ast_dive
+
+N_RUNS = 5
+
+
+def make_section(i: int) -> n.Section:
+    """Return a section of 18 nodes, exercising each kind of child field."""
+    return n.Section(
+        (i,),
+        [
+            n.Heading((i,), [n.Text((i,), "Heading")], f"heading-{i}"),
+            n.Paragraph(
+                (i,),
+                [
+                    n.Text((i,), "Some "),
+                    n.Emphasis((i,), [n.Text((i,), "emphasized")]),
+                    n.Text((i,), " text"),
+                ],
+            ),
+            n.Directive(
+                (i,),
+                [n.Paragraph((i,), [n.Text((i,), "Note body")])],
+                "",
+                "note",
+                [n.Text((i,), "Note title")],
+                {},
+            ),
+            n.DefinitionList(
+                (i,),
+                [
+                    n.DefinitionListItem(
+                        (i,),
+                        [n.Paragraph((i,), [n.Text((i,), "Definition")])],
+                        [n.Literal((i,), [n.Text((i,), "term")])],
+                    )
+                ],
+            ),
+        ],
+    )
+
+
+def make_page(n_nodes: int) -> Page:
+    page = Page.create(FileId("index.txt"), None, "")
+    page.ast.children = [make_section(i) for i in range(max(1, n_nodes // 18))]
+    return page
+
+
+def measure(function: Callable[[], object]) -> float:
+    """Return the best time in seconds of several calls to the given function."""
+    times: List[float] = []
+    for _ in range(N_RUNS):
+        start_time = time.perf_counter()
+        function()
+        times.append(time.perf_counter() - start_time)
+
+    return min(times)
+
+
+def main() -> None:
+    n_nodes = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    page = make_page(n_nodes)
+    actual_nodes = sum(1 for _ in ast_dive(page.ast))
+
+    def on_node(fileid_stack: FileIdStack, node: n.Node) -> None:
+        pass
+
+    def run_event_parser() -> None:
+        parser = EventParser(threading.Event())
+        parser.add_event_listener(EventParser.OBJECT_START_EVENT, on_node)
+        parser.add_event_listener(EventParser.OBJECT_END_EVENT, on_node)
+        parser.consume([(FileId("index.txt"), page)])
+
+    print(f"{actual_nodes} nodes")
+    print(f"{'walker':>12} {'best (ms)':>10} {'ns/node':>8}")
+    for name, function in (
+        ("EventParser", run_event_parser),
+        ("ast_dive", lambda: sum(1 for _ in ast_dive(page.ast))),
+        ("verify", page.ast.verify),
+    ):
+        best = measure(function)
+        print(f"{name:>12} {best * 1000:>10.1f} {best * 1e9 / actual_nodes:>8.0f}")
+
+
+if __name__ == "__main__":
+    main()
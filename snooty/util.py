@@ -1,6 +1,7 @@
 from __future__ import annotations
 
 import collections.abc
+import concurrent.futures
 import dataclasses
 import datetime
 import enum
@@ -36,6 +37,7 @@ from typing import (
     Iterable,
     Iterator,
     List,
+    NamedTuple,
     Optional,
     Set,
     TextIO,
@@ -47,6 +49,7 @@ from typing import (
 )
 
 import requests
+import requests.adapters
 import tomli
 
 from snooty.diagnostics import Diagnostic, NestedProject, UnexpectedNodeType
@@ -54,6 +57,12 @@ from snooty.n import FileId, TocTreeDirectiveEntry
 
 from . import n, tinydocutils
 
+try:
+    import resource
+except ImportError:
+    # Not available on Windows
+    resource = None  # type: ignore
+
 logger = logging.getLogger(__name__)
 _T = TypeVar("_T")
 _K = TypeVar("_K", bound=Hashable)
@@ -100,6 +109,144 @@ class FileCacheMapping:
         self.dependencies = None
 
 
+class FileStat(NamedTuple):
+    """The subset of a file's stat information that changes when its contents are modified."""
+
+    size: int
+    mtime_ns: int
+    ino: int
+
+    @classmethod
+    def from_path(cls, path: Path) -> "FileStat":
+        stat = os.stat(path)
+        return cls(stat.st_size, stat.st_mtime_ns, stat.st_ino)
+
+
+class FileHashMemo:
+    """A thread-safe record of file content hashes, each of which is trusted only as long as
+    its file's stat information is unchanged. If paranoid is set, files are always hashed.
+    """
+
+    #: A file modified this close to when it was hashed may be modified again without its
+    #: stat information changing, given coarse filesystem timestamps. Don't trust such hashes
+    #: beyond the current build.
+    RACY_WINDOW_NS = 2_000_000_000
+
+    def __init__(self, paranoid: bool = False) -> None:
+        self.paranoid = paranoid
+        self.hits = 0
+        self.misses = 0
+        self._entries: Dict[FileId, Tuple[FileStat, str]] = {}
+        self._build_entries: Optional[Dict[FileId, Tuple[FileStat, str]]] = None
+        self._seen: Set[FileId] = set()
+        self._lock = threading.Lock()
+
+    def lookup(
+        self, fileid: FileId, path: Path, hasher: Callable[[], str]
+    ) -> Tuple[str, bool]:
+        """Return the hash of the given file, and whether it was memoized. hasher is only
+        called if the file has changed since it was last hashed. Raises OSError if the file
+        cannot be accessed."""
+        # Stat before reading: if the file changes while we hash it, the recorded stat will
+        # be stale, and the next lookup will rehash.
+        return self._lookup(fileid, FileStat.from_path(path), hasher)
+
+    def _lookup(
+        self, fileid: FileId, stat: FileStat, hasher: Callable[[], str]
+    ) -> Tuple[str, bool]:
+        with self._lock:
+            self._seen.add(fileid)
+            if not self.paranoid:
+                entry = self._entries.get(fileid)
+                if entry is None and self._build_entries is not None:
+                    entry = self._build_entries.get(fileid)
+                if entry is not None and entry[0] == stat:
+                    self.hits += 1
+                    return entry[1], True
+
+        file_hash = hasher()
+        self._store(fileid, stat, file_hash)
+        return file_hash, False
+
+    def _store(self, fileid: FileId, stat: FileStat, file_hash: str) -> None:
+        with self._lock:
+            self._seen.add(fileid)
+            self.misses += 1
+            if time.time_ns() - stat.mtime_ns > self.RACY_WINDOW_NS:
+                self._entries[fileid] = (stat, file_hash)
+            else:
+                self._entries.pop(fileid, None)
+                if self._build_entries is not None:
+                    self._build_entries[fileid] = (stat, file_hash)
+
+    def get(self, fileid: FileId, path: Path, hasher: Callable[[Path], str]) -> str:
+        """Return the hash of the given file, as computed by hasher if the file has changed
+        since it was last hashed."""
+        return self.lookup(fileid, path, lambda: hasher(path))[0]
+
+    def read(self, fileid: FileId, path: Path) -> Tuple[bytes, str]:
+        """Read a file, returning its contents and their blake2b hash. The contents are
+        always hashed, since the read has already been paid for, and the memo is updated.
+        """
+        stat = FileStat.from_path(path)
+        data = path.read_bytes()
+        file_hash = hashlib.blake2b(data).hexdigest()
+        self._store(fileid, stat, file_hash)
+        return data, file_hash
+
+    @contextmanager
+    def build(self) -> Iterator[None]:
+        """Within this context, also reuse hashes of recently-modified files. Such a file may
+        change without its stat information changing, but that can only go unnoticed until
+        the end of the build."""
+        with self._lock:
+            self._build_entries = {}
+        try:
+            yield None
+        finally:
+            with self._lock:
+                self._build_entries = None
+
+    def reset_after_fork(self) -> None:
+        """Reinitialize this memo in a forked child process. The parent may have forked in
+        the middle of a build, or while another thread held the lock; neither applies to
+        the child, and hashes trusted only until the end of that build must be dropped.
+        """
+        self._lock = threading.Lock()
+        self._build_entries = None
+
+    def merge(self, other: "FileHashMemo") -> None:
+        """Add entries recorded by another memo."""
+        entries = other.entries()
+        with self._lock:
+            self._entries.update(entries)
+
+    def prune(self) -> None:
+        """Discard entries for files that have not been looked up since this memo was
+        created or loaded."""
+        with self._lock:
+            self._entries = {k: v for k, v in self._entries.items() if k in self._seen}
+
+    def entries(self) -> Dict[FileId, Tuple[FileStat, str]]:
+        with self._lock:
+            return dict(self._entries)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def __getstate__(self) -> Dict[FileId, Tuple[FileStat, str]]:
+        return self.entries()
+
+    def __setstate__(self, state: Dict[FileId, Tuple[FileStat, str]]) -> None:
+        self.paranoid = False
+        self.hits = 0
+        self.misses = 0
+        self._entries = state
+        self._build_entries = None
+        self._seen = set()
+        self._lock = threading.Lock()
+
+
 def reroot_path(
     filename: PurePosixPath, docpath: PurePath, project_root: Path
 ) -> Tuple[n.FileId, Path]:
@@ -184,13 +331,7 @@ def get_files(
 
 def ast_dive(ast: n.Node) -> Iterator[n.Node]:
     """Yield each node in an AST in no particular order."""
-    children: List[n.Node] = []
-    if isinstance(ast, n.Parent):
-        children.extend(ast.children)
-    children.extend(getattr(ast, "argument", []))
-    yield ast
-    for child in children:
-        yield from ast_dive(child)
+    return n.walk(ast)
 
 
 def add_doc_target_ext(target: str, docpath: PurePath, project_root: Path) -> Path:
@@ -273,11 +414,24 @@ def make_html5_id(orig: str) -> str:
     return clean_id
 
 
+def peak_rss() -> Optional[int]:
+    """Return the peak resident set size of this process in bytes, or None if it cannot be
+    determined on this platform."""
+    if resource is None:
+        return None
+
+    max_rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Linux reports kibibytes; macOS reports bytes
+    return max_rss if sys.platform == "darwin" else max_rss * 1024
+
+
 class PerformanceLogger:
     _singleton: Optional["PerformanceLogger"] = None
 
     def __init__(self) -> None:
         self._times: Dict[str, List[float]] = defaultdict(list)
+        self._spans: Dict[str, List[Tuple[float, float]]] = defaultdict(list)
+        self._peak_rss: Dict[str, int] = {}
 
     @contextmanager
     def start(self, name: str) -> Iterator[None]:
@@ -285,17 +439,68 @@ class PerformanceLogger:
         try:
             yield None
         finally:
-            self._times[name].append(time.perf_counter() - start_time)
+            self.record(name, start_time, time.perf_counter())
+
+    def record(self, name: str, start_time: float, end_time: float) -> None:
+        """Record a phase that does not map onto a single block of code, such as work
+        running in the background. Times are as returned by time.perf_counter()."""
+        self._times[name].append(end_time - start_time)
+        self._spans[name].append((start_time, end_time))
+
+        rss = peak_rss()
+        if rss is not None:
+            self._peak_rss[name] = rss
+
+    def peak_rss(self) -> Dict[str, int]:
+        """Return the peak resident set size of the process, in bytes, as of the last time
+        each phase ended."""
+        return dict(self._peak_rss)
 
     def times(self) -> Dict[str, float]:
         return {k: min(v) for k, v in self._times.items()}
 
+    def overlaps(self) -> Dict[Tuple[str, str], float]:
+        """Return the time during which each pair of phases was running concurrently. As with
+        times(), this is the minimum across runs, where the nth recording of each phase
+        belongs to the nth run. Pairs which did not overlap in every run are omitted."""
+        result: Dict[Tuple[str, str], float] = {}
+        names = list(self._spans.keys())
+        for i, name1 in enumerate(names):
+            for name2 in names[i + 1 :]:
+                overlap = min(
+                    (
+                        max(0.0, min(end1, end2) - max(start1, start2))
+                        for (start1, end1), (start2, end2) in zip(
+                            self._spans[name1], self._spans[name2]
+                        )
+                    ),
+                    default=0.0,
+                )
+                if overlap > 0.0:
+                    result[(name1, name2)] = overlap
+
+        return result
+
     def print(self, file: TextIO = sys.stdout) -> None:
         times = self.times()
-        title_column_width = max(len(x) for x in times.keys())
+        overlaps = {
+            f"{name1} || {name2}": overlap
+            for (name1, name2), overlap in self.overlaps().items()
+        }
+        title_column_width = max(len(x) for x in [*times.keys(), *overlaps.keys()])
         for name, entry_time in times.items():
             print(f"{name:{title_column_width}} {entry_time:.2f}", file=file)
 
+        if overlaps:
+            print("\nConcurrent phases:", file=file)
+            for name, overlap in overlaps.items():
+                print(f"{name:{title_column_width}} {overlap:.2f}", file=file)
+
+        if self._peak_rss:
+            print("\nPeak RSS after phase (MiB):", file=file)
+            for name, rss in self._peak_rss.items():
+                print(f"{name:{title_column_width}} {rss / 1024 / 1024:.1f}", file=file)
+
     @classmethod
     def singleton(cls) -> "PerformanceLogger":
         assert cls._singleton is not None
@@ -306,26 +511,136 @@ PerformanceLogger._singleton = PerformanceLogger()
 
 
 class HTTPCache:
+    """A cache of HTTP responses, stored in a directory and revalidated once they are older
+    than a given interval. Requests share a pool of connections, and concurrent requests for
+    the same URL are coalesced into one."""
+
     _singleton: ClassVar[Optional["HTTPCache"]] = None
+    _instances: ClassVar[Dict[Optional[Path], "HTTPCache"]] = {}
+    _instances_lock: ClassVar[threading.Lock] = threading.Lock()
     DEFAULT_CACHE_DIR: ClassVar[Path] = Path.home().joinpath(".cache", "snooty")
 
+    #: The (connect, read) timeout of each request, in seconds
+    TIMEOUT: ClassVar[Tuple[float, float]] = (10.0, 60.0)
+    #: The number of pooled connections to each host, and of URLs prefetched at once
+    MAX_CONNECTIONS: ClassVar[int] = 8
+
     @classmethod
     def initialize(cls, caching: bool = True) -> None:
-        cls._singleton = cls(cls.DEFAULT_CACHE_DIR if caching else None)
+        with cls._instances_lock:
+            if cls._singleton is not None:
+                cls._singleton.close()
+            cls._singleton = cls(cls.DEFAULT_CACHE_DIR if caching else None)
 
     @classmethod
     def singleton(cls) -> "HTTPCache":
-        if cls._singleton is None:
-            cls._singleton = cls(cls.DEFAULT_CACHE_DIR)
+        with cls._instances_lock:
+            if cls._singleton is None:
+                cls._singleton = cls(cls.DEFAULT_CACHE_DIR)
 
-        return cls._singleton
+            return cls._singleton
+
+    @classmethod
+    def for_directory(cls, cache_dir: Optional[Path]) -> "HTTPCache":
+        """Return the cache shared by every user of the given directory, so that they pool
+        their connections and coalesce their requests."""
+        with cls._instances_lock:
+            if cls._singleton is not None and cls._singleton.cache_dir == cache_dir:
+                return cls._singleton
+
+            cache = cls._instances.get(cache_dir)
+            if cache is None:
+                cache = cls._instances[cache_dir] = cls(cache_dir)
+
+            return cache
+
+    @classmethod
+    def reset_after_fork(cls) -> None:
+        """Forget the caches inherited from a parent process, whose pooled connections and
+        in-flight requests belong to the parent."""
+        cls._instances_lock = threading.Lock()
+        cls._singleton = None
+        cls._instances = {}
 
     def __init__(self, cache_dir: Optional[Path]) -> None:
         self.cache_dir = cache_dir
 
+        # Retry connection failures and transient server errors, but leave the final
+        # response's status to raise_for_status()
+        retry = requests.adapters.Retry(
+            total=2,
+            backoff_factor=0.2,
+            status_forcelist=(502, 503, 504),
+            allowed_methods=("GET",),
+            raise_on_status=False,
+        )
+        adapter = requests.adapters.HTTPAdapter(
+            pool_connections=self.MAX_CONNECTIONS,
+            pool_maxsize=self.MAX_CONNECTIONS,
+            max_retries=retry,
+        )
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+        self._lock = threading.Lock()
+        self._in_flight: Dict[str, "concurrent.futures.Future[bytes]"] = {}
+
+    def close(self) -> None:
+        """Close this cache's pooled connections."""
+        self.session.close()
+
+    def __enter__(self) -> "HTTPCache":
+        return self
+
+    def __exit__(self, *args: object) -> None:
+        self.close()
+
     def get(
         self, url: str, cache_interval: Optional[datetime.timedelta] = None
     ) -> bytes:
+        """Return the body of the response for the given URL. If the URL is already being
+        fetched by another thread, wait for and share its result."""
+        with self._lock:
+            future = self._in_flight.get(url)
+            is_owner = future is None
+            if future is None:
+                future = self._in_flight[url] = concurrent.futures.Future()
+
+        if not is_owner:
+            return future.result()
+
+        try:
+            data = self._get(url, cache_interval)
+        except BaseException as err:
+            future.set_exception(err)
+            raise
+        else:
+            future.set_result(data)
+            return data
+        finally:
+            with self._lock:
+                del self._in_flight[url]
+
+    def prefetch(
+        self, urls: Iterable[str], cache_interval: Optional[datetime.timedelta] = None
+    ) -> List[Union[bytes, requests.exceptions.RequestException]]:
+        """Fetch several URLs concurrently. Return, in the order of the given URLs, each
+        response body or the error that prevented it from being fetched."""
+        urls = list(urls)
+
+        def fetch(url: str) -> Union[bytes, requests.exceptions.RequestException]:
+            try:
+                return self.get(url, cache_interval)
+            except requests.exceptions.RequestException as err:
+                return err
+
+        with concurrent.futures.ThreadPoolExecutor(
+            max(1, min(self.MAX_CONNECTIONS, len(urls)))
+        ) as executor:
+            return list(executor.map(fetch, urls))
+
+    def _get(self, url: str, cache_interval: Optional[datetime.timedelta]) -> bytes:
         logger.debug(
             f"Fetching: {url} from cache_dir {self.cache_dir.as_posix() if self.cache_dir else '<no-cache>'}"
         )
@@ -334,23 +649,16 @@ class HTTPCache:
             datetime.timedelta(hours=1) if cache_interval is None else cache_interval
         )
 
-        url_netloc = urllib.parse.urlparse(url).netloc
-        is_raw_gh_content_url = url_netloc == "raw.githubusercontent.com"
-        target_url = (
-            f"https://populate-data-extension.netlify.app/.netlify/functions/fetch-url?url={url}"
-            if is_raw_gh_content_url
-            else url
-        )
-
-        if self.cache_dir is None:
-            res = requests.get(target_url)
+        target_url = self._get_target_url(url)
+        inventory_path = self.get_cache_path(url)
+        if self.cache_dir is None or inventory_path is None:
+            res = self.session.get(target_url, timeout=self.TIMEOUT)
             res.raise_for_status()
             return res.content
 
         # Make our user's cache directory if it doesn't exist
-        filename = urllib.parse.quote(target_url, safe="")
         self.cache_dir.mkdir(parents=True, exist_ok=True)
-        inventory_path = self.cache_dir.joinpath(filename)
+        etag_path = inventory_path.with_name(inventory_path.name + ".etag")
 
         # Only re-request if more than an hour old
         request_headers: Dict[str, str] = {}
@@ -367,17 +675,49 @@ class HTTPCache:
             request_headers["If-Modified-Since"] = formatdate(
                 mktime(mtime.timetuple()), usegmt=True
             )
+            try:
+                request_headers["If-None-Match"] = etag_path.read_text(encoding="utf-8")
+            except FileNotFoundError:
+                pass
 
-        res = requests.get(target_url, headers=request_headers)
+        res = self.session.get(
+            target_url, headers=request_headers, timeout=self.TIMEOUT
+        )
 
         res.raise_for_status()
         if res.status_code == 304:
+            # The cached copy is still valid: don't ask again until the interval elapses
+            os.utime(inventory_path)
             return inventory_path.read_bytes()
 
         atomic_write(inventory_path, res.content, self.cache_dir)
+        etag = res.headers.get("ETag")
+        if etag is None:
+            etag_path.unlink(missing_ok=True)
+        else:
+            atomic_write(etag_path, bytes(etag, "utf-8"), self.cache_dir)
 
         return res.content
 
+    def get_cache_path(self, url: str) -> Optional[Path]:
+        """Return the path at which the response for the given URL is cached, or None if
+        caching is disabled."""
+        if self.cache_dir is None:
+            return None
+
+        filename = urllib.parse.quote(self._get_target_url(url), safe="")
+        return self.cache_dir.joinpath(filename)
+
+    @staticmethod
+    def _get_target_url(url: str) -> str:
+        url_netloc = urllib.parse.urlparse(url).netloc
+        is_raw_gh_content_url = url_netloc == "raw.githubusercontent.com"
+        return (
+            f"https://populate-data-extension.netlify.app/.netlify/functions/fetch-url?url={url}"
+            if is_raw_gh_content_url
+            else url
+        )
+
 
 def atomic_write(path: Path, data: bytes, temp_dir: Path) -> None:
     """Atomically write a file."""
@@ -252,7 +252,10 @@ def make_test_project(
         backend = BackendTestResults()
 
         project = Project(root, backend, {})
-        yield (project, backend)
+        try:
+            yield (project, backend)
+        finally:
+            project.close()
 
 
 @contextlib.contextmanager